@@ -31,7 +31,15 @@ This file is part of Droop.
    The default rule is 'meek'
 
    options currently include:
-   path=ballot_file_path
+   path=ballot_file_path (blt, or a binary profile written by bltbin.py; blt and cvr may be gzip/bz2/xz-compressed)
+   cvr=csv|json if the ballot file holds cast-vote records (see ElectionProfile.cvrParse)
+     seats=<number of seats to fill> (required with cvr)
+     contests=true to count each contest in a multi-contest export (see ElectionProfile.cvrSplit)
+   coalesce=true to merge ballot lines with identical rankings
+   validate=true to check the ballot file and summarize it, without counting (see ElectionProfile.bltValidate)
+   workers=<number of processes for parsing the ballot file, or for counting contests>
+   cache=<directory for cached parsed profiles>
+     cachesize=<cache size limit, in megabytes (default 1024)>
    rule=election_rule_name
      omega=<set meek surplus limit to 10^-epsilon>
    report= [not currently supported]
@@ -43,10 +51,68 @@ This file is part of Droop.
 '''
    
 import sys, os
+import multiprocessing
 import droop
-from droop.profile import ElectionProfile, ElectionProfileError
+from droop.profile import ElectionProfile, ElectionProfileError, ProfileCache
 from droop.election import Election
 
+def electionReport(E, intr=False):
+    "the requested reports of a counted election"
+    E.options.setopt('dump', default=False)
+    E.options.setopt('json', default=False)
+    ereport = ''
+    if E.options.setopt('report', default=True):
+        ereport += E.report(intr)
+    if E.options.getopt('dump'):
+        ereport += E.dump(intr)
+    if E.options.getopt('json'):
+        ereport += E.json(intr)
+    return ereport
+
+def countContest(args):
+    "count one contest's (profile, options); a module-level function for process pools"
+    electionProfile, options = args
+    E = Election(electionProfile, dict(options))
+    E.count()
+    return electionReport(E)
+
+def countContests(profiles, options, workers=1):
+    '''
+    count the contests of a split profile (see ElectionProfile.cvrSplit)
+    
+    The contests are independent, so with workers > 1 they're counted in a pool
+    of worker processes. Return the reports, in order of contest name.
+    '''
+    jobs = [(profiles[contest], options) for contest in sorted(profiles)]
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        try:
+            return pool.map(countContest, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    return [countContest(job) for job in jobs]
+
+def validationReport(path, summary):
+    "summarize a validated ballot file (see ElectionProfile.bltValidate)"
+    names = summary['candidateName']
+    r = 'Ballot file %s is valid\n' % path
+    r += '  Title: %s\n' % summary['title']
+    r += '  Seats: %d\n' % summary['nSeats']
+    r += '  Candidates: %d (%d withdrawn)\n' % (summary['nCand'], len(summary['withdrawn']))
+    r += '  Ballots: %d in %d lines (%d with equal rankings)\n' % \
+        (summary['nBallots'], summary['lines'], summary['linesEqual'])
+    if summary['ballotIDs']:
+        r += '  Ballot IDs: %d\n' % summary['ballotIDs']
+    r += '  First preferences:\n'
+    for cid in sorted(names):
+        if cid not in summary['withdrawn']:
+            r += '    %s: %d\n' % (names[cid], summary['firstPrefs'].get(cid, 0))
+    r += '  Ballots by number of candidates ranked:\n'
+    for n in sorted(summary['rankings']):
+        r += '    %d: %d\n' % (n, summary['rankings'][n])
+    return r
+
 def main(options=None):
     "run an election"
 
@@ -55,15 +121,44 @@ def main(options=None):
 
     #  process options
     #
-    #  we know about (path, profile)
+    #  we know about (path, profile, coalesce, workers, cache, cachesize, cvr, seats, contests, validate)
     #  all the others are passed to the various consumers
     #
     path = None         # ballot path must be specified
     doProfile = False   # performance profiling
     reps = 1            # repetitions (for profiling)
+    coalesce = False    # merge identical ballot lines
+    workers = 1         # ballot-file parsing processes
+    cache = None        # parsed-profile cache directory
+    cachesize = 1024    # cache size limit in MB
+    cvr = None          # cast-vote-record import options
+    contests = False    # count each contest of a multi-contest export
+    validate = False    # check the ballot file without counting
     for opt, arg in options.items():
         if opt == 'path':     # path=<path to ballot file>
             path = arg
+        elif opt == 'coalesce':  # coalesce=<true|false>
+            coalesce = arg
+        elif opt == 'workers':  # workers=<number of parsing processes>
+            try:
+                workers = int(arg)
+            except ValueError:
+                raise droop.common.UsageError("workers must be a number of processes")
+        elif opt == 'cache':  # cache=<directory>
+            cache = arg
+        elif opt == 'cachesize':  # cachesize=<megabytes>
+            try:
+                cachesize = int(arg)
+            except ValueError:
+                raise droop.common.UsageError("cachesize must be a number of megabytes")
+        elif opt == 'cvr':  # cvr=<csv|json>
+            cvr = dict(cvr or dict(), format=arg)
+        elif opt == 'seats':  # seats=<number of seats> (cvr)
+            cvr = dict(cvr or dict(), seats=arg)
+        elif opt == 'contests':  # contests=<true|false> (cvr)
+            contests = arg
+        elif opt == 'validate':  # validate=<true|false>
+            validate = arg
         elif opt == 'profile':  # profile=<number of repetitions>
             import cProfile
             import pstats
@@ -81,11 +176,26 @@ def main(options=None):
     #    report
     #
     def countElection(E, repeat=1):
-        "encapsulate for optional profiling"
+        "encapsulate for optional profiling; each repetition is a full recount (see Election.reset)"
         for i in xrange(repeat):    # pylint: disable=W0612
             E.count()
 
-    electionProfile = ElectionProfile(path=path)  # don't repeat the profile loading
+    if validate:
+        return validationReport(path, ElectionProfile.bltValidate(path=path))
+    if contests and (cvr is None or 'format' not in cvr):
+        raise droop.common.UsageError("contests applies only to cast-vote records (cvr=csv|json)")
+    if cvr is not None:
+        if 'format' not in cvr:
+            raise droop.common.UsageError("seats applies only to cast-vote records (cvr=csv|json)")
+        if contests:
+            profiles = ElectionProfile.cvrSplit(path=path, coalesce=coalesce, cvr=cvr)
+            return ''.join(countContests(profiles, options, workers))
+        electionProfile = ElectionProfile(path=path, coalesce=coalesce, cvr=cvr)
+    elif cache:
+        electionProfile = ProfileCache(cache, cachesize*1024*1024).load(path, coalesce=coalesce,
+            workers=workers)
+    else:
+        electionProfile = ElectionProfile(path=path, coalesce=coalesce, workers=workers)  # don't repeat the profile loading
     E = Election(electionProfile, options)
     try:
         intr = False
@@ -95,15 +205,7 @@ def main(options=None):
             countElection(E, reps)
     except KeyboardInterrupt:
         intr = True
-    E.options.setopt('dump', default=False)
-    E.options.setopt('json', default=False)
-    ereport = ''
-    if E.options.setopt('report', default=True):
-        ereport += E.report(intr)
-    if E.options.getopt('dump'):
-        ereport += E.dump(intr)
-    if E.options.getopt('json'):
-        ereport += E.json(intr)
+    ereport = electionReport(E, intr)
 
     if doProfile:
         p = pstats.Stats(profilefile)
@@ -133,6 +235,12 @@ def usage(subject=None):
     u += '    arithmetic class name (%s)\n' % ','.join(droop.values.arithmeticNames)
     u += '    profile=reps, to profile the count, running reps repetitions\n'
     u += '    dump, to dump a csv of the election actions\n'
+    u += '    coalesce=true, to merge ballot lines with identical rankings\n'
+    u += '    validate=true, to check and summarize the ballot file without counting\n'
+    u += '    cvr=csv|json seats=n, to count cast-vote records rather than a blt file\n'
+    u += '    contests=true, with cvr, to count each contest of a multi-contest export\n'
+    u += '    workers=n, to parse the ballot file (or count contests) with n processes\n'
+    u += '    cache=dir, to cache parsed ballot files in dir (cachesize=MB to limit its size)\n'
     u += '    rule- or arithmetic-specific options:\n'
     u += '      precision=n: decimal digits of precision (fixed, guarded)\n'
     u += '      guard=n: guard digits (guarded; default to guard=precision)\n'
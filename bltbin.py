@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Convert a ballot file between blt and binary profile formats
+
+Copyright 2010 by Jonathan Lundell
+
+This file is part of Droop.
+
+    Droop is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Droop is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Droop.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys, os
+from droop.profile import ElectionProfile, ElectionProfileError
+
+def usage():
+    "bltbin usage string"
+    return '''usage: %s input_file output_file
+  a blt input file is written as a binary profile;
+  a binary profile input file is written as blt''' % os.path.basename(sys.argv[0])
+
+if len(sys.argv) != 3:
+    print >>sys.stderr, usage()
+    sys.exit(1)
+try:
+    inPath, outPath = sys.argv[1:]
+    profile = ElectionProfile(path=inPath)
+    if ElectionProfile.binIs(inPath):
+        try:
+            f = open(outPath, 'w')
+            f.write(profile.blt())
+            f.close()
+        except IOError as err:
+            raise ElectionProfileError("can't write ballot file %s (%s)" % (outPath, err))
+    else:
+        profile.binWrite(outPath)
+except ElectionProfileError as err:
+    print >>sys.stderr, "** bltbin: %s" % err
+    print >>sys.stderr, usage()
+    sys.exit(1)
+sys.exit(0)
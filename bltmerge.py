@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Merge ballot files with the same header (one per precinct, say) into one
+
+Copyright 2010 by Jonathan Lundell
+
+This file is part of Droop.
+
+    Droop is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Droop is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Droop.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys, os
+from droop.profile import ElectionProfile, ElectionProfileError, ProfileCache
+
+def usage():
+    "bltmerge usage string"
+    return '''usage: %s [workers=n] output_file input_file...
+  the input blt files are parsed by n processes and merged,
+  aggregating identical rankings; an output file named *%s
+  is written as a binary profile, any other as blt''' % (os.path.basename(sys.argv[0]), ProfileCache.suffix)
+
+args = sys.argv[1:]
+workers = 1
+if args and args[0].startswith('workers='):
+    try:
+        workers = int(args.pop(0).split('=', 1)[1])
+    except ValueError:
+        args = []
+if len(args) < 2:
+    print >>sys.stderr, usage()
+    sys.exit(1)
+try:
+    outPath, inPaths = args[0], args[1:]
+    profile = ElectionProfile.bltMerge(inPaths, workers=workers)
+    if outPath.endswith(ProfileCache.suffix):
+        profile.binWrite(outPath)
+    else:
+        try:
+            f = open(outPath, 'w')
+            f.write(profile.blt())
+            f.close()
+        except IOError as err:
+            raise ElectionProfileError("can't write ballot file %s (%s)" % (outPath, err))
+except ElectionProfileError as err:
+    print >>sys.stderr, "** bltmerge: %s" % err
+    print >>sys.stderr, usage()
+    sys.exit(1)
+sys.exit(0)
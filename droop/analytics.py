@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+'''
+droop: election profile analytics
+
+Copyright 2010 by Jonathan Lundell
+
+This file is part of Droop.
+
+    Droop is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Droop is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Droop.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from __future__ import absolute_import
+from __future__ import division
+import array
+import itertools
+import operator
+try:
+    import numpy
+except ImportError:     # pragma: no cover
+    numpy = None
+
+class ProfileAnalytics(object):
+    '''
+    summary statistics of an election profile (or view), computed in one pass
+
+    nBallots: the number of ballots
+    firstPrefs[cid]: ballots ranking cid first (alone or equally)
+    rankingLengths[n]: ballots ranking n candidates
+    ranked[cid]: ballots ranking cid at all
+    rankedShare[cid]: the fraction of the ballots ranking cid
+    pairwise[a][b]: ballots preferring a to b, by ranking a above b
+      or ranking a and not b; equally-ranked candidates are preferred to neither
+
+    The unequal-ranking lines are tallied from the profile's flat ranking
+    storage: with NumPy (if it's installed and useNumpy is true) as whole-array
+    operations, and otherwise once per distinct ranking.
+
+    nLines is (len(ballotLines), len(ballotLinesEqual)) when the tallies were made.
+    '''
+
+    def __init__(self, profile, useNumpy=True):
+        "tally profile"
+        self.nLines = (len(profile.ballotLines), len(profile.ballotLinesEqual))
+        self.nBallots = profile.nBallots
+        nCand = profile.nCand
+        self.firstPrefs = [0] * (nCand + 1)
+        self.rankingLengths = [0] * (nCand + 1)
+        self.ranked = [0] * (nCand + 1)
+        self.above = [[0] * (nCand + 1) for cid in xrange(nCand + 1)]  # [a][b]: a ranked above b
+        self.tied = dict()      # (a, b): a and b ranked equally
+        BL = profile.ballotLines
+        if not hasattr(BL, 'cids'):     # a view: tally its rankings as read
+            self.tallyRankings(((BL.ranking(i).tostring(), m) for i, m in enumerate(BL.multipliers)),
+                BL.typecode)
+        elif numpy is not None and useNumpy:
+            self.tallyNumpy(BL)
+        else:
+            w = BL.cids.itemsize
+            offsets = BL.offsets
+            s = BL.cids.tostring()
+            rankings = itertools.imap(operator.getslice, itertools.repeat(s),
+                itertools.imap(operator.mul, offsets[:-1], itertools.repeat(w)),
+                itertools.imap(operator.mul, offsets[1:], itertools.repeat(w)))
+            self.tallyRankings(itertools.izip(rankings, BL.multipliers), BL.typecode)
+        for bl in profile.ballotLinesEqual:
+            self.tallyEqual(bl.multiplier, bl.ranking)
+        cids = sorted(profile.eligible | profile.withdrawn)
+        tied = self.tied.get
+        self.pairwise = dict((a, dict((b, self.ranked[a] - self.above[b][a] - tied((a, b), 0))
+            for b in cids if b != a)) for a in cids)
+        self.rankedShare = dict((cid, self.ranked[cid] / self.nBallots if self.nBallots else 0.0)
+            for cid in cids)
+        self.firstPrefs = dict((cid, self.firstPrefs[cid]) for cid in cids)
+        self.ranked = dict((cid, self.ranked[cid]) for cid in cids)
+        self.rankingLengths = dict((n, b) for n, b in enumerate(self.rankingLengths) if b)
+        del self.above, self.tied
+
+    def tallyRankings(self, rankings, typecode='B'):
+        '''
+        tally (ranking bytes, multiplier) pairs
+
+        Identical rankings are merged first, so each distinct ranking is tallied once.
+        '''
+        distinct = dict()
+        get = distinct.get
+        for key, multiplier in rankings:
+            distinct[key] = get(key, 0) + multiplier
+        firstPrefs, rankingLengths, ranked, above = self.firstPrefs, self.rankingLengths, self.ranked, self.above
+        for key, m in distinct.iteritems():
+            ranking = array.array(typecode, key)
+            firstPrefs[ranking[0]] += m
+            rankingLengths[len(ranking)] += m
+            for k, a in enumerate(ranking):
+                ranked[a] += m
+                row = above[a]
+                for b in ranking[k+1:]:
+                    row[b] += m
+
+    def tallyNumpy(self, BL):
+        '''
+        tally a BallotLines store with NumPy
+
+        Each line's cids are paired with those d places later for each d at
+        once, and the pairs are counted with bincount.
+        '''
+        cids = numpy.frombuffer(BL.cids.tostring(), dtype='u%d' % BL.cids.itemsize).astype(numpy.intp)
+        offsets = numpy.frombuffer(BL.offsets.tostring(), dtype='i%d' % BL.offsets.itemsize).astype(numpy.intp)
+        multipliers = numpy.frombuffer(BL.multipliers.tostring(), dtype='i%d' % BL.multipliers.itemsize)
+        if not len(multipliers):
+            return
+        multipliers = multipliers.astype(numpy.float64)   # exact below 2**53 ballots
+        n = len(self.firstPrefs)
+        lengths = numpy.diff(offsets)
+        weights = numpy.repeat(multipliers, lengths)
+        after = numpy.repeat(offsets[1:], lengths) - numpy.arange(len(cids)) - 1   # cids following in the line
+
+        def tally(counts, keys, weights, size):
+            "add the weighted counts of keys to the list counts"
+            for i, c in enumerate(numpy.bincount(keys, weights=weights, minlength=size).round().astype(numpy.int64)):
+                counts[i] += int(c)
+
+        tally(self.firstPrefs, cids[offsets[:-1]], multipliers, n)
+        tally(self.rankingLengths, lengths, multipliers, n)
+        tally(self.ranked, cids, weights, n)
+        pairs = numpy.zeros(n * n)
+        for d in xrange(1, int(lengths.max())):
+            i = numpy.nonzero(after >= d)[0]
+            pairs += numpy.bincount(cids[i] * n + cids[i + d], weights=weights[i], minlength=n * n)
+        pairs = pairs.round().astype(numpy.int64).reshape(n, n)
+        for a in xrange(n):
+            row = self.above[a]
+            for b in numpy.nonzero(pairs[a])[0]:
+                row[b] += int(pairs[a, b])
+
+    def tallyEqual(self, multiplier, ranking):
+        "tally an equal-ranking line: a tuple of ranks, each a list of cids"
+        m = multiplier
+        for cid in ranking[0]:
+            self.firstPrefs[cid] += m
+        self.rankingLengths[sum(len(rank) for rank in ranking)] += m
+        for k, rank in enumerate(ranking):
+            for a in rank:
+                self.ranked[a] += m
+                for b in rank:
+                    if b != a:
+                        self.tied[(a, b)] = self.tied.get((a, b), 0) + m
+                row = self.above[a]
+                for later in ranking[k+1:]:
+                    for b in later:
+                        row[b] += m
@@ -32,7 +32,7 @@ Top-level structure:
 '''
 
 from __future__ import absolute_import
-import sys, copy
+import sys, copy, array, bisect
 from .common import ElectionError
 from .options import Options
 from . import electionRule, electionRuleNames, ruleByName
@@ -104,20 +104,77 @@ class Election(object):
                 cid in electionProfile.withdrawn)
             self.C.add(c)
 
-        #  create a ballot object (ranking candidate IDs) from the profile rankings of candidate IDs
-        #  withdrawn candidates have been removed already
+        #  create the ballot state (ranking candidate IDs) over the profile rankings of candidate IDs
         #
-        self.ballots = list()
-        for bl in electionProfile.ballotLines:
-            if bl.ranking:  # skip if only withdrawn candidates
-                self.ballots.append(self.Ballot(self, bl.multiplier, bl.ranking))
+        self.ballots = self.Ballots(self)
         self.ballotsEqual = list()
-        for bl in electionProfile.ballotLinesEqual:
+        self.firstPrefs = dict((c.cid, self.V0) for c in self.C)  # first-preference totals (ballots) by CID
+        self._nLinesEqual = 0   # profile ballotLinesEqual made into ballots
+        self.__addBallots()
+        self.piles = None   # ballot piles by top-ranked CID (see buildPiles)
+        self._counted = False
+        self._nSetupActions = len(self.erecord['actions'])  # actions logged before counting
+        self._initialState = self.C.saveState()  # candidate state before counting (see reset)
+
+    def __addBallots(self):
+        '''
+        create ballot state for the profile ballot lines we don't have yet,
+        adding them to the first-preference totals
+        
+        withdrawn candidates have been removed already
+        '''
+        self.ballots.extend(self.electionProfile.ballotLines, self.firstPrefs)
+        for bl in self.electionProfile.ballotLinesEqual[self._nLinesEqual:]:
             if bl.ranking:  # skip if only withdrawn candidates
                 self.ballotsEqual.append(self.Ballot(self, bl.multiplier, bl.ranking))
+        self._nLinesEqual = len(self.electionProfile.ballotLinesEqual)
+
+    def update(self):
+        '''
+        bring the election up to date with ballot lines appended to its profile
+        (see ElectionProfile.appendBallots), for a provisional recount
+        
+        Only the new lines are made into ballots and added to the first-preference
+        totals. If the election has been counted, its count is reset, so that
+        count() counts it afresh.
+        '''
+        self.__addBallots()
+        if self._counted:
+            self.reset()
+
+    def reset(self):
+        '''
+        restore the election to its state before counting
+        
+        The ballots are restarted in place and the candidates restored from
+        the state saved when the election was created; nothing is rebuilt
+        from the profile. count() resets a counted election itself.
+        '''
+        self.ballots.restartAll(self.V1)
+        for b in self.ballotsEqual:
+            b.restart(self.V1)
+        self.C.restoreState(self._initialState)
+        self.V.initialize(self.options)    # reset the arithmetic statistics
+        actions = self.erecord['actions'][:self._nSetupActions]
+        self.erecord = record.ElectionRecord(self)
+        self.erecord['actions'].extend(actions)
+        self.round = 0
+        self.rounds = list()
+        self.intr_logged = False
+        self.quota = None
+        self.surplus = None
+        self.votes = None
+        self.elected = None
+        self.defeated = None
+        self.withdrawn = None
+        self.piles = None
+        self._counted = False
 
     def count(self):
-        "count the election"
+        "count the election (recounting it if it has been counted)"
+        if self._counted:
+            self.reset()
+        self._counted = True
         self.quota = self.V0
         self.surplus = self.V0
         self.votes = self.V0
@@ -125,6 +182,7 @@ class Election(object):
             self.residual = self.V0 # pylint: disable=W0201
         for c in self.C:
             c.vote = self.V0
+        self.buildPiles()
         ##
         self.rule.count()   ### count the election ###
         ##
@@ -134,6 +192,37 @@ class Election(object):
         self.withdrawn = self.C.withdrawn()
         self.postCheck()    # post-election sanity check
 
+    def buildPiles(self):
+        '''
+        sort the ballots into piles by top-ranked candidate
+        
+        piles[cid] is an array of the indices in ballots of the ballots whose
+        current top rank is cid, so that a rule can transfer a candidate's ballots
+        without scanning every ballot in the election. Exhausted ballots are in no pile.
+        '''
+        self.piles = dict((c.cid, array.array('l')) for c in self.C)
+        B = self.ballots
+        cids, ends, pos = B.cids, B.ends, B.pos
+        piles = self.piles
+        for i in xrange(len(pos)):
+            if pos[i] < ends[i]:
+                piles[cids[pos[i]]].append(i)
+
+    def pileBallot(self, ballot):
+        "add a (non-exhausted) ballot view to the pile of its top-ranked candidate"
+        self.piles[ballot.topRank].append(ballot.i)
+
+    def takePileIndices(self, cid):
+        "remove and return the pile of ballot indices whose top rank is cid"
+        pile = self.piles[cid]
+        self.piles[cid] = array.array('l')
+        return pile
+
+    def takePile(self, cid):
+        "remove and return the pile of ballots (as views) whose top rank is cid"
+        view = self.ballots.view
+        return [view(i) for i in self.takePileIndices(cid)]
+
     def postCheck(self):
         "post-election sanity check"
         nElected = len(self.elected)
@@ -218,9 +307,224 @@ class Election(object):
             self.intr_logged = True
         return self.erecord.json()
 
+    class Ballots(object):
+        '''
+        state of the ballots with no equal rankings, as parallel arrays
+        
+        Ballot i is the profile's ballot line i. Its ranking is read in place from
+        the profile's cids array: for a view of a profile (see ElectionProfile.view),
+        from the cids of the profile it views, between the ends of the selected line
+        (truncated to maxRank). A mapped binary profile's cids are read in the map.
+        
+        starts[i], ends[i]: the positions in cids of ballot i's ranking
+          (for a view, starts[i] is the first candidate not masked)
+        pos[i]: the position in cids of ballot i's current top rank;
+          the ballot is exhausted when pos[i] reaches ends[i]
+        multiplier[i], weight[i], residual[i]: arithmetic values, as in Ballot
+        mask: the candidates withdrawn by a view, which are left in the view's
+          rankings; they're withdrawn in the election, so counting skips them
+        
+        Indexing or iterating returns BallotView objects, with the Ballot API;
+        counting loops can use the arrays directly.
+        '''
+
+        def __init__(self, E):
+            "create an empty ballot state"
+            self.E = E
+            self.cids = array.array('B')
+            self.starts = array.array('l')
+            self.ends = array.array('l')
+            self.mask = frozenset()
+            self.pos = array.array('l')
+            self.multiplier = list()
+            self.weight = list()
+            self.residual = list()
+
+        def extend(self, BL, firstPrefs):
+            "add state for the lines of BL (a BallotLines store or view) we don't have yet, adding them to firstPrefs"
+            n = len(self.pos)
+            store = getattr(BL, 'store', None)
+            if store is None:           # a store: ballot i is its line i
+                self.cids = BL.cids
+                self.starts = BL.offsets
+                offsets = BL.offsets
+                self.ends.extend(offsets[i+1] for i in xrange(n, len(BL)))
+            else:                       # a view: ballot i is its store's line BL.index[i]
+                self.cids = cids = store.cids
+                self.mask = mask = BL.mask or frozenset()
+                offsets, maxRank = store.offsets, BL.maxRank
+                for j in BL.index[n:]:
+                    start, end = offsets[j], offsets[j+1]
+                    if maxRank is not None:
+                        end = min(end, start + maxRank)
+                    while cids[start] in mask:  # the view has no line left empty by its mask
+                        start += 1
+                    self.starts.append(start)
+                    self.ends.append(end)
+            V, V0, V1 = self.E.V, self.E.V0, self.E.V1
+            values = dict()     # int multiplier -> shared arithmetic value
+            cids, starts = self.cids, self.starts
+            for i in xrange(n, len(BL)):
+                m = BL.multipliers[i]
+                multiplier = values.get(m)
+                if multiplier is None:
+                    multiplier = values[m] = V(m)
+                self.pos.append(starts[i])
+                self.multiplier.append(multiplier)
+                self.weight.append(V1)
+                self.residual.append(V0)
+                firstPrefs[cids[starts[i]]] += multiplier
+
+        def restartAll(self, weight):
+            "restart every ballot (see Ballot.restart)"
+            n = len(self.pos)
+            self.pos[:] = self.starts[:n]
+            self.weight[:] = [weight] * n
+            self.residual[:] = [self.E.V0] * n
+
+        def ranking(self, i):
+            "return the ranking of ballot i as an array of CIDs"
+            ranking = self.cids[self.starts[i]:self.ends[i]]
+            if self.mask:
+                ranking = array.array(ranking.typecode, [cid for cid in ranking if cid not in self.mask])
+            return ranking
+
+        def topRank(self, i):
+            "return the top rank (CID) of ballot i, or None if it's exhausted"
+            pos = self.pos[i]
+            return self.cids[pos] if pos < self.ends[i] else None
+
+        def vote(self, i):
+            "return the total vote of ballot i (see Ballot.vote)"
+            if self.multiplier[i] == self.E.V1:
+                return self.weight[i]  # faster
+            return self.weight[i] * self.multiplier[i]
+
+        def view(self, i):
+            "return a BallotView of ballot i"
+            return Election.BallotView(self, i)
+
+        def __len__(self):
+            "number of ballots"
+            return len(self.pos)
+
+        def __getitem__(self, i):
+            "return a BallotView of ballot i"
+            if i < 0:
+                i += len(self.pos)
+            if i < 0 or i >= len(self.pos):
+                raise IndexError('ballot index out of range')
+            return Election.BallotView(self, i)
+
+        def __iter__(self):
+            "iterate over the ballots as views"
+            for i in xrange(len(self.pos)):
+                yield Election.BallotView(self, i)
+
+    class BallotView(object):
+        '''
+        ballot i of a Ballots store, with the API of a Ballot object
+        
+        The ranking, index and top rank leave out candidates masked by a profile view.
+        '''
+
+        __slots__ = ('B', 'i')
+
+        def __init__(self, B, i):
+            "view ballot i of B"
+            self.B = B
+            self.i = i
+
+        @property
+        def E(self):
+            "the election"
+            return self.B.E
+
+        @property
+        def ranking(self):
+            "the ranking, as an array of CIDs"
+            return self.B.ranking(self.i)
+
+        @property
+        def index(self):
+            "current ranking"
+            B, i = self.B, self.i
+            if B.mask:
+                return sum(1 for cid in B.cids[B.starts[i]:B.pos[i]] if cid not in B.mask)
+            return B.pos[i] - B.starts[i]
+
+        @index.setter
+        def index(self, index):
+            "set current ranking"
+            B, i = self.B, self.i
+            B.pos[i] = B.starts[i]
+            for _ in xrange(index):
+                self.advance()
+
+        @property
+        def multiplier(self):
+            "number of ballots like this"
+            return self.B.multiplier[self.i]
+
+        @property
+        def weight(self):
+            "current weight"
+            return self.B.weight[self.i]
+
+        @weight.setter
+        def weight(self, weight):
+            "set current weight"
+            self.B.weight[self.i] = weight
+
+        @property
+        def residual(self):
+            "untransferable weight"
+            return self.B.residual[self.i]
+
+        @residual.setter
+        def residual(self, residual):
+            "set untransferable weight"
+            self.B.residual[self.i] = residual
+
+        def advance(self):
+            "advance ballot index to next-ranked candidate"
+            B, i = self.B, self.i
+            pos = B.pos[i] + 1
+            while pos < B.ends[i] and B.cids[pos] in B.mask:
+                pos += 1
+            B.pos[i] = pos
+
+        def restart(self, weight):
+            "restart a ballot (for qpq)"
+            B, i = self.B, self.i
+            B.pos[i] = B.starts[i]
+            B.weight[i] = weight
+            B.residual[i] = B.E.V0
+
+        @property
+        def exhausted(self):
+            "is ballot exhausted?"
+            return self.B.pos[self.i] >= self.B.ends[self.i]
+
+        @property
+        def topRank(self):
+            "return top rank (CID), or None if exhausted"
+            return self.B.topRank(self.i)
+
+        @property
+        def topCand(self):
+            "return top candidate, or None if exhausted"
+            cid = self.B.topRank(self.i)
+            return None if cid is None else self.B.E.C.byCid(cid)
+
+        @property
+        def vote(self):
+            "return total vote of this ballot"
+            return self.B.vote(self.i)
+
     class Ballot(object):
         '''
-        internal representation of one ballot
+        internal representation of one ballot (with equal rankings; see Ballots for the others)
         
         The use of slots gives a more compact object, which significantly
         reduces memory requirements for large elections.
@@ -283,23 +587,76 @@ class Election(object):
 class Candidates(set):
     '''
     all candidates
+    
+    Candidates keeps the CIDs of its members partitioned by state
+    (plus the elected candidates with transfer pending). The partitions
+    are updated whenever a member's state or pending flag changes,
+    so that state tests take constant time and selections by state
+    need not examine every candidate.
+    
+    When the arithmetic class has a raw sort key (see Fixed.sortKey),
+    vote-order queries (lowest, highest, withinLowest and selections
+    in vote order) are answered from a VoteIndex of raw keys, which is
+    re-sorted only when votes have changed since it was last read.
+    
+    The members' mutable state (vote, keep factor, state and pending flag)
+    is kept in CID-indexed arrays (see Arrays), which counting loops can
+    use directly; Candidate objects read and write it through properties.
     '''
+    states = ('withdrawn', 'hopeful', 'elected', 'defeated', 'pending')
+    codes = dict((state, code) for code, state in enumerate(states))  # state -> state code
+
+    class Arrays(object):
+        '''
+        candidate state, indexed by CID
+        
+        vote[cid]: current vote total
+        kf[cid]: current keep factor (meek)
+        state[cid]: state code (index in Candidates.states)
+        pending[cid]: surplus-transfer pending (wigm)
+        
+        Entries for CIDs without a candidate are unused.
+        '''
+
+        def __init__(self):
+            "create empty arrays"
+            self.vote = list()
+            self.kf = list()
+            self.state = array.array('b')
+            self.pending = list()
+
+        def grow(self, cid):
+            "make room for cid"
+            n = cid + 1 - len(self.vote)
+            if n > 0:
+                self.vote.extend([None] * n)
+                self.kf.extend([None] * n)
+                self.state.extend([0] * n)
+                self.pending.extend([None] * n)
+
     def __init__(self, E=None):
         "new Candidates"
         super(Candidates, self).__init__()
         self.E = E              # Election
         self._byCid = dict()    # side table: cid -> Candidate
+        self._cids = dict((state, set()) for state in self.states)  # state -> set of CIDs
+        self._lists = dict()    # cache: state -> list of candidates, in CID order
+        self._voteIndex = dict()  # state -> VoteIndex (see voteIndex)
+        self._votesChanged = 0  # count of vote changes, to tell an index it's out of order
+        self.arrays = self.Arrays()  # candidate state by CID
 
     def copy(self):
         "return a copy of ourself"
         C = Candidates(self.E)
         for c in self:
-            super(Candidates, C).add(copy.copy(c))
+            c = copy.copy(c)
+            super(Candidates, C).add(c)
+            C._register(c)
         return C
 
     def add(self, c):
         "add a candidate"
-        self._byCid[c.cid] = c  # side table for lookup by candidate ID
+        self._register(c)   # side tables for lookup by candidate ID and state
         super(Candidates, self).add(c)
         if self.E is not None:  # accommodate unit test
             if c.state == 'withdrawn':
@@ -307,6 +664,77 @@ class Candidates(set):
             else:
                 self.E.log("Add eligible: %s" % c.name)
 
+    def _register(self, c):
+        "enter a candidate in the side tables and arrays"
+        A = self.arrays
+        A.grow(c.cid)
+        #  read c's state from where it's kept now (its own attributes, or another Candidates)
+        A.vote[c.cid], A.kf[c.cid], A.pending[c.cid] = c.vote, c.kf, c.pending
+        A.state[c.cid] = self.codes[c.state]
+        c._C = self
+        self._byCid[c.cid] = c
+        self._cids[c.state].add(c.cid)
+        if c.state == 'elected' and c.pending:
+            self._cids['pending'].add(c.cid)
+        self._lists.clear()
+        self._voteIndex.clear()
+
+    def _restate(self, c, state, pending):
+        "move a candidate to a new state partition, and record its state (called by Candidate)"
+        self._cids[c.state].discard(c.cid)
+        self._cids['pending'].discard(c.cid)
+        self._cids[state].add(c.cid)
+        if state == 'elected' and pending:
+            self._cids['pending'].add(c.cid)
+        self.arrays.state[c.cid] = self.codes[state]
+        self.arrays.pending[c.cid] = pending
+        self._lists.clear()
+        for index in self._voteIndex.itervalues():
+            index.restate(c, state, pending)
+
+    def saveState(self):
+        "return a copy of the members' mutable state, for restoreState"
+        A = self.arrays
+        return (list(A.vote), list(A.kf), array.array('b', A.state), list(A.pending),
+            dict((state, set(cids)) for state, cids in self._cids.iteritems()),
+            dict((c.cid, c.quotient) for c in self))
+
+    def restoreState(self, saved):
+        "restore the members' mutable state from saveState"
+        A = self.arrays
+        vote, kf, codes, pending, partitions, quotients = saved
+        A.vote[:], A.kf[:], A.state[:], A.pending[:] = vote, kf, codes, pending
+        self._cids = dict((state, set(cids)) for state, cids in partitions.iteritems())
+        for c in self:
+            c.quotient = quotients[c.cid]
+        self._lists.clear()
+        self._voteIndex.clear()
+
+    def votesChanged(self):
+        "note that votes have been written directly to arrays.vote, leaving the vote indexes out of order"
+        self._votesChanged += 1
+
+    def _list(self, state):
+        "return the (cached) list of candidates with specified state, in CID order"
+        cands = self._lists.get(state)
+        if cands is None:
+            if state == 'eligible':
+                cids = set(self._byCid) - self._cids['withdrawn']
+            elif state == 'notpending':
+                cids = self._cids['elected'] - self._cids['pending']
+            else:
+                cids = self._cids.get(state, ())
+            cands = self._lists[state] = [self._byCid[cid] for cid in sorted(cids)]
+        return cands
+
+    def isHopeful(self, cid):
+        "is the candidate with this CID (or the candidate itself) hopeful?"
+        return cid in self._cids['hopeful']
+
+    def isPending(self, cid):
+        "is the candidate with this CID (or the candidate itself) elected with transfer pending?"
+        return cid in self._cids['pending']
+
     def byCid(self, cid):
         "look up a candidate by candidate ID"
         return self._byCid[cid]
@@ -352,8 +780,185 @@ class Candidates(set):
     @staticmethod
     def byVote(candidates, reverse=False):
         "sort a list of candidates by vote order"
+        E = candidates[0].E if candidates else None
+        key = Candidates.voteKey(E)
+        if key is not None and not E.V.sortSlack:
+            return [c for k, o, c in sorted(((key(c.vote), c.order, c) for c in candidates), reverse=reverse)]
         return sorted(candidates, key=lambda c: (c.vote, c.order), reverse=reverse)
 
+    @staticmethod
+    def voteKey(E):
+        "return the raw sort key of E's arithmetic values, or None if there isn't one"
+        return None if E is None else getattr(E.V, 'sortKey', None)
+
+    class VoteIndex(object):
+        '''
+        the candidates in one state partition, in vote order (then ballot order)
+        
+        entries is a list of (raw key, ballot order, candidate), sorted.
+        Setting a vote only counts the change (see votesChanged); the entries
+        are re-keyed and re-sorted when next read, after which they're usually
+        all but sorted already. While they're in order, Candidates moves
+        candidates in and out as their states change.
+        
+        Raw keys are compared with no arithmetic comparisons; the arithmetic
+        class's sortSlack is the largest raw difference between values that
+        compare equal (Guarded's geps, less one), and ties are gathered within
+        it. The closest calls of each tie are noted in the arithmetic's comparison
+        statistics (see Guarded.noteDiff), as the comparisons would have been.
+        Rational values are their own keys, so they're compared as fractions.
+        '''
+        top = (float('inf'),)   # sorts after every (key, order, candidate) entry with a given key
+
+        def __init__(self, C, state, V):
+            "create an index of C's candidates in state, by the raw keys of arithmetic class V"
+            self.C = C
+            self.state = state
+            self.key = V.sortKey
+            self.slack = V.sortSlack    # raw difference within which values compare equal
+            self.noteDiff = getattr(V, 'noteDiff', None)
+            self._entries = None    # None if they need rebuilding
+            self._cids = set()      # CIDs of the candidates in the entries
+            self._changed = None    # C._votesChanged when the entries were last sorted
+
+        @property
+        def entries(self):
+            "the sorted (key, order, candidate) entries, re-sorted if votes have changed"
+            entries = self._entries
+            if entries is None:
+                members = self.C._list(self.state)
+                self._cids = set(c.cid for c in members)
+                entries = self._entries = [(None, c.order, c) for c in members]
+                self._changed = None
+            if self._changed != self.C._votesChanged:
+                key = self.key
+                entries[:] = [(key(c.vote), o, c) for k, o, c in entries]
+                entries.sort()
+                self._changed = self.C._votesChanged
+            return entries
+
+        def restate(self, c, state, pending):
+            "add or remove c's entry as it moves to state (with pending)"
+            if self._entries is None:
+                return
+            if self._changed != self.C._votesChanged:
+                self._entries = None    # out of order, so rebuild when next read
+                return
+            member = self.C.inState(state, pending, self.state)
+            if c.cid in self._cids:
+                if not member:
+                    entries = self._entries
+                    del entries[bisect.bisect_left(entries, (self.key(c.vote), c.order))]
+                    self._cids.discard(c.cid)
+            elif member:
+                bisect.insort(self._entries, (self.key(c.vote), c.order, c))
+                self._cids.add(c.cid)
+
+        def ordered(self):
+            "return the candidates in vote order, votes that compare equal in ballot order"
+            entries = self.entries
+            if not self.slack:
+                return [c for k, o, c in entries]
+            if self.noteDiff is not None:   # neighbors are the closest calls of a sort
+                for i in xrange(1, len(entries)):
+                    self.noteDiff(entries[i][0] - entries[i-1][0])
+            cands = list()
+            i = 0
+            while i < len(entries):
+                j = bisect.bisect_right(entries, (entries[i][0] + self.slack,) + self.top, i)
+                cands.extend(c for k, o, c in sorted(entries[i:j], key=lambda entry: entry[1]))
+                i = j
+            return cands
+
+        def __iter__(self):
+            "walk the candidates in vote order"
+            return iter(self.ordered())
+
+        def __len__(self):
+            "number of candidates"
+            return len(self.C._list(self.state))
+
+        def _note(self, ref):
+            "note the raw differences from ref of the keys that compare equal to it, and their neighbors"
+            if self.noteDiff is not None:
+                entries = self.entries
+                i = bisect.bisect_left(entries, (ref - self.slack,))
+                j = bisect.bisect_right(entries, (ref + self.slack,) + self.top)
+                for k, o, c in entries[max(i-1, 0):j+1]:
+                    self.noteDiff(abs(k - ref))
+
+        def _upTo(self, ref):
+            "return the candidates with votes no greater than raw key ref, in CID order"
+            self._note(ref)
+            entries = self.entries
+            n = bisect.bisect_right(entries, (ref + self.slack,) + self.top)
+            return sorted((c for k, o, c in entries[:n]), key=lambda c: c.cid)
+
+        def lowest(self):
+            "return the candidates tied for the lowest vote, in CID order"
+            entries = self.entries
+            return self._upTo(entries[0][0]) if entries else list()
+
+        def highest(self):
+            "return the candidates tied for the highest vote, in CID order"
+            entries = self.entries
+            if not entries:
+                return list()
+            high = entries[-1][0]
+            self._note(high)
+            n = bisect.bisect_left(entries, (high - self.slack,))
+            return sorted((c for k, o, c in entries[n:]), key=lambda c: c.cid)
+
+        def withinLowest(self, margin):
+            "return the candidates with votes within margin of the lowest, in CID order"
+            entries = self.entries
+            return self._upTo(entries[0][0] + self.key(margin)) if entries else list()
+
+    @staticmethod
+    def inState(cstate, pending, state):
+        "is a candidate in cstate (with pending) among those selected by state?"
+        if state == 'eligible':
+            return cstate != 'withdrawn'
+        if state == 'notpending':
+            return cstate == 'elected' and not pending
+        if state == 'pending':
+            return cstate == 'elected' and bool(pending)
+        return cstate == state
+
+    def voteIndex(self, state='hopeful'):
+        "return the VoteIndex of candidates in state, or None if votes have no raw sort key"
+        key = self.voteKey(self.E)
+        if key is None:
+            return None
+        index = self._voteIndex.get(state)
+        if index is None or index.key is not key:
+            index = self._voteIndex[state] = self.VoteIndex(self, state, self.E.V)
+        return index
+
+    def lowest(self, state='hopeful'):
+        "return the candidates in state tied for the lowest vote, in CID order"
+        index = self.voteIndex(state)
+        if index is not None:
+            return index.lowest()
+        low_vote = min(c.vote for c in self._list(state))
+        return [c for c in self._list(state) if c.vote == low_vote]
+
+    def highest(self, state='pending'):
+        "return the candidates in state tied for the highest vote, in CID order"
+        index = self.voteIndex(state)
+        if index is not None:
+            return index.highest()
+        high_vote = max(c.vote for c in self._list(state))
+        return [c for c in self._list(state) if c.vote == high_vote]
+
+    def withinLowest(self, margin, state='hopeful'):
+        "return the candidates in state with votes within margin of the lowest, in CID order"
+        index = self.voteIndex(state)
+        if index is not None:
+            return index.withinLowest(margin)
+        low_vote = self.E.V.min([c.vote for c in self._list(state)])
+        return [c for c in self._list(state) if (low_vote + margin) >= c.vote]
+
     @staticmethod
     def byTieOrder(candidates, reverse=False):
         "sort a list of candidates by tie-break order"
@@ -363,21 +968,19 @@ class Candidates(set):
         "select and return list of candidates with specified state, optionally in specified order"
         if state == 'all':
             candidates = self   # set of all
-        elif state == 'eligible':
-            candidates = [c for c in self if c.state != 'withdrawn']
-        elif state == 'pending':
-            candidates = [c for c in self if c.state == 'elected' and c.pending]
-        elif state == 'notpending':
-            candidates = [c for c in self if c.state == 'elected' and not c.pending]
         else:
-            candidates = [c for c in self if c.state == state]  # list of all
+            candidates = self._list(state)
         if order == 'none':
-            return candidates
+            return candidates if state == 'all' else list(candidates)
         if order == 'ballot':
             return self.byBallotOrder(candidates, reverse=reverse)
         if order == 'tie':
             return self.byTieOrder(candidates, reverse=reverse)
         if order == 'vote':
+            index = None if state == 'all' else self.voteIndex(state)
+            if index is not None:
+                cands = index.ordered()
+                return cands[::-1] if reverse else cands
             return self.byVote(candidates, reverse=reverse)
         raise ValueError('unknown candidate sort order: %s' % order)
 
@@ -413,6 +1016,9 @@ class Candidates(set):
 class Candidate(object):
     '''
     a candidate, with state
+    
+    Once the candidate is added to a Candidates, its mutable state
+    is kept in the Candidates arrays; until then, in the candidate.
     '''
     def __init__(self, E, cid, ballotOrder, tieOrder, cname, cnick, isWithdrawn):
         "new candidate"
@@ -423,15 +1029,78 @@ class Candidate(object):
         self.tieOrder = tieOrder    # tie-breaking order
         self.name = cname           # candidate name
         self.nick = str(cid) if cnick is None else str(cnick)
+        self._C = None              # containing Candidates (see Candidates._register)
         # mutable properties
-        self.state = 'withdrawn' if isWithdrawn else 'hopeful'  # withdrawn, hopeful, elected, etc
+        self._state = 'withdrawn' if isWithdrawn else 'hopeful'  # withdrawn, hopeful, elected, etc
+        self._pending = None        # surplus-transfer pending (wigm)
         if E is None:
-            self.vote = None        # in support of unit tests
+            self._vote = None       # in support of unit tests
         else:
-            self.vote = E.V0        # current vote total
-        self.kf = None              # current keep factor (meek)
+            self._vote = E.V0       # current vote total
+        self._kf = None             # current keep factor (meek)
         self.quotient = None        # current quotient (qpq)
-        self.pending = None         # surplus-transfer pending (wigm)
+
+    @property
+    def state(self):
+        "candidate state: withdrawn, hopeful, elected or defeated"
+        if self._C is None:
+            return self._state
+        return Candidates.states[self._C.arrays.state[self.cid]]
+
+    @state.setter
+    def state(self, state):
+        "set candidate state, keeping our Candidates partitions current"
+        if self._C is None:
+            self._state = state
+        else:
+            self._C._restate(self, state, self.pending)
+
+    @property
+    def pending(self):
+        "surplus-transfer pending (wigm)"
+        if self._C is None:
+            return self._pending
+        return self._C.arrays.pending[self.cid]
+
+    @pending.setter
+    def pending(self, pending):
+        "set surplus-transfer pending, keeping our Candidates partitions current"
+        if self._C is None:
+            self._pending = pending
+        else:
+            self._C._restate(self, self.state, pending)
+
+    @property
+    def vote(self):
+        "current vote total"
+        if self._C is None:
+            return self._vote
+        return self._C.arrays.vote[self.cid]
+
+    @vote.setter
+    def vote(self, vote):
+        "set current vote total"
+        if self._C is None:
+            self._vote = vote
+        else:
+            C = self._C
+            C.arrays.vote[self.cid] = vote
+            C._votesChanged += 1    # the vote indexes are out of order (see VoteIndex)
+
+    @property
+    def kf(self):
+        "current keep factor (meek)"
+        if self._C is None:
+            return self._kf
+        return self._C.arrays.kf[self.cid]
+
+    @kf.setter
+    def kf(self, kf):
+        "set current keep factor"
+        if self._C is None:
+            self._kf = kf
+        else:
+            self._C.arrays.kf[self.cid] = kf
 
     def as_dict(self, ro=False, rw=False):
         "return as a dict suitable for JSON encoding"
@@ -83,7 +83,8 @@ class Options(object):
     def unused(self):
         "return list of unused options"
         opts = set(self.file_options.keys()) | set(self.cmd_options.keys())
-        opts -= set(('rule', 'path'))
+        opts -= set(('rule', 'path', 'coalesce', 'workers', 'cache', 'cachesize', 'cvr', 'seats',
+            'contests', 'validate'))
         opts -= set(self.default.keys())
         return sorted(opts)
 
@@ -24,11 +24,324 @@ from __future__ import absolute_import
 import array
 import re
 import codecs
+import sys
+import struct
+import mmap
+import json
+import os
+import hashlib
+import tempfile
+import multiprocessing
+import itertools
+import operator
+import binascii
+import csv
+import zlib
+import bz2
+try:
+    import lzma                 # Python 3, or the backports.lzma package
+except ImportError:             # pragma: no cover
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+from .common import droopVersion
+from .analytics import ProfileAnalytics
 
 class ElectionProfileError(Exception):
     "error processing election profile"
 
 
+def bltCanonical(tokens, nCand):
+    '''
+    recognize a canonical ballot line: "multiplier cid cid ... 0"
+    
+    The multiplier must be nonzero, and every cid a valid decimal CID (1..nCand).
+    Return (multiplier, [cids]), or None if the line is in any other form,
+    in which case it is tokenized normally (and any errors reported there).
+    '''
+    if len(tokens) < 3 or tokens[-1] != '0' or not ''.join(tokens).isdigit():
+        return None
+    vals = map(int, tokens)
+    cids = vals[1:-1]
+    if not vals[0] or 0 in cids or max(cids) > nCand:
+        return None
+    return vals[0], cids
+
+def bltParseChunk(args):
+    '''
+    parse a chunk of a blt ballot section in a worker process (see ElectionProfile.bltParseParallel)
+    
+    args is (path, start, end, nCand, withdrawn, typecode): the chunk is the whole lines
+    beginning in bytes start..end-1 of the file at path.
+    
+    Parse canonical ballot lines (see bltCanonical) until the ballot section's
+    terminating "0" line, the end of the chunk, or a line in any other form.
+    Return a dict:
+      lines: number of lines read
+      end: (chunk line number, file offset following it) of the terminating line, or None
+      other: chunk line number of the first line in another form, or None
+      dupe: (chunk line number, cid) of the first duplicated candidate ID, or None
+      nBallots: the number of ballots parsed
+      cids, offsets, multipliers, numbers: the BallotLines arrays (local offsets and line numbers), as strings
+    '''
+    path, start, end, nCand, withdrawn, typecode = args
+    cids = array.array(typecode)
+    offsets = array.array('l')
+    multipliers = array.array('l')
+    numbers = array.array('l')
+    result = dict(lines=0, end=None, other=None, dupe=None, nBallots=0)
+    f = open(path, 'rb')
+    try:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            result['lines'] += 1
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens == ['0']:
+                result['end'] = (result['lines'], pos)
+                break
+            ballot = bltCanonical(tokens, nCand)
+            if ballot is None:
+                result['other'] = result['lines']
+                break
+            multiplier, ranking = ballot
+            if withdrawn:
+                ranking = [cid for cid in ranking if cid not in withdrawn]
+            if not ranking:
+                continue
+            if result['dupe'] is None and len(set(ranking)) != len(ranking):
+                seen = set()
+                for cid in ranking:
+                    if cid in seen:
+                        result['dupe'] = (result['lines'], cid)
+                        break
+                    seen.add(cid)
+            cids.extend(ranking)
+            offsets.append(len(cids))
+            multipliers.append(multiplier)
+            numbers.append(result['lines'])
+            result['nBallots'] += multiplier
+    finally:
+        f.close()
+    result.update(cids=cids.tostring(), offsets=offsets.tostring(),
+        multipliers=multipliers.tostring(), numbers=numbers.tostring())
+    return result
+
+def bltMergeParse(path):
+    "parse one ballot file to be merged, in a worker process (see ElectionProfile.bltMergePart)"
+    return ElectionProfile.bltMergePart(path)
+
+#  cast-vote records
+#
+cvrRankColumn = re.compile(r'\s*(?:rank|choice|preference)\s*_?(\d+)\s*$', re.I)
+cvrIdColumn = re.compile(r'\s*(?:(?:ballot|cvr|record)\s*_?)?id\s*$', re.I)
+cvrContestColumn = re.compile(r'\s*contest\s*$', re.I)
+
+def cvrCell(cell):
+    '''
+    convert a CVR rank cell to a list of candidate names
+    
+    A blank cell, "undervote" or "skipped" is a skipped rank: [].
+    Several names separated by "=" are an overvote; so is "overvote",
+    whose candidates are unknown: [None].
+    '''
+    cell = cell.strip()
+    if cell.lower() in ('', 'undervote', 'skipped'):
+        return []
+    if cell.lower() == 'overvote':
+        return [None]
+    return [name.strip() for name in cell.split('=')]
+
+def cvrCsvRecords(lines):
+    '''
+    read cast-vote records from CSV lines, a record at a time
+    
+    The first row names the columns. Rank columns are named "rank N", "choice N"
+    or "preference N" and are taken in order of N; an "id" (or "ballot id",
+    "cvr id", "record id") column and a "contest" column are optional.
+    Each rank cell is a candidate name or a mark (see cvrCell).
+    
+    yield (record number, id, contest, ranks), with ranks a list of cvrCell lists
+    '''
+    reader = csv.reader(lines)
+    try:
+        header = next(reader)
+        rankColumns = list()
+        idColumn = contestColumn = None
+        for i, name in enumerate(header):
+            m = cvrRankColumn.match(name)
+            if m:
+                rankColumns.append((int(m.group(1)), i))
+            elif cvrIdColumn.match(name):
+                idColumn = i
+            elif cvrContestColumn.match(name):
+                contestColumn = i
+        if not rankColumns:
+            raise ElectionProfileError('bad CVR file: no rank columns')
+        rankColumns = [i for n, i in sorted(rankColumns)]
+        number = 0
+        for row in reader:
+            if not row:
+                continue                # blank line
+            number += 1
+            row.extend([''] * (len(header) - len(row)))
+            yield (number, None if idColumn is None else (row[idColumn].strip() or None),
+                None if contestColumn is None else row[contestColumn],
+                [cvrCell(row[i]) for i in rankColumns])
+    except StopIteration:
+        raise ElectionProfileError('bad CVR file: no header row')
+    except csv.Error as emsg:
+        raise ElectionProfileError('bad CVR file near line %d (%s)' % (reader.line_num, emsg))
+
+def cvrJsonRecords(lines):
+    '''
+    read cast-vote records from JSON lines, a record at a time
+    
+    Each nonblank line is an object with a "ranks" list and optional "id" (a string
+    or number) and "contest" members. A rank is a candidate name or a mark (see cvrCell),
+    null (skipped), or a list of names (an overvote if there's more than one).
+    
+    yield (record number, id, contest, ranks), with ranks a list of cvrCell lists
+    '''
+    def text(s):
+        "names are byte strings, as in a blt file"
+        return s.encode('utf-8') if isinstance(s, unicode) else s
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as emsg:
+            raise ElectionProfileError('bad CVR record %d (%s)' % (number, emsg))
+        if not isinstance(record, dict) or not isinstance(record.get('ranks'), list):
+            raise ElectionProfileError('bad CVR record %d: no ranks list' % number)
+        ranks = list()
+        for rank in record['ranks']:
+            if rank is None:
+                ranks.append([])
+            elif isinstance(rank, basestring):
+                ranks.append(cvrCell(text(rank)))
+            elif isinstance(rank, list) and all(isinstance(name, basestring) for name in rank):
+                ranks.append([text(name).strip() for name in rank])
+            else:
+                raise ElectionProfileError('bad CVR record %d: bad rank %s' % (number, json.dumps(rank)))
+        bid = record.get('id')
+        if bid is not None:
+            bid = text(bid).strip() if isinstance(bid, basestring) else json.dumps(bid)
+        yield number, bid or None, text(record.get('contest')), ranks
+
+#  compressed ballot files, by magic number
+#
+bltCompressions = (
+    ('gzip', '\x1f\x8b', lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+    ('bz2', 'BZh', bz2.BZ2Decompressor),
+    ('xz', '\xfd7zXZ\x00', lzma and lzma.LZMADecompressor),
+)
+
+def bltCompression(path):
+    "return the (name, magic, decompressor factory) of the compression of the file at path, or None"
+    try:
+        f = open(path, 'rb')
+        try:
+            head = f.read(6)
+        finally:
+            f.close()
+    except Exception as emsg:
+        raise ElectionProfileError("can't open ballot file %s (%s)" % (path, emsg))
+    for compression in bltCompressions:
+        if head.startswith(compression[1]):
+            return compression
+    return None
+
+class DecompressedLines(object):
+    '''
+    the lines of a compressed ballot file, decompressed as they're read
+    
+    Iterating yields the same lines as a file opened with universal newlines,
+    decompressing a block at a time; concatenated gzip members or bz2 streams
+    are read in turn. close() closes the file.
+    '''
+    blockSize = 1024*1024
+
+    def __init__(self, path, compression):
+        "open the compressed file at path"
+        self.path = path
+        self.name, magic, self.decompressor = compression  # pylint: disable=W0612
+        if self.decompressor is None:
+            raise ElectionProfileError("can't read %s-compressed ballot file %s (no %s module)" % \
+                (self.name, path, 'lzma'))
+        self.f = open(path, 'rb')
+
+    def blocks(self):
+        "yield the decompressed blocks"
+        f = self.f
+        decompressor = self.decompressor()
+        ended = False       # has decompressor reached the end of its member or stream?
+        while True:
+            data = f.read(self.blockSize)
+            if not data:
+                break
+            text = ''
+            while data:
+                if ended:                       # the next member or stream, perhaps after padding
+                    data = data.lstrip('\x00')
+                    if not data:
+                        break
+                    decompressor, ended = self.decompressor(), False
+                try:
+                    text += decompressor.decompress(data)
+                except EOFError:                # a Python 2 bz2 stream already ended (at a block boundary)
+                    ended = True
+                    continue
+                data = decompressor.unused_data
+                ended = bool(data) or getattr(decompressor, 'eof', False)
+            yield text
+        if hasattr(decompressor, 'flush'):
+            yield decompressor.flush()
+
+    def __iter__(self):
+        "yield lines with universal newlines"
+        rest = ''
+        try:
+            for text in self.blocks():
+                text = rest + text
+                held = ''
+                if '\r' in text:
+                    if text.endswith('\r'):    # perhaps half of \r\n
+                        text, held = text[:-1], '\r'
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                lines = text.splitlines(True)
+                rest = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+                rest += held
+                for line in lines:
+                    yield line
+        except (IOError, EOFError, zlib.error) as emsg:
+            raise ElectionProfileError("can't read %s-compressed ballot file %s (%s)" % \
+                (self.name, self.path, emsg))
+        if rest:
+            yield rest.replace('\r', '\n')
+
+    def close(self):
+        "close the file"
+        self.f.close()
+
+def cvrRecords(lines, fmt):
+    "read cast-vote records in format fmt ('csv' or 'json'); see cvrCsvRecords"
+    if fmt == 'csv':
+        return cvrCsvRecords(lines)
+    if fmt == 'json':
+        return cvrJsonRecords(lines)
+    raise ElectionProfileError('unknown CVR format %s (use csv or json)' % fmt)
+
 class ElectionProfile(object):
     '''
     Election profile
@@ -36,6 +349,17 @@ class ElectionProfile(object):
     Given a path to a blt-format ballot file, or such a file's contents,
     create and return an election profile instance.
     
+    If coalesce is true, ballot lines with identical rankings are merged
+    into a single line whose multiplier is their sum. Lines with ballot IDs
+    are never merged. Ballot-line order is then that of first appearance.
+    
+    A ballot file (blt or CVR) may be gzip, bz2 or xz-compressed; it is
+    decompressed as it's parsed (see bltOpen).
+    
+    A path may also name a binary profile (see binWrite), which is
+    memory-mapped rather than parsed; its ballot lines are read in place
+    and its pages are shared by processes that map the same file.
+    
     The resulting election profile is passed to Election for counting.
     
     The public interface of ElectionProfile:
@@ -50,9 +374,10 @@ class ElectionProfile(object):
     withdrawn: the set of withdrawn candidate IDs
         eligible and withdrawn should be treated as frozenset (unordered and immutable)
         though they may be implemented as any iterable.
-    ballotLines: a list of BallotLine objects with not equal rankings, each with a:
+    ballotLines: a sequence of BallotLine objects with not equal rankings, each with a:
        multiplier: a repetition count >=1
        ranking: an array of candidate IDs
+       (ballotLines is stored compactly as a BallotLines object; see below)
     ballotLinesequal: a list of BallotLine objects with at least one equal ranking, each with a:
        multiplier: a repetition count >=1
        ranking: tuple of tuples of candidate IDs
@@ -64,11 +389,48 @@ class ElectionProfile(object):
 
     All attributes should be treated as immutable.
 
+    If workers is greater than 1, the ballot section of the file at path is
+    split into chunks and parsed by that many processes (see bltParseParallel).
+    
+    If cvr is a dict of import options, the path or data holds cast-vote
+    records (CSV or JSON lines) rather than blt; see cvrParse.
+    
+    view() returns a what-if variant of a profile (further withdrawn candidates,
+    truncated rankings, a subset of the ballots) that shares its ballot lines.
+    
     Private attributes have a leading underscore and are not intended for external consumption
     '''
     
-    def __init__(self, path=None, data=None):
+    def __init__(self, path=None, data=None, coalesce=False, workers=1, cvr=None):
         "initialize profile"
+        self.__initialize(coalesce)
+
+        parse = self.bltParse
+        if cvr is not None:
+            cvr = self.__cvrOptions(path, cvr)
+            parse = lambda data: self.cvrParse(data, cvr)
+        if path and self.binIs(path):
+            self.binLoad(path)          # validated when written; skip the per-line checks
+            self.__validate(lines=False)
+            return
+        if path and workers > 1 and cvr is None and self.bltParseParallel(path, workers):
+            pass                        # parsed and validated in parallel
+        else:
+            if path:
+                f = self.bltOpen(path)
+                try:
+                    parse(f)            # stream the file a line at a time
+                finally:
+                    f.close()
+            elif not data:
+                raise ElectionProfileError('no profile data')
+            else:
+                parse(data)
+            self.__validate()
+        self.__defaults()
+
+    def __initialize(self, coalesce):
+        "initialize an empty profile"
         self.title = None
         self.source = None
         self.comment = None
@@ -80,13 +442,14 @@ class ElectionProfile(object):
         self.candidateName = dict()   # cid => candidate name
         self.candidateOrder = dict()  # cid -> ballot order
         #
-        #  ballotLines is a list of BallotLine objects for ballots with no equal rankings
+        #  ballotLines is a BallotLines store of ballots with no equal rankings
         #    ranking is an array of cids
         #  ballotLinesEqual is a list of BallotLine objects with at least one equal ranking
         #    ranking is a tuple of tuples of cids
         #
-        self.ballotLines = list()
+        self.ballotLines = self.BallotLines()
         self.ballotLinesEqual = list()
+        self.ballotIDs = self.BallotIDs()  # the IDs of ballots that have them, and their lines
         self.tieOrder = dict()        # tiebreaking cid sequence: cid->order
         self.nickName = dict()        # cid to nick
         self.options = list()         # list of options for main counter
@@ -95,13 +458,17 @@ class ElectionProfile(object):
         #
         self._nickCid = dict()        # nick to cid
         self.lineNumber = 0           # line number during parsing
+        self._ballotStart = False     # about to read a ballot's multiplier or ID (enables fast path)
+        self._ballotsAtLine = None    # line number of the ballot section, if it starts a line
+        self._coalesce = dict() if coalesce else None  # ranking key -> line, while parsing
+        self._mmap = None             # binary profile mapping
+        self._cvr = None              # CVR import state, while parsing (see cvrBegin)
+        self._summary = None          # validate-only tallies, while parsing (see bltValidate)
+        self._postings = None         # candidate -> ballot-line index, once built (see postings)
+        self._analytics = None        # summary statistics, once computed (see analytics)
 
-        if path:
-            data = self.bltRead(path)
-        if not data:
-            raise ElectionProfileError('no profile data')
-        self.bltParse(data)
-        self.__validate()
+    def __defaults(self):
+        "supply default nicknames and tie-break order"
         if not self._nickCid:         # create default nicknames: str(cid)
             for cid in xrange(1, self.nCand+1):
                 self._nickCid[str(cid)] = cid
@@ -137,29 +504,559 @@ class ElectionProfile(object):
             if len(ranking) == 0:
                 self.ranking = None     # empty ballot line
             elif equal_rank:
-                profile.nBallots += multiplier
                 self.ranking = tuple(ranking)
             else:
-                profile.nBallots += multiplier
                 ranking = [rank[0] for rank in ranking] # possibly empty
-                self.ranking = array.array('B' if profile.nCand<=256 else 'H', ranking)
-            
-    def __validate(self):
-        "check profile for internal consistency"
-        if not self.nSeats or self.nSeats > len(self.eligible):
+                self.ranking = array.array(profile.ballotLines.typecode, ranking)
+
+        @classmethod
+        def view(cls, multiplier, ranking, line):
+            "create a ballot-line object directly from its parts (see BallotLines)"
+            bl = cls.__new__(cls)
+            bl.multiplier = multiplier
+            bl.ranking = ranking
+            bl.line = line
+            return bl
+
+    class BallotLines(object):
+        '''
+        compact (CSR) storage for ballot lines with no equal rankings
+        
+        cids: one flat array of the candidate IDs of all the rankings
+        offsets: the ranking of line i is cids[offsets[i]:offsets[i+1]]
+        multipliers: the multiplier of each line
+        lines: the ballot-file line number of each line
+        
+        Indexing or iterating returns lightweight BallotLine views,
+        so a BallotLines object can be used as a list of BallotLine objects.
+        '''
+
+        def __init__(self, nCand=255):
+            "create an empty ballot-line store"
+            self.typecode = 'B' if nCand <= 255 else 'H'
+            self.cids = array.array(self.typecode)
+            self.offsets = array.array('l', [0])
+            self.multipliers = array.array('l')
+            self.lines = array.array('l')
+
+        def append(self, multiplier, ranking, line):
+            "append a ballot line (ranking is a nonempty sequence of cids)"
+            self.cids.extend(ranking)
+            self.offsets.append(len(self.cids))
+            self.multipliers.append(multiplier)
+            self.lines.append(line)
+
+        def truncate(self, n):
+            "drop the lines following the first n"
+            del self.cids[self.offsets[n]:]
+            del self.offsets[n+1:]
+            del self.multipliers[n:]
+            del self.lines[n:]
+
+        def ranking(self, i):
+            "return the ranking of line i as an array of cids"
+            return self.cids[self.offsets[i]:self.offsets[i+1]]
+
+        def __len__(self):
+            "number of ballot lines"
+            return len(self.multipliers)
+
+        def __getitem__(self, i):
+            "return a BallotLine view of line i"
+            if i < 0:
+                i += len(self.multipliers)
+            if i < 0 or i >= len(self.multipliers):
+                raise IndexError('ballot line index out of range')
+            return ElectionProfile.BallotLine.view(self.multipliers[i], self.ranking(i), self.lines[i])
+
+        def __iter__(self):
+            "iterate over BallotLine views"
+            view = ElectionProfile.BallotLine.view
+            cids, offsets, lines = self.cids, self.offsets, self.lines
+            for i, multiplier in enumerate(self.multipliers):
+                yield view(multiplier, cids[offsets[i]:offsets[i+1]], lines[i])
+
+    class MappedArray(object):
+        '''
+        read-only array of n items of the given typecode, in place in a buffer (such as an mmap)
+        
+        Indexing returns an item; slicing returns an array copy of just the slice.
+        '''
+
+        def __init__(self, buf, offset, typecode, n):
+            "map an array onto buf"
+            self.buf = buf
+            self.offset = offset
+            self.typecode = typecode
+            self.n = n
+            self.itemsize = struct.calcsize(typecode)
+            self._unpack = struct.Struct(typecode).unpack_from
+
+        def __len__(self):
+            "number of items"
+            return self.n
+
+        def __getitem__(self, i):
+            "return an item, or an array for a slice"
+            if isinstance(i, slice):
+                start, stop, step = i.indices(self.n)
+                a = array.array(self.typecode)
+                if stop > start:
+                    a.fromstring(self.buf[self.offset+start*self.itemsize:self.offset+stop*self.itemsize])
+                return a if step == 1 else a[::step]
+            if i < 0:
+                i += self.n
+            if i < 0 or i >= self.n:
+                raise IndexError('array index out of range')
+            return self._unpack(self.buf, self.offset + i*self.itemsize)[0]
+
+        def __iter__(self):
+            "iterate over the items, a chunk at a time"
+            for start in xrange(0, self.n, 4096):
+                for item in self[start:start+4096]:
+                    yield item
+
+        def tostring(self):
+            "the items' bytes"
+            return self.buf[self.offset:self.offset+self.n*self.itemsize]
+
+    class ProfileView(object):
+        '''
+        a what-if variant of a profile, sharing its ballot lines (see ElectionProfile.view)
+        
+        A view has the public attributes of the profile, so an Election can be built
+        from it. Candidates in the withdrawn mask are withdrawn; each ranking is
+        truncated to its first maxRank ranks (as stored), then masked; only the
+        selected lines are included, and lines left empty are dropped.
+        
+        Selected lines are found when the view is made; their rankings are truncated
+        and masked only as they're read, and the profile's arrays aren't copied.
+        '''
+
+        def __init__(self, profile, withdrawn=(), maxRank=None, lines=None, linesEqual=None):
+            "make a view of profile"
+            self.profile = profile
+            mask = frozenset(withdrawn) - profile.withdrawn
+            for cid in mask:
+                if cid not in profile.eligible:
+                    raise ElectionProfileError('candidate ID %s not in profile' % cid)
+            if lines is not None:
+                lines = array.array('l', lines)
+                if lines and not 0 <= min(lines) <= max(lines) < len(profile.ballotLines):
+                    raise ElectionProfileError('ballot line index out of range (%d lines)' % len(profile.ballotLines))
+            if linesEqual is not None:
+                linesEqual = array.array('l', linesEqual)
+                if linesEqual and not 0 <= min(linesEqual) <= max(linesEqual) < len(profile.ballotLinesEqual):
+                    raise ElectionProfileError('equal-ranking ballot line index out of range (%d lines)' % \
+                        len(profile.ballotLinesEqual))
+            for name in ('title', 'source', 'comment', 'nSeats', 'nCand', 'options',
+                         'candidateName', 'candidateOrder', 'tieOrder', 'nickName'):
+                setattr(self, name, getattr(profile, name))
+            self.eligible = profile.eligible - mask
+            self.withdrawn = profile.withdrawn | mask
+            affected = None
+            if mask:                    # only the lines ranking a masked candidate need masking
+                postings = profile.postings()
+                affected = set(itertools.chain.from_iterable(postings.lines[cid] for cid in mask))
+            self.ballotLines = ElectionProfile.BallotLinesView(profile.ballotLines, mask, maxRank, lines, affected)
+            self.ballotLinesEqual = list()
+            BallotLine = ElectionProfile.BallotLine
+            for i in (xrange(len(profile.ballotLinesEqual)) if linesEqual is None else linesEqual):
+                bl = profile.ballotLinesEqual[i]
+                ranking = bl.ranking[:maxRank]
+                if mask:
+                    ranking = tuple(r for r in ([cid for cid in rank if cid not in mask] for rank in ranking) if r)
+                if ranking:
+                    self.ballotLinesEqual.append(BallotLine.view(bl.multiplier, ranking, bl.line))
+            self.nBallots = sum(self.ballotLines.multipliers) + \
+                sum(bl.multiplier for bl in self.ballotLinesEqual)
+            self._analytics = None
+
+        def analytics(self):
+            "return the ProfileAnalytics of this view (see ElectionProfile.analytics)"
+            if self._analytics is None:
+                self._analytics = ProfileAnalytics(self)
+            return self._analytics
+
+    class BallotLinesView(object):
+        '''
+        the selected, truncated and masked lines of a BallotLines store (see ProfileView)
+        
+        multipliers and lines hold the values of the lines in the view, and ranking(i)
+        truncates and masks the store's ranking of line i as it's read; indexing and
+        iterating return BallotLine views, as with BallotLines.
+        
+        affected is the set of store lines ranking a masked candidate (see Postings);
+        the others are never masked.
+        '''
+
+        def __init__(self, store, mask, maxRank, lines, affected=None):
+            "view lines (or all) of store"
+            self.store = store
+            self.mask = mask
+            self.maxRank = maxRank
+            self.affected = affected
+            self.typecode = store.typecode
+            cids, offsets = store.cids, store.offsets
+            index = xrange(len(store)) if lines is None else lines
+            if mask:                    # drop the lines left empty by the mask
+                dropped = set(i for i in affected if mask.issuperset(cids[offsets[i]:offsets[i+1]][:maxRank]))
+                if dropped and lines is None:
+                    keep = bytearray('\x01') * len(store)
+                    for i in dropped:
+                        keep[i] = 0
+                    index = itertools.compress(index, keep)
+                elif dropped:
+                    index = [i for i in index if i not in dropped]
+            self.index = array.array('l', index)
+            self.multipliers = array.array('l', (store.multipliers[i] for i in self.index))
+            self.lines = array.array('l', (store.lines[i] for i in self.index))
+
+        def ranking(self, i):
+            "return the ranking of line i of the view as an array of cids"
+            i = self.index[i]
+            start, end = self.store.offsets[i], self.store.offsets[i+1]
+            if self.maxRank is not None:
+                end = min(end, start + self.maxRank)
+            ranking = self.store.cids[start:end]
+            if self.mask and i in self.affected:
+                mask = self.mask
+                ranking = array.array(self.typecode, [cid for cid in ranking if cid not in mask])
+            return ranking
+
+        def __len__(self):
+            "number of ballot lines"
+            return len(self.index)
+
+        def __getitem__(self, i):
+            "return a BallotLine view of line i"
+            if i < 0:
+                i += len(self.index)
+            if i < 0 or i >= len(self.index):
+                raise IndexError('ballot line index out of range')
+            return ElectionProfile.BallotLine.view(self.multipliers[i], self.ranking(i), self.lines[i])
+
+        def __iter__(self):
+            "iterate over BallotLine views"
+            for i in xrange(len(self.index)):
+                yield self[i]
+
+    class Postings(object):
+        '''
+        an inverted index of a profile's ballot lines by candidate (see ElectionProfile.postings)
+        
+        lines[cid]: the indices in ballotLines of the lines ranking cid, in order
+        ranks[cid]: cid's rank on each of those lines (0 for first)
+        linesEqual[cid], ranksEqual[cid]: the same, for ballotLinesEqual
+        
+        Each is an array. The index covers the profile's first nLines ballot lines
+        and first nLinesEqual equal-ranking lines, and update indexes any others.
+        '''
+
+        def __init__(self, nCand, typecode):
+            "create an empty index"
+            cids = xrange(1, nCand+1)
+            self.lines = dict((cid, array.array('l')) for cid in cids)
+            self.ranks = dict((cid, array.array(typecode)) for cid in cids)
+            self.linesEqual = dict((cid, array.array('l')) for cid in cids)
+            self.ranksEqual = dict((cid, array.array(typecode)) for cid in cids)
+            self.typecode = typecode
+            self.nLines = 0
+            self.nLinesEqual = 0
+
+        def update(self, profile):
+            "index the ballot lines of profile added since the last update"
+            BL = profile.ballotLines
+            start, end = self.nLines, len(BL)
+            if end > start:
+                offsets = BL.offsets[start:end+1]
+                lengths = map(operator.sub, offsets[1:], offsets[:-1])
+                chain = itertools.chain.from_iterable
+                lineOf = chain(itertools.imap(itertools.repeat, xrange(start, end), lengths))
+                rankOf = chain(itertools.imap(xrange, lengths))
+                addLine = dict((cid, lines.append) for cid, lines in self.lines.iteritems())
+                addRank = dict((cid, ranks.append) for cid, ranks in self.ranks.iteritems())
+                for cid, line, rank in itertools.izip(BL.cids[offsets[0]:offsets[-1]], lineOf, rankOf):
+                    addLine[cid](line)
+                    addRank[cid](rank)
+                self.nLines = end
+            for i in xrange(self.nLinesEqual, len(profile.ballotLinesEqual)):
+                for r, rank in enumerate(profile.ballotLinesEqual[i].ranking):
+                    for cid in rank:
+                        self.linesEqual[cid].append(i)
+                        self.ranksEqual[cid].append(r)
+            self.nLinesEqual = len(profile.ballotLinesEqual)
+
+    def postings(self):
+        '''
+        return the Postings index of this profile's ballot lines by candidate
+        
+        The index is built on first use, and brought up to date with any
+        lines appended since (see appendBallots).
+        '''
+        if self._postings is None:
+            self._postings = self.Postings(self.nCand, self.ballotLines.typecode)
+        self._postings.update(self)
+        return self._postings
+
+    def analytics(self):
+        '''
+        return the ProfileAnalytics of this profile (first preferences, ranking
+        lengths, ranked shares and pairwise preferences)
+        
+        They're computed on first use, and again if lines have been appended since.
+        '''
+        if self._analytics is None or \
+                self._analytics.nLines != (len(self.ballotLines), len(self.ballotLinesEqual)):
+            self._analytics = ProfileAnalytics(self)
+        return self._analytics
+
+    class BallotIDs(object):
+        '''
+        compact storage for the ballot IDs of a profile, with a hash index
+        
+        data: the bytes of all the IDs, end to end
+        offsets: ID i is data[offsets[i]:offsets[i+1]]
+        where: the ballot line of ID i: ballotLines[where-1] if where > 0,
+          ballotLinesEqual[-where-1] if where < 0, and none (an empty ballot) if 0
+        hashes: the (32-bit) hash of ID i
+        table: an open-addressed hash table of i+1 for each ID i (0 marks an empty slot),
+          probed as a dict is, since sequential IDs have clustered hashes
+        
+        IDs with the same hash are compared in full, so a collision is never taken for a duplicate.
+        '''
+
+        def __init__(self):
+            "create an empty store"
+            self.data = bytearray()
+            self.offsets = array.array('l', [0])
+            self.where = array.array('l')
+            self.hashes = array.array('i')
+            self.table = array.array('i', [0]) * 1024
+
+        def __find(self, bid, h):
+            "return the table index of bid (with hash h), or of the empty slot where it belongs"
+            table, hashes, data, offsets = self.table, self.hashes, self.data, self.offsets
+            last = len(table) - 1
+            i = perturb = h & 0xffffffff
+            i &= last
+            n = table[i]
+            while n:
+                if hashes[n-1] == h and data[offsets[n-1]:offsets[n]] == bid:
+                    break
+                i = (5*i + perturb + 1) & last
+                perturb >>= 5
+                n = table[i]
+            return i
+
+        @staticmethod
+        def __hash(bid):
+            "the 32-bit signed hash of bid"
+            return ((hash(bid) + 0x80000000) & 0xffffffff) - 0x80000000
+
+        def add(self, bid, where=0):
+            "add bid (a byte string); return False, adding nothing, if it's a duplicate"
+            h = ((hash(bid) + 0x80000000) & 0xffffffff) - 0x80000000     # as __hash, inline for speed
+            table, hashes, data, offsets = self.table, self.hashes, self.data, self.offsets
+            last = len(table) - 1
+            i = perturb = h & 0xffffffff
+            i &= last
+            n = table[i]
+            while n:
+                if hashes[n-1] == h and data[offsets[n-1]:offsets[n]] == bid:
+                    return False
+                i = (5*i + perturb + 1) & last
+                perturb >>= 5
+                n = table[i]
+            data.extend(bid)
+            offsets.append(len(data))
+            self.where.append(where)
+            hashes.append(h)
+            n = table[i] = len(hashes)
+            if n * 2 > last:                    # keep the table at most half full
+                self.__rehash(len(table) * 2)
+            return True
+
+        def __rehash(self, size):
+            "rebuild the hash table with size slots"
+            table = self.table = array.array('i', [0]) * size
+            last = size - 1
+            for n, h in enumerate(self.hashes, 1):
+                i = perturb = h & 0xffffffff
+                i &= last
+                while table[i]:
+                    i = (5*i + perturb + 1) & last
+                    perturb >>= 5
+                table[i] = n
+
+        def truncate(self, n):
+            "drop the IDs following the first n"
+            if n < len(self.hashes):
+                del self.data[self.offsets[n]:]
+                del self.offsets[n+1:]
+                del self.where[n:]
+                del self.hashes[n:]
+                self.__rehash(len(self.table))
+
+        def index(self, bid):
+            "return the index of bid, or None if it's not here"
+            n = self.table[self.__find(bid, self.__hash(bid))]
+            return n - 1 if n else None
+
+        def __contains__(self, bid):
+            "is bid here?"
+            return self.table[self.__find(bid, self.__hash(bid))] != 0
+
+        def __getitem__(self, i):
+            "return ID i"
+            return str(self.data[self.offsets[i]:self.offsets[i+1]])
+
+        def __iter__(self):
+            "iterate over the IDs, in order"
+            data, offsets = self.data, self.offsets
+            for i in xrange(len(self.hashes)):
+                yield str(data[offsets[i]:offsets[i+1]])
+
+        def __len__(self):
+            "number of IDs"
+            return len(self.hashes)
+
+    def ballotLineOf(self, bid):
+        '''
+        return the ballot line of the ballot with ID bid (see BallotIDs),
+        or None if that ballot was empty (or ranked only withdrawn candidates)
+        
+        Lines with ballot IDs are never coalesced, so the line is that ballot's alone.
+        '''
+        i = self.ballotIDs.index(bid)
+        if i is None:
+            raise ElectionProfileError('unknown ballot ID %s' % bid)
+        where = self.ballotIDs.where[i]
+        if where > 0:
+            return self.ballotLines[where-1]
+        if where < 0:
+            return self.ballotLinesEqual[-where-1]
+        return None
+
+    @classmethod
+    def bltValidate(cls, path=None, data=None):
+        '''
+        check a blt file without building its profile, in memory bounded by its candidate count
+        (and the size of its ballot IDs)
+        
+        The file is streamed through the parser, which reports the same errors
+        as a full parse, and then the profile checks are made: ballot and seat
+        counts, then duplicate candidate IDs. Ballot lines are tallied as they're
+        parsed; only ballot IDs, which must be checked for duplicates, are kept.
+        
+        Return a dict of summary statistics:
+          title, nCand, nSeats, nBallots
+          withdrawn: the sorted CIDs of withdrawn candidates
+          candidateName: cid -> candidate name
+          lines: the number of ballot lines; linesEqual: those with equal rankings
+          ballotIDs: the number of ballot IDs
+          firstPrefs: cid -> ballots ranking the candidate first (alone or equally)
+          rankings: n -> ballots ranking n candidates
+        '''
+        profile = cls.__new__(cls)
+        profile.__initialize(False)
+        summary = profile._summary = dict(lines=0, linesEqual=0, ballotIDs=0, dupe=None, dupeEqual=None,
+            firstPrefs=dict(), rankings=dict())
+        if path:
+            f = cls.bltOpen(path)
+            try:
+                profile.bltParse(f)
+            finally:
+                f.close()
+        elif not data:
+            raise ElectionProfileError('no profile data')
+        else:
+            profile.bltParse(data)
+        profile._summary = None
+        cls.__validateCounts(profile)
+        for dupe in (summary.pop('dupe'), summary.pop('dupeEqual')):
+            if dupe:
+                raise ElectionProfileError('candidate ID %s duplicated on line %d' % dupe)
+        summary.update(title=profile.title, nCand=profile.nCand, nSeats=profile.nSeats,
+            nBallots=profile.nBallots, withdrawn=sorted(profile.withdrawn),
+            candidateName=profile.candidateName)
+        return summary
+
+    def __tallyBallotLine(self, multiplier, ranking):
+        "tally a ballot line for bltValidate, noting its first duplicate candidate ID"
+        summary = self._summary
+        equal = isinstance(ranking, tuple)
+        if equal:
+            summary['linesEqual'] += 1
+            cids = [cid for rank in ranking for cid in rank]
+            first = ranking[0]
+        else:
+            cids = ranking
+            first = ranking[:1]
+        summary['lines'] += 1
+        dupe = 'dupeEqual' if equal else 'dupe'
+        if summary[dupe] is None and len(set(cids)) != len(cids):
+            seen = set()
+            for cid in cids:
+                if cid in seen:
+                    summary[dupe] = (cid, self.lineNumber)
+                    break
+                seen.add(cid)
+        firstPrefs = summary['firstPrefs']
+        for cid in first:
+            firstPrefs[cid] = firstPrefs.get(cid, 0) + multiplier
+        rankings = summary['rankings']
+        rankings[len(cids)] = rankings.get(len(cids), 0) + multiplier
+
+    def view(self, withdrawn=(), maxRank=None, lines=None, linesEqual=None):
+        '''
+        return a ProfileView of this profile, for what-if counts without re-parsing
+        
+        withdrawn: the CIDs of further candidates to treat as withdrawn
+        maxRank: count only the first maxRank ranks of each ballot
+        lines, linesEqual: count only these indices of ballotLines and ballotLinesEqual
+        
+        Lines appended to the profile later (see appendBallots) aren't in the view.
+        '''
+        if maxRank is not None and maxRank < 1:
+            raise ElectionProfileError('maximum rank must be at least 1')
+        view = self.ProfileView(self, withdrawn, maxRank, lines, linesEqual)
+        self.__validateCounts(view)
+        return view
+
+    def __validate(self, lines=True):
+        "check profile for internal consistency (and its ballot lines, if lines)"
+        self.__validateCounts(self)
+        if lines:
+            self.__validateLines()
+
+    @staticmethod
+    def __validateCounts(profile):
+        "check the seat and ballot counts of a profile (or view) against its candidates"
+        if not profile.nSeats or profile.nSeats > len(profile.eligible):
             raise ElectionProfileError('too few candidates (%d seats; %d candidates)' % \
-                (self.nSeats, len(self.eligible)))
-        if self.nBallots < len(self.eligible):
+                (profile.nSeats, len(profile.eligible)))
+        if profile.nBallots < len(profile.eligible):
             raise ElectionProfileError('too few ballots (%d ballots; %d candidates)' % \
-                (self.nBallots, len(self.eligible)))
-        for bl in self.ballotLines:
-            d = dict()
-            for cid in bl.ranking:
-                if cid in d:
-                    raise ElectionProfileError('candidate ID %s duplicated on line %d' % \
-                        (cid, bl.line))
-                d[cid] = cid
-        for bl in self.ballotLinesEqual:
+                (profile.nBallots, len(profile.eligible)))
+
+    validateChunk = 1 << 20 # ballot lines checked at a time by __bulkClean
+    bulkMaxRank = 32        # rankings longer than this (in bytes) are checked a line at a time
+    __rankPositions = dict()    # itemsize -> [packed positions 0..n-1 of a ranking of length n]
+
+    def __validateLines(self, first=0, firstEqual=0):
+        '''
+        check ballotLines[first:] and ballotLinesEqual[firstEqual:] for duplicate candidate IDs
+        
+        ballotLines is checked in bulk, a chunk at a time (see __bulkClean); only
+        a chunk that might hold a duplicate is checked line by line, to report it.
+        '''
+        BL = self.ballotLines
+        for start in xrange(first, len(BL), self.validateChunk):
+            end = min(start + self.validateChunk, len(BL))
+            if not self.__bulkClean(BL, start, end):
+                self.__validateLineRange(BL, start, end)
+        for bl in itertools.islice(self.ballotLinesEqual, firstEqual, None):
             d = dict()
             for rank in bl.ranking:
                 for cid in rank:
@@ -168,6 +1065,105 @@ class ElectionProfile(object):
                             (cid, bl.line))
                     d[cid] = cid
 
+    @classmethod
+    def __bulkClean(cls, BL, start, end):
+        '''
+        are lines start..end-1 of BallotLines store BL known to rank no candidate twice?
+        
+        The lines are checked all at once. Their cids are packed into one long
+        integer, a cid per unit of the cid item size, and their positions in their
+        lines into another. A line ranks a candidate twice just when, for some d,
+        a cid equals the one d units before it and its position is at least d;
+        for each d, shifts and masks test every unit at once (a zero unit has
+        no bit set in ((x & low) + low) | x).
+        
+        Rankings too long to check this way (see bulkMaxRank) are checked
+        one at a time, and left out of the packed integers.
+        
+        Return False if there may be a duplicate; the lines should then be
+        checked one at a time, to report it.
+        '''
+        offsets = BL.offsets[start:end+1]
+        lengths = map(operator.sub, offsets[1:], offsets[:-1])
+        if not lengths:
+            return True
+        w = BL.cids.itemsize
+        cids = BL.cids[offsets[0]:offsets[-1]]
+        longest = cls.bulkMaxRank // w + 1  # the longest ranking checked in bulk
+        if max(lengths) > longest:
+            base = offsets[0]
+            short = array.array(BL.cids.typecode)
+            run = 0                         # the first line of the current run of short lines
+            for i, n in enumerate(lengths):
+                if n > longest:
+                    if len(set(cids[offsets[i]-base:offsets[i+1]-base])) < n:
+                        return False
+                    short.extend(cids[offsets[run]-base:offsets[i]-base])
+                    run = i + 1
+            short.extend(cids[offsets[run]-base:])
+            cids = short
+            lengths = [n for n in lengths if n <= longest]
+            if not lengths:
+                return True
+        maxLen = max(lengths)
+        positions = cls.__rankPositions.setdefault(w, [''])
+        while len(positions) <= maxLen:
+            n = len(positions)
+            positions.append(struct.pack('>%d%s' % (n, 'B' if w == 1 else 'H'), *xrange(n)))
+        bits = 8 * w
+        A = int(binascii.hexlify(cids.tostring()), 16)
+        P = int(binascii.hexlify(''.join(itertools.imap(positions.__getitem__, lengths))), 16)
+        ones = int(('00' * (w - 1) + '01') * len(cids), 16)
+        high = ones << (bits - 1)           # the high bit of each unit
+        low = high - ones                   # the other bits
+        for d in xrange(1, maxLen):
+            X = A ^ (A >> bits * d)         # zero units where a cid equals the one d before it
+            same = high & ~(((X & low) + low) | X)
+            inLine = (P + high - ones * d) & high   # units at least d into their line
+            if same & inLine:
+                return False
+        return True
+
+    @staticmethod
+    def __validateLineRange(BL, start, end):
+        "check lines start..end-1 of BallotLines store BL for duplicate candidate IDs, a line at a time"
+        for i in xrange(start, end):
+            d = dict()
+            for cid in BL.ranking(i):
+                if cid in d:
+                    raise ElectionProfileError('candidate ID %s duplicated on line %d' % \
+                        (cid, BL.lines[i]))
+                d[cid] = cid
+
+    def __getstate__(self):
+        '''
+        pickle a profile (to hand it to another process, say)
+        
+        The nested ballot-line classes aren't picklable by name, so the
+        ballot lines are pickled as arrays and tuples, and a mapped binary
+        profile is copied.
+        '''
+        state = self.__dict__.copy()
+        BL = self.ballotLines
+        state['ballotLines'] = (BL.typecode, BL.cids[:], BL.offsets[:], BL.multipliers[:], BL.lines[:])
+        state['ballotLinesEqual'] = [(bl.multiplier, bl.ranking, bl.line) for bl in self.ballotLinesEqual]
+        IDs = self.ballotIDs
+        state['ballotIDs'] = (str(IDs.data), IDs.offsets, IDs.where)
+        state['_mmap'] = None
+        state['_postings'] = None       # rebuilt on demand
+        return state
+
+    def __setstate__(self, state):
+        "unpickle a profile"
+        self.__dict__.update(state)
+        BL = self.ballotLines = self.BallotLines()
+        BL.typecode, BL.cids, BL.offsets, BL.multipliers, BL.lines = state['ballotLines']
+        self.ballotLinesEqual = [self.BallotLine.view(*line) for line in state['ballotLinesEqual']]
+        data, offsets, where = state['ballotIDs']
+        self.ballotIDs = self.BallotIDs()
+        for i, w in enumerate(where):
+            self.ballotIDs.add(data[offsets[i]:offsets[i+1]], w)
+
     def compare(self, other):   # pragma: no cover  # pylint: disable=R0911
         "compare this profile (self) to other (unittest support)"
         if self.title != other.title:
@@ -202,9 +1198,37 @@ class ElectionProfile(object):
                 return 'ballot-line (equal) ranking mismatch'
         return False
 
+    @staticmethod
+    def bltOpen(path):
+        '''
+        open the ballot file for streaming
+        
+        The file is opened with universal newlines, so that iterating
+        over it yields the same lines as splitlines() on its contents,
+        while reading through a fixed-size buffer.
+        
+        A gzip, bz2 or xz-compressed file (recognized by its magic number)
+        is decompressed as it's read (see DecompressedLines).
+        '''
+        compression = bltCompression(path)
+        try:
+            if compression:
+                return DecompressedLines(path, compression)
+            return open(path, 'rU')
+        except ElectionProfileError:
+            raise
+        except Exception as emsg:
+            raise ElectionProfileError("can't open ballot file %s (%s)" % (path, emsg))
+
     @staticmethod
     def bltRead(path):
-        "open and read the ballot file"
+        "open and read the ballot file (decompressing it if need be)"
+        if bltCompression(path):
+            f = ElectionProfile.bltOpen(path)
+            try:
+                return ''.join(f)
+            finally:
+                f.close()
         try:
             f = open(path, 'r')
             data = f.read()
@@ -213,6 +1237,195 @@ class ElectionProfile(object):
         f.close()
         return data
 
+    #  binary profile format
+    #
+    #  header (binHeader, little-endian):
+    #    magic, byte order of the arrays ('<' or '>'), cid item size (1 or 2),
+    #    int item size, length of the metadata, number of ballot lines, number of cids
+    #  metadata: JSON object (everything but the unequal-ranking ballot lines)
+    #  arrays, each starting on an 8-byte boundary:
+    #    cids[nCids], offsets[nLines+1], multipliers[nLines], lines[nLines]
+    #  then, if the metadata's ids is [nBytes, nIDs], the ballot IDs (see BallotIDs):
+    #    data[nBytes], offsets[nIDs+1], where[nIDs]
+    #
+    binMagic = 'DROOPBP\x01'
+    binHeader = struct.Struct('<8scBB5xQQQ')
+
+    @staticmethod
+    def binIs(path):
+        "does path name a binary profile?"
+        try:
+            f = open(path, 'rb')
+        except Exception as emsg:
+            raise ElectionProfileError("can't open ballot file %s (%s)" % (path, emsg))
+        try:
+            return f.read(len(ElectionProfile.binMagic)) == ElectionProfile.binMagic
+        finally:
+            f.close()
+
+    def binWrite(self, path):
+        '''
+        write this profile to path in binary form
+        
+        The binary profile preserves everything but blt comments.
+        '''
+        def text(s):
+            "byte string to JSON string (latin-1 maps bytes one-to-one, whatever the encoding)"
+            return s if s is None else s.decode('latin-1')
+        cids = range(1, self.nCand+1)
+        meta = dict(
+            title=text(self.title), source=text(self.source), comment=text(self.comment),
+            nSeats=self.nSeats, nCand=self.nCand, nBallots=self.nBallots,
+            withdrawn=sorted(self.withdrawn),
+            names=[text(self.candidateName[cid]) for cid in cids],
+            nicks=[text(self.nickName[cid]) for cid in cids],
+            tie=[self.tieOrder[cid] for cid in cids],
+            options=[text(option) for option in self.options],
+            equal=[(bl.multiplier, bl.ranking, bl.line) for bl in self.ballotLinesEqual],
+            )
+        BL = self.ballotLines
+        intcode = BL.multipliers.typecode   # the int arrays, IDs' included, share the header's item size
+        itemsize = struct.calcsize(intcode)
+        IDs = self.ballotIDs
+        blobs = list()
+        if len(IDs):
+            meta['ids'] = [len(IDs.data), len(IDs)]
+            blobs = [str(IDs.data)] + [(a if a.typecode == intcode else array.array(intcode, a)).tostring()
+                for a in (IDs.offsets, IDs.where)]
+        meta = json.dumps(meta)
+        header = self.binHeader.pack(self.binMagic, '<' if sys.byteorder == 'little' else '>',
+            struct.calcsize(BL.typecode), itemsize, len(meta), len(BL), len(BL.cids))
+        try:
+            f = open(path, 'wb')
+        except Exception as emsg:
+            raise ElectionProfileError("can't write binary profile %s (%s)" % (path, emsg))
+        try:
+            for blob in [header, meta, BL.cids.tostring(), BL.offsets.tostring(),
+                BL.multipliers.tostring(), BL.lines.tostring()] + blobs:
+                f.write(blob)
+                f.write('\0' * (-len(blob) % 8))
+        finally:
+            f.close()
+
+    def binLoad(self, path):
+        '''
+        load a binary profile (see binWrite) from path
+        
+        The ballot-line arrays are mapped in place when their layout
+        matches this platform's, and copied (and converted) otherwise.
+        '''
+        try:
+            f = open(path, 'rb')
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                f.close()
+        except Exception as emsg:
+            raise ElectionProfileError("can't open ballot file %s (%s)" % (path, emsg))
+        if len(buf) < self.binHeader.size:
+            raise ElectionProfileError('bad binary profile %s: truncated' % path)
+        magic, order, cidsize, intsize, metalen, nLines, nCids = self.binHeader.unpack_from(buf)
+        if magic != self.binMagic or order not in '<>' or cidsize not in (1, 2) or intsize not in (4, 8):
+            raise ElectionProfileError('bad binary profile %s: bad header' % path)
+        pad = lambda n: n + (-n % 8)
+        offset = pad(self.binHeader.size)
+        sizes = (metalen, nCids*cidsize, (nLines+1)*intsize, nLines*intsize, nLines*intsize)
+        if len(buf) < offset + sum(pad(size) for size in sizes[:-1]) + sizes[-1]:
+            raise ElectionProfileError('bad binary profile %s: truncated' % path)
+        try:
+            meta = json.loads(buf[offset:offset+metalen])
+        except ValueError as emsg:
+            raise ElectionProfileError('bad binary profile %s: bad metadata (%s)' % (path, emsg))
+        offset += pad(metalen)
+
+        def text(s):
+            "JSON string back to byte string (see binWrite)"
+            return s if s is None else s.encode('latin-1')
+        self.title = text(meta['title'])
+        self.source = text(meta['source'])
+        self.comment = text(meta['comment'])
+        self.nSeats = meta['nSeats']
+        self.nCand = meta['nCand']
+        self.nBallots = meta['nBallots']
+        self.withdrawn = set(meta['withdrawn'])
+        self.options = [text(option) for option in meta['options']]
+        for cid in xrange(1, self.nCand+1):
+            if cid not in self.withdrawn:
+                self.eligible.add(cid)
+            self.candidateName[cid] = text(meta['names'][cid-1])
+            self.candidateOrder[cid] = cid
+            self.nickName[cid] = text(meta['nicks'][cid-1])
+            self._nickCid[self.nickName[cid]] = cid
+            self.tieOrder[cid] = meta['tie'][cid-1]
+        self.ballotLinesEqual = [self.BallotLine.view(multiplier, tuple(ranking), line)
+            for multiplier, ranking, line in meta['equal']]
+
+        #  map the arrays in place if we can; otherwise copy them
+        #
+        native = '<' if sys.byteorder == 'little' else '>'
+        intcode = [code for code in ('i', 'l') if struct.calcsize(code) == intsize]
+        def arrayAt(offset, typecode, n, size=intsize):
+            "map or copy an array of n items of the given size"
+            if order == native and typecode:
+                return self.MappedArray(buf, offset, typecode, n)
+            fmt = '%s%d%s' % (order, n, {1:'B', 2:'H', 4:'i', 8:'q'}[size])
+            try:
+                return array.array(typecode or 'l', struct.unpack_from(fmt, buf, offset))
+            except OverflowError:
+                raise ElectionProfileError('bad binary profile %s: integers too large for this platform' % path)
+        self.ballotLines = BL = self.BallotLines(self.nCand)
+        if cidsize != struct.calcsize(BL.typecode):
+            raise ElectionProfileError('bad binary profile %s: bad candidate-ID size' % path)
+        intcode = intcode[-1] if intcode else None
+        BL.cids = arrayAt(offset, BL.typecode, nCids, cidsize)
+        offset += pad(nCids*cidsize)
+        BL.offsets = arrayAt(offset, intcode, nLines+1)
+        offset += pad((nLines+1)*intsize)
+        BL.multipliers = arrayAt(offset, intcode, nLines)
+        offset += pad(nLines*intsize)
+        BL.lines = arrayAt(offset, intcode, nLines)
+        offset += pad(nLines*intsize)
+        if meta.get('ids'):             # the IDs are copied, to index them
+            nBytes, nIDs = meta['ids']
+            if len(buf) < offset + pad(nBytes) + pad((nIDs+1)*intsize) + nIDs*intsize:
+                raise ElectionProfileError('bad binary profile %s: truncated' % path)
+            data = buf[offset:offset+nBytes]
+            offset += pad(nBytes)
+            offsets = arrayAt(offset, intcode, nIDs+1)
+            offset += pad((nIDs+1)*intsize)
+            where = arrayAt(offset, intcode, nIDs)
+            for i in xrange(nIDs):
+                self.ballotIDs.add(data[offsets[i]:offsets[i+1]], where[i])
+        self._mmap = buf
+
+    def blt(self):
+        '''
+        return this profile as blt-format text
+        
+        Comments are not preserved, nor are the IDs of empty ballots.
+        '''
+        cids = xrange(1, self.nCand+1)
+        IDs = self.ballotIDs
+        tag = dict((where, '(%s)' % IDs[i]) for i, where in enumerate(IDs.where) if where)
+        out = ['%d %d' % (self.nCand, self.nSeats)]
+        if self.withdrawn:
+            out.append(' '.join('-%d' % cid for cid in sorted(self.withdrawn)))
+        if any(self.nickName[cid] != str(cid) for cid in cids):
+            out.append('[nick %s]' % ' '.join(self.nickName[cid] for cid in cids))
+        if any(self.tieOrder[cid] != cid for cid in cids):
+            out.append('[tie %s]' % ' '.join(str(cid) for cid in sorted(cids, key=self.tieOrder.get)))
+        if self.options:
+            out.append('[droop %s]' % ' '.join(self.options))
+        for i, bl in enumerate(self.ballotLines):
+            out.append('%s %s 0' % (tag.get(i+1, bl.multiplier), ' '.join(str(cid) for cid in bl.ranking)))
+        for i, bl in enumerate(self.ballotLinesEqual):
+            out.append('%s %s 0' % (tag.get(-i-1, bl.multiplier),
+                ' '.join('='.join(str(cid) for cid in rank) for rank in bl.ranking)))
+        out.append('0')
+        out.extend('"%s"' % self.candidateName[cid] for cid in cids)
+        out.extend('"%s"' % s for s in (self.title, self.source, self.comment) if s is not None)
+        return '\n'.join(out) + '\n'
+
     def getCid(self, nick, loc):
         '''
         convert a nick (or cid) to a cid, and validate the cid
@@ -286,24 +1499,502 @@ class ElectionProfile(object):
             raise ElectionProfileError('bad blt item "%s": unknown option' % option)
 
     def bltParse(self, data):
-        "parse a blt data blob, catching iteration exceptions"
+        '''
+        parse a blt data blob, catching iteration exceptions
+        
+        data is either a string or an iterable of lines (such as an open file)
+        '''
         try:
             self._bltParse(data)
         except StopIteration:
             raise ElectionProfileError('bad blt file: unexpected end-of-file')
 
+    def appendBallots(self, data):
+        '''
+        append a batch of ballot lines to the profile (for provisional counts)
+        
+        data is a string or an iterable of blt ballot lines, without the terminating 0.
+        The batch is parsed and validated as the ballot section of a ballot file
+        (its line numbers counting from the start of the batch). If it's in error,
+        the profile is left unchanged. Return the number of ballots appended.
+        
+        Batches are never coalesced with earlier lines.
+        
+        An Election brings itself up to date with the appended lines via Election.update.
+        '''
+        # pylint 0.22.0 doesn't think there's a blt.next() # pylint: disable=E1101
+        BL = self.ballotLines
+        if isinstance(BL.cids, self.MappedArray):   # a mapped binary profile: copy it to change it
+            BL.cids, BL.offsets, BL.multipliers, BL.lines = BL.cids[:], BL.offsets[:], BL.multipliers[:], BL.lines[:]
+        nLines, nLinesEqual, nBallots = len(BL), len(self.ballotLinesEqual), self.nBallots
+        nIDs = len(self.ballotIDs)
+        lines = data.splitlines() if isinstance(data, basestring) else data
+        blt = self.__bltBlob(itertools.chain(lines, ['0']))
+        try:
+            try:
+                self.__bltParseBallots(blt, blt.next())
+            except StopIteration:
+                raise ElectionProfileError('bad ballot batch: unexpected end of batch')
+            tok = next(blt, None)
+            if tok is not None:
+                raise ElectionProfileError('bad ballot batch: unexpected item "%s" near line %d' % \
+                    (tok, self.lineNumber))
+            self.__validateLines(nLines, nLinesEqual)
+        except ElectionProfileError:
+            BL.truncate(nLines)
+            del self.ballotLinesEqual[nLinesEqual:]
+            self.ballotIDs.truncate(nIDs)
+            self.nBallots = nBallots
+            self._ballotStart = False
+            raise
+        return self.nBallots - nBallots
+
+    def cvrParse(self, data, cvr):
+        '''
+        build the profile from cast-vote records, a record at a time
+        
+        data is a string or an iterable of lines (such as an open file).
+        cvr is a dict of import options:
+          format: csv (the default) or json (JSON lines); see cvrRecords
+          seats: the number of seats (required)
+          title: the election title
+          candidates: the candidate names, in CID order; by default,
+            candidates are numbered in order of first appearance
+          withdrawn: the names of withdrawn candidates
+          overvote: a rank naming more than one candidate...
+            exhaust (the default): ends the ballot
+            skip: is skipped
+            equal: ranks its candidates equally (an unnamed "overvote" ends the ballot)
+          skipped: the number of consecutive skipped ranks that ends a ballot
+            (default 0: skipped ranks are ignored)
+        A candidate ranked again on the same ballot is a skipped rank.
+        '''
+        lines = data.splitlines() if isinstance(data, basestring) else data
+        self.cvrBegin(cvr)
+        for number, bid, contest, ranks in cvrRecords(lines, cvr.get('format', 'csv')):  # pylint: disable=W0612
+            self.cvrRecord(number, ranks, bid)
+        self.cvrEnd()
+
+    @staticmethod
+    def __cvrOptions(path, cvr):
+        "copy the CVR import options, defaulting the format and title from path"
+        cvr = dict(cvr)
+        if path:
+            cvr.setdefault('format', 'json' if path.lower().endswith(('.json', '.jsonl')) else 'csv')
+            cvr.setdefault('title', os.path.basename(path))
+        return cvr
+
+    @classmethod
+    def cvrSplit(cls, path=None, data=None, cvr=None, coalesce=False):
+        '''
+        read cast-vote records for several contests in one pass, building a profile for each
+        
+        Each record goes to the profile of its contest (see cvrCsvRecords).
+        cvr holds the import options (see cvrParse), with an optional "contests"
+        dict of per-contest options that override them; a contest's title
+        defaults to its name.
+        
+        Return a dict: contest -> ElectionProfile. The profiles are independent,
+        so they may be counted separately (in separate processes, say).
+        '''
+        cvr = dict(cvr or dict())
+        contests = cvr.pop('contests', None) or dict()
+        cvr = cls.__cvrOptions(path, cvr)
+        cvr.pop('title', None)
+        profiles = dict()
+
+        def split(lines):
+            "fan the records out to their contests' profiles"
+            lines = lines.splitlines() if isinstance(lines, basestring) else lines
+            for number, bid, contest, ranks in cvrRecords(lines, cvr.get('format', 'csv')):
+                profile = profiles.get(contest)
+                try:
+                    if profile is None:
+                        profile = profiles[contest] = cls.__new__(cls)
+                        profile.__initialize(coalesce)
+                        options = dict(cvr, title=contest or 'Untitled')
+                        options.update(contests.get(contest, dict()))
+                        profile.cvrBegin(options)
+                    profile.cvrRecord(number, ranks, bid)
+                except ElectionProfileError as err:
+                    raise ElectionProfileError('contest %s: %s' % (contest, err))
+
+        if path:
+            f = cls.bltOpen(path)
+            try:
+                split(f)
+            finally:
+                f.close()
+        elif not data:
+            raise ElectionProfileError('no profile data')
+        else:
+            split(data)
+        for contest, profile in profiles.iteritems():
+            try:
+                profile.cvrEnd()
+                profile.__validate()
+            except ElectionProfileError as err:
+                raise ElectionProfileError('contest %s: %s' % (contest, err))
+            profile.__defaults()
+        return profiles
+
+    def cvrBegin(self, cvr):
+        "begin building the profile from cast-vote records (see cvrParse)"
+        try:
+            self.nSeats = int(cvr['seats'])
+        except (KeyError, TypeError, ValueError):
+            raise ElectionProfileError('CVR import: the number of seats is required')
+        overvote = cvr.get('overvote', 'exhaust')
+        if overvote not in ('exhaust', 'skip', 'equal'):
+            raise ElectionProfileError('CVR import: unknown overvote rule %s (use exhaust, skip or equal)' % overvote)
+        try:
+            skipped = int(cvr.get('skipped', 0))
+        except ValueError:
+            raise ElectionProfileError('CVR import: skipped must be a number of ranks')
+        self.title = cvr.get('title', 'Untitled')
+        names = cvr.get('candidates') or list()
+        self.nCand = 0
+        self.ballotLines = self.BallotLines(len(names))
+        self._cvr = dict(overvote=overvote, skipped=skipped, fixed=False, cids=dict(), records=0)
+        for name in names:
+            self.__cvrCid(name, None)
+        self._cvr['fixed'] = bool(names)
+        for name in cvr.get('withdrawn') or list():
+            self.withdrawn.add(self.__cvrCid(name, None))
+
+    def __cvrCid(self, name, number):
+        "return the CID of candidate name, numbering a new candidate unless the candidates are fixed"
+        cids = self._cvr['cids']
+        cid = cids.get(name)
+        if cid is None:
+            if self._cvr['fixed']:
+                if number is None:
+                    raise ElectionProfileError('CVR import: unknown withdrawn candidate "%s"' % name)
+                raise ElectionProfileError('unknown candidate "%s" in CVR record %d' % (name, number))
+            self.nCand += 1
+            cid = cids[name] = self.nCand
+            self.candidateName[cid] = name
+            self.candidateOrder[cid] = cid
+            if cid > 255 and self.ballotLines.typecode == 'B':
+                self.__widen()
+        return cid
+
+    def __widen(self):
+        "switch ballotLines to two-byte CIDs, for more than 255 candidates"
+        BL = self.ballotLines
+        BL.typecode = 'H'
+        BL.cids = array.array('H', BL.cids)
+        if self._coalesce:
+            self._coalesce = dict(
+                (key if isinstance(key, tuple) else array.array('H', array.array('B', key)).tostring(), line)
+                for key, line in self._coalesce.iteritems())
+
+    def cvrRecord(self, number, ranks, bid=None):
+        '''
+        add a cast-vote record (see cvrParse) to the profile
+        
+        number is the record number, for error messages and ballot-line numbers;
+        ranks is a list of ranks, each a list of candidate names (see cvrCell);
+        bid is the record's ballot ID, if it has one (see BallotIDs)
+        '''
+        cvr = self._cvr
+        cvr['records'] += 1
+        if bid is not None and not self.ballotIDs.add(bid):     # its line is recorded below
+            raise ElectionProfileError('duplicate ballot ID %s in CVR record %d' % (bid, number))
+        ranking = list()
+        ranked = set()
+        skips = 0
+        for rank in ranks:
+            if len(rank) > 1 or None in rank:   # overvote
+                if cvr['overvote'] == 'skip':
+                    rank = []
+                elif cvr['overvote'] == 'exhaust' or None in rank:
+                    break
+            cids = list()
+            for name in rank:
+                cid = self.__cvrCid(name, number)
+                if cid not in ranked and cid not in cids:
+                    cids.append(cid)
+            if not cids:                        # skipped (or repeated) rank
+                skips += 1
+                if cvr['skipped'] and skips >= cvr['skipped']:
+                    break
+                continue
+            skips = 0
+            ranked.update(cids)
+            cids = [cid for cid in cids if cid not in self.withdrawn]
+            if cids:
+                ranking.append(cids)
+        if not ranking:
+            return                              # ignore empty ballots
+        self.lineNumber = number
+        if all(len(rank) == 1 for rank in ranking):
+            self.__addBallotLine(1, [rank[0] for rank in ranking], bid is None)
+            where = len(self.ballotLines)
+        else:
+            self.__addBallotLine(1, tuple(ranking), bid is None)
+            where = -len(self.ballotLinesEqual)
+        if bid is not None:
+            self.ballotIDs.where[-1] = where
+
+    def cvrEnd(self):
+        "finish building the profile from cast-vote records"
+        nIDs, nRecords = len(self.ballotIDs), self._cvr['records']
+        if nIDs and nIDs != nRecords:           # IDs on some records but not all
+            raise ElectionProfileError('number of ballot IDs (%d) does not match number of CVR records (%d)' % \
+                (nIDs, nRecords))
+        for cid in xrange(1, self.nCand+1):
+            if cid not in self.withdrawn:
+                self.eligible.add(cid)
+        self._coalesce = None
+        self._cvr = None
+
+    #  profile attributes that merged ballot files must agree on
+    #
+    bltMergeHeader = (('nCand', 'candidates'), ('candidateName', 'candidate names'), ('nSeats', 'seats'),
+        ('withdrawn', 'withdrawn candidates'), ('nickName', 'nicknames'), ('tieOrder', 'tie order'),
+        ('options', 'options'))
+
+    @classmethod
+    def bltMergePart(cls, path):
+        '''
+        parse and coalesce one ballot file to be merged (see bltMerge)
+        
+        Its ballot lines are validated, but not its ballot count: a precinct
+        may have fewer ballots than there are candidates.
+        '''
+        profile = cls.__new__(cls)
+        profile.__initialize(True)
+        f = cls.bltOpen(path)
+        try:
+            profile.bltParse(f)
+            profile.__validateLines()
+        except ElectionProfileError as err:
+            raise ElectionProfileError('%s: %s' % (path, err))
+        finally:
+            f.close()
+        profile._coalesce = None
+        profile.__defaults()
+        return profile
+
+    @classmethod
+    def bltMerge(cls, paths, workers=1):
+        '''
+        merge ballot files with the same header (one per precinct, say) into one profile
+        
+        The files are parsed and coalesced by bltMergePart, in a pool of worker
+        processes if workers > 1, and merged as they're parsed, in order. They must
+        agree in candidates, seats, withdrawn candidates, nicknames, tie order and
+        options (see bltMergeHeader); the title, source and comment are the first file's.
+        
+        Identical rankings are aggregated across files; a merged line's line number
+        is that of its first appearance, in whichever file that was. Lines with
+        ballot IDs are kept separate, and their IDs must be unique across the files.
+        '''
+        if not paths:
+            raise ElectionProfileError('no ballot files to merge')
+        pool = None
+        if workers > 1 and len(paths) > 1:
+            pool = multiprocessing.Pool(min(workers, len(paths)))
+            profiles = pool.imap(bltMergeParse, paths)
+        else:
+            profiles = itertools.imap(bltMergeParse, paths)
+        try:
+            merged = None
+            for path, profile in itertools.izip(paths, profiles):
+                if merged is None:
+                    merged = cls.__new__(cls)
+                    merged.__initialize(True)
+                    merged.__dict__.update((name, getattr(profile, name)) for name in
+                        ('title', 'source', 'comment', 'eligible', 'candidateOrder', '_nickCid'))
+                    merged.__dict__.update((name, getattr(profile, name)) for name, what in cls.bltMergeHeader)
+                    merged.ballotLines = cls.BallotLines(merged.nCand)
+                else:
+                    for name, what in cls.bltMergeHeader:
+                        if getattr(profile, name) != getattr(merged, name):
+                            raise ElectionProfileError('%s: %s differ from those of %s' % (path, what, paths[0]))
+                #  coalesce the unequal lines by their ranking bytes (as __addBallotLine does),
+                #  except those with ballot IDs; moved maps a line's old ID location to its new one
+                #
+                BL, MBL, coalesce = profile.ballotLines, merged.ballotLines, merged._coalesce
+                cids, offsets, multipliers = BL.cids, BL.offsets, BL.multipliers
+                moved = dict.fromkeys(profile.ballotIDs.where, 0)
+                for i in xrange(len(BL)):
+                    ranking = cids[offsets[i]:offsets[i+1]]
+                    if i+1 in moved:
+                        MBL.append(multipliers[i], ranking, BL.lines[i])
+                        moved[i+1] = len(MBL)
+                        continue
+                    key = ranking.tostring()
+                    line = coalesce.get(key)
+                    if line is None:
+                        coalesce[key] = len(MBL)
+                        MBL.append(multipliers[i], ranking, BL.lines[i])
+                    else:
+                        MBL.multipliers[line] += multipliers[i]
+                merged.nBallots += sum(multipliers)
+                for k, bl in enumerate(profile.ballotLinesEqual):
+                    merged.lineNumber = bl.line
+                    mergeable = -k-1 not in moved
+                    merged.__addBallotLine(bl.multiplier, bl.ranking, mergeable)
+                    if not mergeable:
+                        moved[-k-1] = -len(merged.ballotLinesEqual)
+                IDs = profile.ballotIDs
+                for j, where in enumerate(IDs.where):
+                    if not merged.ballotIDs.add(IDs[j], moved[where]):
+                        raise ElectionProfileError('%s: duplicate ballot ID %s' % (path, IDs[j]))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        merged._coalesce = None
+        merged.__validate(lines=False)  # the files' lines were validated as they were parsed
+        return merged
+
+    def bltParseParallel(self, path, workers):
+        '''
+        parse and validate the blt file at path, splitting its ballot section among worker processes
+        
+        The header and trailer are parsed here. The ballot section is split on line
+        boundaries into chunks, which are parsed by bltParseChunk in a pool of workers
+        and appended to ballotLines in file order.
+        
+        Only canonical ballot lines in an uncompressed file can be parsed this way.
+        Return False if the file is compressed, or the ballot section doesn't begin a line, or holds anything else (comments,
+        ballot IDs, nicknames, equal rankings, errors), or has no terminating line;
+        the caller should then parse the file serially, which reports any errors.
+        '''
+        if bltCompression(path):
+            return False                # no random access to the ballot section
+        f = self.bltOpen(path)
+        try:
+            where = [0]                 # file offset of the current line
+            def lines():
+                "read lines, noting where each begins"
+                while True:
+                    where[0] = f.tell()
+                    line = f.readline()
+                    if not line:
+                        return
+                    yield line
+            try:
+                blt = self.__bltBlob(lines())
+                tok = self.__bltParseHeader(blt)
+            except StopIteration:
+                return False
+            start = where[0]
+        finally:
+            f.close()
+        if self._ballotsAtLine is None or isinstance(tok, tuple):
+            return False
+        f = open(path, 'rb')
+        try:
+            f.seek(start)
+            if f.readline().split()[:1] != [tok]:
+                return False            # something precedes the first ballot on its line
+            f.seek(0, 2)
+            size = f.tell()
+            nChunks = workers * 4       # smaller chunks balance the load
+            bounds = [start]
+            for i in xrange(1, nChunks):
+                f.seek(max(start + (size - start) * i // nChunks - 1, bounds[-1]))
+                f.readline()            # align to the start of the next line
+                if f.tell() > bounds[-1] and f.tell() < size:
+                    bounds.append(f.tell())
+            bounds.append(size)
+        finally:
+            f.close()
+        chunks = [(path, bounds[i], bounds[i+1], self.nCand, self.withdrawn, self.ballotLines.typecode)
+            for i in xrange(len(bounds)-1)]
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(bltParseChunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+        #  check the chunks through the end of the ballot section before using any of them
+        #
+        used = list()
+        for result in results:
+            if result['other'] is not None:
+                return False
+            used.append(result)
+            if result['end'] is not None:
+                break
+        else:
+            return False                # no terminating line
+
+        #  merge the chunks in file order
+        #
+        self.ballotLines = BL = self.BallotLines(self.nCand)
+        base = self._ballotsAtLine - 1  # lines preceding the current chunk
+        dupe = None
+        for result in used:
+            if dupe is None and result['dupe'] is not None:
+                dupe = (base + result['dupe'][0], result['dupe'][1])
+            offsets = array.array('l')
+            offsets.fromstring(result['offsets'])
+            numbers = array.array('l')
+            numbers.fromstring(result['numbers'])
+            if self._coalesce is not None:
+                multipliers = array.array('l')
+                multipliers.fromstring(result['multipliers'])
+                cids = array.array(BL.typecode)
+                cids.fromstring(result['cids'])
+                first = 0
+                for i, multiplier in enumerate(multipliers):
+                    self.lineNumber = base + numbers[i]
+                    self.__addBallotLine(multiplier, cids[first:offsets[i]], True)
+                    first = offsets[i]
+            else:
+                n = len(BL.cids)
+                BL.cids.fromstring(result['cids'])
+                BL.offsets.extend(offset + n for offset in offsets)
+                BL.multipliers.fromstring(result['multipliers'])
+                BL.lines.extend(number + base for number in numbers)
+                self.nBallots += result['nBallots']
+            base += result['lines']
+        self._coalesce = None
+        endLine, endOffset = used[-1]['end']
+
+        #  parse the rest of the file
+        #
+        f = self.bltOpen(path)
+        try:
+            f.seek(endOffset)
+            self.__bltParseNames(self.__bltBlob(f, base - used[-1]['lines'] + endLine))
+        except StopIteration:
+            raise ElectionProfileError('bad blt file: unexpected end-of-file')
+        finally:
+            f.close()
+        self.__validate(lines=False)
+        if dupe is not None:
+            raise ElectionProfileError('candidate ID %s duplicated on line %d' % (dupe[1], dupe[0]))
+        return True
+
     def _bltParse(self, data):
         '''
         parse a blt blob
         
         the parsed result populates this ElectionProfile object
         '''
+        blt = self.__bltBlob(data)  # fetch a token at a time
+        tok = self.__bltParseHeader(blt)
+        self.ballotLines = self.BallotLines(self.nCand)
+        self.__bltParseBallots(blt, tok)
+        self.__bltParseNames(blt)
+
+    def __bltParseHeader(self, blt):
+        '''
+        parse the blt header: candidate and seat counts, withdrawn candidates and options
+        
+        return the first token of the ballot section
+        '''
         # pylint 0.22.0 doesn't think there's a blt.next() # pylint: disable=E1101
         digits = re.compile(r'\d+$')
         sdigits = re.compile(r'-?\d+$')
 
-        blt = self.__bltBlob(data)  # fetch a token at a time
-        
         #  number of candidates, eligible or withdrawn
         #
         tok = blt.next().lstrip(codecs.BOM_UTF8) # strip utf-8 BOM from first token
@@ -323,6 +2014,8 @@ class ElectionProfile(object):
         #    general options, flagged with an equal sign
         #
         self.withdrawn = set()
+        self.options = list()
+        line = self.lineNumber
         tok = blt.next()
         while True:
             if tok.startswith('['):     # look for an option
@@ -336,7 +2029,15 @@ class ElectionProfile(object):
                 self.withdrawn.add(-wd)
             else:
                 raise ElectionProfileError('bad blt item "%s" near first ballot line; expected decimal number' % tok)
+            line = self.lineNumber
             tok = blt.next()
+        self._ballotsAtLine = self.lineNumber if self.lineNumber != line else None
+        return tok
+
+    def __bltParseBallots(self, blt, tok):
+        "parse the blt ballot lines, starting with tok"
+        # pylint 0.22.0 doesn't think there's a blt.next() # pylint: disable=E1101
+        digits = re.compile(r'\d+$')
 
         #  ballots
         #
@@ -346,18 +2047,39 @@ class ElectionProfile(object):
         #
         #  a multiplier of 0 ends the ballot list
         #
-        self.ballotLines = list()
-        ballotIDs = set()
+        ballotIDs = self.ballotIDs
+        nIDs = len(ballotIDs)
+        nLines = 0                      # ballot lines with no equal rankings, before any merging
+        nOther = 0                      # ballot IDs of other lines (equal rankings, or empty)
+
+        def nextBallot():
+            "read the next ballot's multiplier or ID, letting __bltBlob return a canonical line whole"
+            self._ballotStart = True
+            try:
+                return blt.next()
+            finally:
+                self._ballotStart = False
         
         while True:
+            if isinstance(tok, tuple):  # canonical ballot line: (multiplier, [cids])
+                ranking = tok[1]
+                if self.withdrawn:
+                    ranking = [cid for cid in ranking if cid not in self.withdrawn]
+                if ranking:
+                    self.__addBallotLine(tok[0], ranking, True)
+                    nLines += 1
+                tok = nextBallot()
+                continue
+            bid = None
             if tok.startswith('('):
                 bid = tok
                 while not bid.endswith(')'):
                     bid += ' ' + blt.next()
                 bid = bid.lstrip('(').rstrip(')').strip(' ')
-                if bid in ballotIDs:
+                if isinstance(bid, unicode):
+                    bid = bid.encode('utf-8')
+                if not ballotIDs.add(bid):      # its line is recorded below
                     raise ElectionProfileError('duplicate ballot ID %s' % bid)
-                ballotIDs.add(bid)
                 multiplier = 1
             elif digits.match(tok):
                 multiplier = int(tok)
@@ -373,20 +2095,38 @@ class ElectionProfile(object):
                 if tok == '0':
                     break   # end of ballot
                 toks = tok.split('=')  # handle equal ranking
-                ranking.append([self.getCid(c, len(self.ballotLines)+1) for c in toks])
+                ranking.append([self.getCid(c, nLines+1) for c in toks])
 
+            where = 0                           # the line's ballot-ID location (see BallotIDs)
+            counted = nLines
             if ranking:                         # ignore empty ballots
                 ballot = self.BallotLine(self, multiplier, ranking)
-                if isinstance(ballot.ranking, tuple):
-                    self.ballotLinesEqual.append(ballot)
-                elif ballot.ranking is not None:
-                    self.ballotLines.append(ballot)
+                if ballot.ranking is not None:
+                    self.__addBallotLine(ballot.multiplier, ballot.ranking, bid is None)
+                    if not isinstance(ballot.ranking, tuple):
+                        nLines += 1
+                        where = len(self.ballotLines)
+                    else:
+                        where = -len(self.ballotLinesEqual)
+            if bid is not None:
+                if nLines == counted:
+                    nOther += 1
+                if where and self._summary is None:
+                    ballotIDs.where[-1] = where
 
-            tok = blt.next()  # next multiplier or 0 for end of ballots
+            tok = nextBallot()  # next multiplier or 0 for end of ballots
+        self._coalesce = None
+        if self._summary is not None:
+            self._summary['ballotIDs'] = len(ballotIDs)
             
-        if len(ballotIDs) and len(ballotIDs) != len(self.ballotLines):
+        nIDs = len(ballotIDs) - nIDs
+        if nIDs and nIDs != nLines + nOther:    # IDs on some unequal-ranking lines but not all
             raise ElectionProfileError('number of ballot IDs (%d) does not match number of ballots (%d)' % \
-                (len(ballotIDs), len(self.ballotLines)))
+                (nIDs, nLines + nOther))
+
+    def __bltParseNames(self, blt):
+        "parse the blt trailer: candidate names, title, and optional source and comment"
+        # pylint 0.22.0 doesn't think there's a blt.next() # pylint: disable=E1101
 
         #  candidate names
         #
@@ -454,19 +2194,69 @@ class ElectionProfile(object):
             raise ElectionProfileError('bad blt item "%s" near election comment; expected quoted string' % s)
         self.comment = s.strip('"').strip(' ')
 
-    def __bltBlob(self, blob):
+    def __addBallotLine(self, multiplier, ranking, mergeable):
+        '''
+        add a nonempty ballot line to ballotLines or ballotLinesEqual
+        
+        ranking is a tuple of lists of cids (equal rankings) or a sequence of cids.
+        If we're coalescing and the line is mergeable (it has no ballot ID),
+        add its multiplier to an earlier line with the same ranking instead.
+        '''
+        self.nBallots += multiplier
+        if self._summary is not None:   # validating only: tally the line and drop it
+            self.__tallyBallotLine(multiplier, ranking)
+            return
+        equal = isinstance(ranking, tuple)
+        key = None
+        if mergeable and self._coalesce is not None:
+            if equal:
+                key = tuple(tuple(rank) for rank in ranking)
+            else:
+                key = array.array(self.ballotLines.typecode, ranking).tostring()
+            line = self._coalesce.get(key)
+            if line is not None:
+                if equal:
+                    line.multiplier += multiplier
+                else:
+                    self.ballotLines.multipliers[line] += multiplier
+                return
+        if equal:
+            line = self.BallotLine.view(multiplier, ranking, self.lineNumber)
+            self.ballotLinesEqual.append(line)
+        else:
+            line = len(self.ballotLines)    # coalesce by index into the store
+            self.ballotLines.append(multiplier, ranking, self.lineNumber)
+        if key is not None:
+            self._coalesce[key] = line
+
+    def __bltBlob(self, blob, lineNumber=0):
         '''
         parse a blt blob into tokens
         
+        blob is a string or an iterable of lines;
+        only the current line is held in memory.
+        
         skip /* comments */ and # comments (if not in quoted strings)
+        
+        When the parser is about to read a ballot's multiplier or ID (_ballotStart)
+        and a new line begins in the canonical form "multiplier cid... 0", the line
+        is returned whole, as a (multiplier, [cids]) tuple; see bltCanonical.
+        A ballot continued from an earlier line is tokenized normally.
+        
+        lineNumber is the number of lines preceding the blob.
         '''
-        lines = blob.splitlines()
+        lines = blob.splitlines() if isinstance(blob, basestring) else blob
         inComment = 0
         inQuote = False
-        self.lineNumber = 0
+        self.lineNumber = lineNumber
         for line in lines:
             self.lineNumber += 1
             tokens = line.split()
+            if self._ballotStart and not inComment and not inQuote:
+                ballot = bltCanonical(tokens, self.nCand)
+                if ballot is not None:
+                    yield ballot
+                    continue
             for token in tokens:
                 if not inComment and token.startswith('"'):
                     inQuote = True
@@ -484,3 +2274,111 @@ class ElectionProfile(object):
                 if not inQuote and token.startswith('#'):
                     break
                 yield token
+
+
+class ProfileCache(object):
+    '''
+    On-disk cache of parsed election profiles
+    
+    Profiles are stored in binary form (see ElectionProfile.binWrite) in directory,
+    keyed by a hash of the ballot file's contents, the droop version and the
+    parsing options, so a later load of the same file maps the stored profile
+    instead of tokenizing and validating the file again.
+    
+    The cache is limited to maxBytes; least-recently-used entries are evicted
+    first (a hit refreshes the entry's modification time).
+    
+    Several processes may share a cache directory: entries are written to a
+    temporary file and renamed into place, so a reader sees a whole entry or none,
+    and an entry that disappears or proves unreadable is simply parsed again.
+    '''
+
+    suffix = '.dbp'
+
+    def __init__(self, directory, maxBytes=1024*1024*1024):
+        "create a cache in directory (created if need be)"
+        self.directory = directory
+        self.maxBytes = maxBytes
+        umask = os.umask(0)
+        os.umask(umask)
+        self.mode = 0644 & ~umask   # entry file mode (mkstemp makes its files private)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):  # else another process made it
+                    raise ElectionProfileError("can't create profile cache %s" % directory)
+
+    def key(self, path, coalesce=False):
+        "the cache key for the ballot file at path"
+        h = hashlib.sha1()
+        h.update('%s %s %r\n' % (droopVersion, ElectionProfile.binMagic, bool(coalesce)))
+        try:
+            f = open(path, 'rb')        # hash the file as stored, compressed or not
+        except Exception as emsg:
+            raise ElectionProfileError("can't open ballot file %s (%s)" % (path, emsg))
+        try:
+            while True:
+                block = f.read(1024*1024)
+                if not block:
+                    break
+                h.update(block)
+        finally:
+            f.close()
+        return h.hexdigest()
+
+    def load(self, path, coalesce=False, workers=1):
+        "return the profile of the ballot file at path, from the cache if we can"
+        if ElectionProfile.binIs(path):
+            return ElectionProfile(path=path)   # nothing to gain
+        entry = os.path.join(self.directory, self.key(path, coalesce) + self.suffix)
+        if os.path.exists(entry):
+            try:
+                profile = ElectionProfile(path=entry)
+            except ElectionProfileError:
+                profile = None              # evicted or damaged: parse again
+            if profile is not None:
+                try:
+                    os.utime(entry, None)   # most recently used
+                except OSError:
+                    pass                    # evicted meanwhile; our mapping survives
+                return profile
+        profile = ElectionProfile(path=path, coalesce=coalesce, workers=workers)
+        self.store(profile, entry)
+        return profile
+
+    def store(self, profile, entry):
+        "write profile to the cache as entry, then evict down to maxBytes"
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        try:
+            profile.binWrite(tmp)
+            os.chmod(tmp, self.mode)        # readable by others sharing the cache
+            os.rename(tmp, entry)           # atomic: readers see all or nothing
+        except (ElectionProfileError, OSError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        "remove least-recently-used entries until the cache fits in maxBytes"
+        entries = list()
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue                # removed by another process
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass                        # removed by another process
+            total -= size
@@ -228,12 +228,14 @@ class ElectionRecord(dict):
         import json as json_
         from fractions import Fraction
 
+        V = self.E.V
+
         class ValueEncoder(json_.JSONEncoder):
             "provide JSON encoding for droop arithmetic object"
             def default(self, obj): # pylint: disable=E0202
                 "handle Rational objects that escape to Fraction"
                 if isinstance(obj, Fraction):
-                    return str(values.rational.Rational(obj))
+                    return str(V(obj))
                 if isinstance(obj, (values.fixed.Fixed, values.guarded.Guarded, values.rational.Rational)):
                     return str(obj)
                 return json_.JSONEncoder.default(self, obj) # pragma: no cover
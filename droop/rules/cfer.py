@@ -549,14 +549,17 @@ class Rule(MethodWIGM):
             ##
             return V(E.nBallots) / V(E.nSeats+1) + V.epsilon
 
-        def transfer(ballot):
-            "Transfer ballot to next hopeful candidate."
-            while not ballot.exhausted and ballot.topCand not in C.hopeful():
-                ballot.advance()
-            if ballot.exhausted:
-                E.exhausted += ballot.vote
+        def transfer(i):
+            "Transfer ballot i to next hopeful candidate."
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not C.isHopeful(cids[pos]):
+                pos += 1
+            B.pos[i] = pos
+            if pos >= end:
+                E.exhausted += B.vote(i)
             else:
-                ballot.topCand.vote += ballot.vote
+                C.byCid(cids[pos]).vote += B.vote(i)
+                E.piles[cids[pos]].append(i)
 
         def breakTie(E, tied, reason=None):
             '''
@@ -676,6 +679,7 @@ class Rule(MethodWIGM):
         C = E.C     # candidates
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
+        B = E.ballots   # ballot state
 
         ##  10059. Ranked voting pursuant to Section 10050 for an election to
         ##  elect two or more candidates to office shall be known as "choice voting" and
@@ -687,8 +691,8 @@ class Rule(MethodWIGM):
         ##  candidate on that ballot, using a transfer value of 1.00000.
         ##
         E.quota = calcQuota()
-        for b in E.ballots:
-            b.topCand.vote += b.vote
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.vote(i)
         E.exhausted = V0  # track non-transferable votes
         E.logAction('begin', 'Begin Count')
 
@@ -763,9 +767,9 @@ class Rule(MethodWIGM):
                     c.unpend('Transfer surplus')
                     surplus = c.vote - E.quota
     
-                    for b in (b for b in E.ballots if b.topRank == c.cid):
-                        b.weight = (b.weight * surplus) / c.vote
-                        transfer(b)
+                    for i in E.takePileIndices(c.cid):
+                        B.weight[i] = (B.weight[i] * surplus) / c.vote
+                        transfer(i)
                     c.vote = E.quota
                     E.logAction('transfer', "Surplus transferred: %s (%s)" % (c, surplus))
 
@@ -780,8 +784,7 @@ class Rule(MethodWIGM):
                 ##  fewest votes, one of those candidates shall be chosen by lot and
                 ##  declared defeated.
                 ##
-                low_vote = min(c.vote for c in C.hopeful())
-                low_candidates = [c for c in C.hopeful() if c.vote == low_vote]
+                low_candidates = C.lowest()
                 low_candidate = breakTie(E, low_candidates, 'defeat')
                 low_candidate.defeat()
                 defeats = [low_candidate]
@@ -808,9 +811,9 @@ class Rule(MethodWIGM):
                 ##  counted for the highest ranked continuing candidate on that ballot
                 ##  using the previous transfer value.
                 ##
-                cids = [c.cid for c in defeats]
-                for b in (b for b in E.ballots if b.topRank in cids):
-                    transfer(b)
+                for c in defeats:
+                    for i in E.takePileIndices(c.cid):
+                        transfer(i)
                 for c in defeats:
                     c.vote = V0
                 E.logAction('transfer', "Transfer defeated: %s" % ", ".join(str(c) for c in defeats))
@@ -237,18 +237,25 @@ class Rule(MethodMeek):
                 c.vote = V0
             candidate = E.candidate
             E.residual = V0
-            for b in E.ballots:
-                multiplier = b.multiplier
-                b.residual = multiplier
-                b.weight = V1
-                for c in (candidate(cid) for cid in b.ranking):
-                    if c.kf:
-                        keep, b.weight = kt(c.kf, b.weight)
-                        c.vote += keep * multiplier
-                        b.residual -= keep * multiplier  # residual value of ballot
-                        if b.weight <= V0:
+            B = E.ballots
+            cids, starts, ends = B.cids, B.starts, B.ends
+            kfs, votes = C.arrays.kf, C.arrays.vote    # candidate state by CID
+            for i in xrange(len(B)):
+                multiplier = B.multiplier[i]
+                residual = multiplier
+                weight = V1
+                for cid in cids[starts[i]:ends[i]]:
+                    kf = kfs[cid]
+                    if kf:
+                        keep, weight = kt(kf, weight)
+                        votes[cid] += keep * multiplier
+                        residual -= keep * multiplier  # residual value of ballot
+                        if weight <= V0:
                             break
-                E.residual += b.residual  # residual for round
+                B.weight[i] = weight
+                B.residual[i] = residual
+                E.residual += residual  # residual for round
+            C.votesChanged()    # votes were written directly
                 
             for b in E.ballotsEqual:
                 cset = [c.cid for c in (C.hopeful() + C.elected())]
@@ -355,8 +362,11 @@ class Rule(MethodMeek):
         C = E.C   # candidates
         for c in C.hopeful():
             c.kf = V1    # initialize keep factors
-        for b in (b for b in E.ballots if b.topCand): # count first-place votes for round 0 reporting
-            b.topCand.vote += b.multiplier
+        B = E.ballots   # ballot state
+        for i in xrange(len(B)): # count first-place votes for round 0 reporting
+            cid = B.topRank(i)
+            if cid is not None:
+                C.byCid(cid).vote += B.multiplier[i]
 
         #  count votes from ballots with equal rankings
         #
@@ -398,8 +408,7 @@ class Rule(MethodMeek):
             #  defeat candidate with lowest vote, breaking tie if necessary
             #
             if C.hopeful():
-                low_vote = V.min([c.vote for c in C.hopeful()])
-                low_candidates = [c for c in C.hopeful() if (low_vote + E.surplus) >= c.vote]
+                low_candidates = C.withinLowest(E.surplus)
                 low_candidate = breakTie(E, low_candidates, 'defeat')
                 if iterationStatus == IS_omega:
                     low_candidate.defeat(msg='Defeat (surplus %s < omega)' % E.surplus)
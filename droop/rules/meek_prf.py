@@ -126,8 +126,9 @@ class Rule(MethodMeek):
         #  Calculate quota and count votes for round-0 reporting
         E.votes = V(E.nBallots)
         E.quota = E.votes / V(E.nSeats+1) + V.epsilon
-        for b in E.ballots:
-            b.topCand.vote += b.multiplier
+        B = E.ballots   # ballot state
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.multiplier[i]
 
         ##  B. Rounds
         ##  B.1. Test count complete. 
@@ -157,26 +158,33 @@ class Rule(MethodMeek):
                 for c in (C.hopeful() + C.elected()):
                     c.vote = V0
                 E.residual = V0
-                for b in E.ballots:
-                    b.weight = V1
-                    b.residual = b.multiplier
-                    for c in (E.candidate(cid) for cid in b.ranking):
+                cids, starts, ends = B.cids, B.starts, B.ends
+                kfs, votes = C.arrays.kf, C.arrays.vote    # candidate state by CID
+                for i in xrange(len(B)):
+                    weight = V1
+                    multiplier = B.multiplier[i]
+                    residual = multiplier
+                    for cid in cids[starts[i]:ends[i]]:
                         #
                         #  distribute votes
                         #
                         #  kv = w*kf rounded up * m     keep vote
                         #  w -= w*kf rounded up         new weight
                         # 
-                        if c.kf:
-                            keep_weight = V.mul(b.weight, c.kf, round='up')
-                            keep_value = keep_weight * b.multiplier
-                            c.vote += keep_value          # credit keep-value to candidate
-                            b.weight -= keep_weight       # reduce ballot weight
-                            b.residual -= keep_value      # track residual value of ballot
+                        kf = kfs[cid]
+                        if kf:
+                            keep_weight = V.mul(weight, kf, round='up')
+                            keep_value = keep_weight * multiplier
+                            votes[cid] += keep_value      # credit keep-value to candidate
+                            weight -= keep_weight         # reduce ballot weight
+                            residual -= keep_value        # track residual value of ballot
                             #
-                            if b.weight <= V0:
+                            if weight <= V0:
                                 break
-                    E.residual += b.residual    # track residual for round
+                    B.weight[i] = weight
+                    B.residual[i] = residual
+                    E.residual += residual      # track residual for round
+                C.votesChanged()    # votes were written directly
 
                 ##  B.2.b. Update quota. 
                 ##         Set quota q to the sum of the vote v for all candidates (step B.2a), 
@@ -243,8 +251,7 @@ class Rule(MethodMeek):
             ##       Set the keep factor kf of c to 0.
 
             if C.hopeful():
-                low_vote = V.min([c.vote for c in C.hopeful()])
-                low_candidates = [c for c in C.hopeful() if (low_vote + E.surplus) >= c.vote]
+                low_candidates = C.withinLowest(E.surplus)
                 low_candidate = breakTie(E, low_candidates)
                 if iterationStatus == 'omega':
                     low_candidate.defeat(msg='Defeat (surplus %s < omega)' % E.surplus)
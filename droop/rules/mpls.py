@@ -282,9 +282,9 @@ class Rule(MethodWIGM):
 
             return V(E.nBallots // (E.nSeats + 1) + 1)
 
-        def transfer(ballot):
+        def transfer(i):
             '''
-            Transfer ballot to next continuing (hopeful or pending) candidate
+            Transfer ballot i to next continuing (hopeful or pending) candidate
             '''
             ##  167.70(1)(d)
             ##  The transfer value of each vote cast for an elected candidate must be transferred
@@ -294,12 +294,15 @@ class Rule(MethodWIGM):
             ##  ... Votes for a defeated candidate are transferred at their transfer value to each 
             ##  ballot's next-ranked continuing candidate. 
    
-            while not ballot.exhausted and ballot.topCand not in (C.hopeful() + C.pending()):
-                ballot.advance()
-            if ballot.exhausted:
-                E.exhausted += ballot.vote
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not (C.isHopeful(cids[pos]) or C.isPending(cids[pos])):
+                pos += 1
+            B.pos[i] = pos
+            if pos >= end:
+                E.exhausted += B.vote(i)
             else:
-                ballot.topCand.vote += ballot.vote
+                C.byCid(cids[pos]).vote += B.vote(i)
+                E.piles[cids[pos]].append(i)
 
         def findCertainLosers(surplus, fixSpec=True):
             '''
@@ -420,6 +423,7 @@ class Rule(MethodWIGM):
         C = E.C     # candidates
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
+        B = E.ballots   # ballot state
 
         #  Calculate quota per 167.20(Threshold)
         #
@@ -431,8 +435,8 @@ class Rule(MethodWIGM):
         ##  a. The number of votes cast for each candidate for the current round 
         ##     must be counted.
         ##
-        for b in E.ballots:
-            b.topCand.vote += b.vote
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.vote(i)
         E.exhausted = V0    # track non-transferable votes
 
         E.logAction('begin', 'Begin Count')
@@ -475,9 +479,9 @@ class Rule(MethodWIGM):
             if certainLosers:
                 for c in certainLosers:
                     c.defeat('Defeat certain loser')
-                cids = [c.cid for c in certainLosers]
-                for b in (b for b in E.ballots if b.topRank in cids):
-                    transfer(b)
+                for c in certainLosers:
+                    for i in E.takePileIndices(c.cid):
+                        transfer(i)
                 for c in certainLosers:
                     c.vote = V0
                 E.logAction('transfer', "Transfer defeated: %s" % ", ".join(str(c) for c in certainLosers))
@@ -518,14 +522,13 @@ class Rule(MethodWIGM):
             ##     calculated to four (4) decimal places, ignoring any remainder. 
             ##
             if C.pending():
-                high_vote = max(c.vote for c in C.pending())
-                high_candidates = [c for c in C.pending() if c.vote == high_vote]
+                high_candidates = C.highest('pending')
                 high_candidate = breakTie(high_candidates, 'largest surplus')
                 high_candidate.unpend('Elect and transfer surplus')
                 surplus = high_candidate.vote - E.quota
-                for b in (b for b in E.ballots if b.topRank == high_candidate.cid):
-                    b.weight = (b.weight * surplus) / high_candidate.vote
-                    transfer(b)
+                for i in E.takePileIndices(high_candidate.cid):
+                    B.weight[i] = (B.weight[i] * surplus) / high_candidate.vote
+                    transfer(i)
                 high_candidate.vote = E.quota
                 E.logAction('transfer', "Transfer surplus: %s (%s)" % (high_candidate.name, surplus))
                 continue  ## continue as described in clause a.
@@ -544,12 +547,11 @@ class Rule(MethodWIGM):
             #  defeat candidate with lowest vote
             #
             if C.hopeful():
-                low_vote = min(c.vote for c in C.hopeful())
-                low_candidates = [c for c in C.hopeful() if c.vote == low_vote]
+                low_candidates = C.lowest()
                 low_candidate = breakTie(low_candidates, 'defeat low candidate')
                 low_candidate.defeat('Defeat low candidate')
-                for b in (b for b in E.ballots if b.topRank == low_candidate.cid):
-                    transfer(b)
+                for i in E.takePileIndices(low_candidate.cid):
+                    transfer(i)
                 low_candidate.vote = V0
                 E.logAction('transfer', "Transfer defeated: %s" % low_candidate.name)
 
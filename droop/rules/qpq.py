@@ -154,12 +154,23 @@ class Rule(ElectionRule):
             E.logAction('tie', 'Break tie by lot (%s): [%s] -> %s' % (reason, names, t.name))
             return t
 
-        def transfer(ballot):
+        def advance(i):
             '''
-            Transfer ballot to next hopeful candidate.
+            Advance ballot i to next hopeful candidate; return its top rank (or None).
             '''
-            while not ballot.exhausted and ballot.topCand not in C.hopeful():
-                ballot.advance()
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not C.isHopeful(cids[pos]):
+                pos += 1
+            B.pos[i] = pos
+            return cids[pos] if pos < end else None
+
+        def transfer(i):
+            '''
+            Transfer ballot i to next hopeful candidate.
+            '''
+            top = advance(i)
+            if top is not None:
+                E.piles[top].append(i)
 
         def countComplete():
             '''
@@ -182,6 +193,7 @@ class Rule(ElectionRule):
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
         V1 = E.V1   # constant one
+        B = E.ballots   # ballot state
 
         for c in C.hopeful():
             c.tc = V0
@@ -190,13 +202,12 @@ class Rule(ElectionRule):
 
         #  Calculate initial quota
         #
-        E.va = sum((b.multiplier for b in E.ballots if not b.exhausted), V0)
+        E.va = sum((B.multiplier[i] for i in xrange(len(B)) if B.topRank(i) is not None), V0)
         E.quota = calcQuota()  # quota [2.4]
 
         #  2.2: each ballot has elected 0 candidates
         #
-        for b in E.ballots:
-            b.weight = V0
+        B.weight[:] = [V0] * len(B)
 
         restart = True
         E.logAction('begin', 'Begin Count')
@@ -207,9 +218,10 @@ class Rule(ElectionRule):
                 restart = False
                 for c in C.elected():
                     c.unelect()
-                for b in E.ballots:
-                    b.restart(V0)
-                    transfer(b)
+                B.restartAll(V0)
+                for i in xrange(len(B)):
+                    advance(i)
+                E.buildPiles()
 
             #  2.3. At the start of each stage, the quotients of all the hopeful candidates 
             #  are calculated, as follows. The ballots contributing to a particular hopeful
@@ -229,13 +241,15 @@ class Rule(ElectionRule):
             for c in C.hopeful():
                 c.vote = V0
                 c.tc = V0
-            for b in E.ballots:
-                if b.exhausted:
-                    E.tx += b.weight * b.multiplier  # candidates elected by inactive ballots
+            for i in xrange(len(B)):
+                top = B.topRank(i)
+                if top is None:
+                    E.tx += B.weight[i] * B.multiplier[i]  # candidates elected by inactive ballots
                 else:
-                    E.va += b.multiplier
-                    b.topCand.tc += b.weight * b.multiplier
-                    b.topCand.vote += b.multiplier  # vc [2.3]
+                    E.va += B.multiplier[i]
+                    c = C.byCid(top)
+                    c.tc += B.weight[i] * B.multiplier[i]
+                    c.vote += B.multiplier[i]  # vc [2.3]
 
             for c in C.hopeful():
                 c.quotient = c.vote / (V1 + c.tc)
@@ -264,17 +278,17 @@ class Rule(ElectionRule):
                 high_candidate = breakTie(high_candidates, 'largest quotient')
                 high_candidate.elect('Elect high quotient')
                 new_weight = V1 / high_candidate.quotient
-                for b in (b for b in E.ballots if b.topRank == high_candidate.cid):
-                    b.weight = new_weight
-                    transfer(b)
+                for i in E.takePileIndices(high_candidate.cid):
+                    B.weight[i] = new_weight
+                    transfer(i)
                 E.logAction('transfer', "Transfer elected: %s (%s)" % (high_candidate, high_quotient))
             else:
                 low_quotient = min(c.quotient for c in C.hopeful())
                 low_candidates = [c for c in C.hopeful() if c.quotient == low_quotient]
                 low_candidate = breakTie(low_candidates, 'smallest quotient')
                 low_candidate.defeat('Defeat low quotient')
-                for b in (b for b in E.ballots if b.topRank == low_candidate.cid):
-                    transfer(b)
+                for i in E.takePileIndices(low_candidate.cid):
+                    transfer(i)
                 E.logAction('transfer', "Transfer defeated: %s" % low_candidate)
                 restart = True
 
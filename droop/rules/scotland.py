@@ -201,16 +201,19 @@ class Rule(MethodWIGM):
             
             return V(E.nBallots // (E.nSeats + 1) + 1)
 
-        def transfer(ballot):
+        def transfer(i):
             '''
-            Transfer ballot to next continuing (hopeful) candidate. [48,49]
+            Transfer ballot i to next continuing (hopeful) candidate. [48,49]
             '''
-            while not ballot.exhausted and ballot.topCand not in C.hopeful():
-                ballot.advance()
-            if ballot.exhausted:
-                E.exhausted += ballot.vote
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not C.isHopeful(cids[pos]):
+                pos += 1
+            B.pos[i] = pos
+            if pos >= end:
+                E.exhausted += B.vote(i)
             else:
-                ballot.topCand.vote += ballot.vote
+                C.byCid(cids[pos]).vote += B.vote(i)
+                E.piles[cids[pos]].append(i)
 
         def breakTie(tied, reason=None):
             '''
@@ -258,6 +261,7 @@ class Rule(MethodWIGM):
         C = E.C     # candidates
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
+        B = E.ballots   # ballot state
 
         #  Calculate quota per [46]
         #
@@ -265,8 +269,8 @@ class Rule(MethodWIGM):
 
         #  count first-preference votes [45]
         #
-        for b in E.ballots:
-            b.topCand.vote += b.vote
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.vote(i)
         E.exhausted = V0  # track non-transferable votes
 
         E.logAction('begin', 'Begin Count')
@@ -288,15 +292,14 @@ class Rule(MethodWIGM):
             #  transfer surplus votes of candidate with largest surplus [48,49]
             #
             if C.pending():
-                high_vote = max(c.vote for c in C.pending())
-                high_candidates = [c for c in C.pending() if c.vote == high_vote]
+                high_candidates = C.highest('pending')
                 high_candidate = breakTie(high_candidates, 'largest surplus')
                 high_candidate.unpend('Transfer high surplus')
                 surplus = high_candidate.vote - E.quota
-                for b in (b for b in E.ballots if b.topRank == high_candidate.cid):
+                for i in E.takePileIndices(high_candidate.cid):
                     # see http://www.votingmatters.org.uk/RES/eSTV-Eval.pdf section 7.1 #5
-                    b.weight = V.muldiv(b.weight, surplus, high_candidate.vote, round='down')
-                    transfer(b)
+                    B.weight[i] = V.muldiv(B.weight[i], surplus, high_candidate.vote, round='down')
+                    transfer(i)
                 high_candidate.vote = E.quota
                 E.logAction('transfer', "Surplus transferred: %s (%s)" % (high_candidate, surplus))
                 continue  # to next stage/round
@@ -304,12 +307,11 @@ class Rule(MethodWIGM):
             #  defeat candidate(s) with lowest vote [50,51]
             #
             if C.hopeful():
-                low_vote = min(c.vote for c in C.hopeful())
-                low_candidates = [c for c in C.hopeful() if c.vote == low_vote]
+                low_candidates = C.lowest()
                 low_candidate = breakTie(low_candidates, 'defeat low candidate')
                 low_candidate.defeat('Defeat low candidate')
-                for b in (b for b in E.ballots if b.topRank == low_candidate.cid):
-                    transfer(b)
+                for i in E.takePileIndices(low_candidate.cid):
+                    transfer(i)
                 low_candidate.vote = V0
                 E.logAction('transfer', "Transfer defeated: %s" % low_candidate)
 
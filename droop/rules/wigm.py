@@ -113,16 +113,19 @@ class Rule(MethodWIGM):
                 return V(E.nBallots) / V(E.nSeats+1)
             return V(E.nBallots) / V(E.nSeats+1) + V.epsilon
         
-        def transfer(ballot):
+        def transfer(i):
             '''
-            Transfer ballot to next hopeful candidate.
+            Transfer ballot i to next hopeful candidate.
             '''
-            while not ballot.exhausted and ballot.topCand not in C.hopeful():
-                ballot.advance()
-            if ballot.exhausted:
-                E.exhausted += ballot.vote
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not C.isHopeful(cids[pos]):
+                pos += 1
+            B.pos[i] = pos
+            if pos >= end:
+                E.exhausted += B.vote(i)
             else:
-                ballot.topCand.vote += ballot.vote
+                C.byCid(cids[pos]).vote += B.vote(i)
+                E.piles[cids[pos]].append(i)
 
         def breakTie(E, tied, reason=None):
             '''
@@ -146,6 +149,7 @@ class Rule(MethodWIGM):
         C = E.C     # candidates
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
+        B = E.ballots   # ballot state
         
         #  calculate quota
         #
@@ -153,8 +157,8 @@ class Rule(MethodWIGM):
 
         #  Calculate initial vote totals
         #
-        for b in E.ballots:
-            b.topCand.vote += b.vote
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.vote(i)
         E.exhausted = V0  # track non-transferable votes
 
         E.logAction('begin', 'Begin Count')
@@ -169,14 +173,13 @@ class Rule(MethodWIGM):
             #  find & transfer highest surplus
             #
             if C.pending():
-                high_vote = max(c.vote for c in C.pending())
-                high_candidates = [c for c in C.pending() if c.vote == high_vote]
+                high_candidates = C.highest('pending')
                 high_candidate = breakTie(E, high_candidates, 'surplus')
                 high_candidate.unpend('Transfer high surplus')
                 surplus = high_candidate.vote - E.quota
-                for b in (b for b in E.ballots if b.topRank == high_candidate.cid):
-                    b.weight = (b.weight * surplus) / high_candidate.vote
-                    transfer(b)
+                for i in E.takePileIndices(high_candidate.cid):
+                    B.weight[i] = (B.weight[i] * surplus) / high_candidate.vote
+                    transfer(i)
                 high_candidate.vote = E.quota
                 E.logAction('transfer', "Surplus transferred: %s (%s)" % (high_candidate, surplus))
 
@@ -195,8 +198,8 @@ class Rule(MethodWIGM):
                     low_candidate.defeat()
                     low_candidates = [low_candidate]
                 for c in low_candidates:
-                    for b in (b for b in E.ballots if b.topRank == c.cid):
-                        transfer(b)
+                    for i in E.takePileIndices(c.cid):
+                        transfer(i)
                     c.vote = V0
                     E.logAction('transfer', "Transfer defeated: %s" % c)
 
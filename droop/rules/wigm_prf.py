@@ -165,14 +165,17 @@ class Rule(MethodWIGM):
             ##
             return V(E.nBallots) / V(E.nSeats+1) + V.epsilon
 
-        def transfer(ballot):
-            "Transfer ballot to next hopeful candidate."
-            while not ballot.exhausted and ballot.topCand not in C.hopeful():
-                ballot.advance()
-            if ballot.exhausted:
-                E.exhausted += ballot.vote
+        def transfer(i):
+            "Transfer ballot i to next hopeful candidate."
+            cids, pos, end = B.cids, B.pos[i], B.ends[i]
+            while pos < end and not C.isHopeful(cids[pos]):
+                pos += 1
+            B.pos[i] = pos
+            if pos >= end:
+                E.exhausted += B.vote(i)
             else:
-                ballot.topCand.vote += ballot.vote
+                C.byCid(cids[pos]).vote += B.vote(i)
+                E.piles[cids[pos]].append(i)
 
         def breakTie(E, tied, reason=None):
             '''
@@ -272,6 +275,7 @@ class Rule(MethodWIGM):
         C = E.C     # candidates
         V = E.V     # arithmetic value class
         V0 = E.V0   # constant zero
+        B = E.ballots   # ballot state
 
         ##  A. Initialize Election
         ##     A.1. Set the quota (votes required for election) to the total number of
@@ -285,8 +289,8 @@ class Rule(MethodWIGM):
         ##          assigned to that candidate.
         ##
         E.quota = calcQuota()
-        for b in E.ballots:
-            b.topCand.vote += b.vote
+        for i in xrange(len(B)):
+            C.byCid(B.topRank(i)).vote += B.vote(i)
         E.exhausted = V0  # track non-transferable votes
 
         ##     D.3. Test count complete. If the number of elected plus pending
@@ -324,9 +328,9 @@ class Rule(MethodWIGM):
                         c.defeat(msg='Defeat sure loser')
                     if len(C.hopeful()) <= E.seatsLeftToFill():
                         break
-                    cids = [c.cid for c in sureLosers]
-                    for b in (b for b in E.ballots if b.topRank in cids):
-                        transfer(b)
+                    for c in sureLosers:
+                        for i in E.takePileIndices(c.cid):
+                            transfer(i)
                     for c in sureLosers:
                         c.vote = V0
                     E.logAction('transfer', "Transfer defeated: %s" % ", ".join(str(c) for c in sureLosers))
@@ -340,15 +344,14 @@ class Rule(MethodWIGM):
             ##          If a surplus (possibly zero) is transferred, continue at step B.1.
             ##
             if C.pending():
-                high_vote = max(c.vote for c in C.pending())
-                high_candidates = [c for c in C.pending() if c.vote == high_vote]
+                high_candidates = C.highest('pending')
                 high_candidate = breakTie(E, high_candidates, 'surplus')
                 high_candidate.unpend('Transfer high surplus')
                 surplus = high_candidate.vote - E.quota
 
-                for b in (b for b in E.ballots if b.topRank == high_candidate.cid):
-                    b.weight = (b.weight * surplus) / high_candidate.vote
-                    transfer(b)
+                for i in E.takePileIndices(high_candidate.cid):
+                    B.weight[i] = (B.weight[i] * surplus) / high_candidate.vote
+                    transfer(i)
                 high_candidate.vote = E.quota
                 E.logAction('transfer', "Surplus transferred: %s (%s)" % (high_candidate, surplus))
 
@@ -360,12 +363,11 @@ class Rule(MethodWIGM):
             elif C.hopeful():
                 #  find & defeat candidate with lowest vote
                 #
-                low_vote = min(c.vote for c in C.hopeful())
-                low_candidates = [c for c in C.hopeful() if c.vote == low_vote]
+                low_candidates = C.lowest()
                 low_candidate = breakTie(E, low_candidates, 'defeat')
                 low_candidate.defeat()
-                for b in (b for b in E.ballots if b.topRank == low_candidate.cid):
-                    transfer(b)
+                for i in E.takePileIndices(low_candidate.cid):
+                    transfer(i)
                 low_candidate.vote = V0
                 E.logAction('transfer', "Transfer defeated: %s" % low_candidate)
 
@@ -28,20 +28,27 @@ class ArithmeticValuesError(Exception):
     "election arithmetic value selection error"
 
 def ArithmeticClass(options):
-    "initialize a value class and return it"
+    '''
+    initialize a new arithmetic context and return it
+    
+    The context is a subclass of the value class (Rational, Fixed or Guarded)
+    with its own class variables (precision, display, statistics...),
+    so that elections using different arithmetic can coexist.
+    '''
 
     arithmetic = options.setopt('arithmetic', default='guarded')
     if arithmetic == 'rational':
-        rational.Rational.initialize(options)
-        return rational.Rational
-    if arithmetic in ('fixed', 'integer'):
-        fixed.Fixed.initialize(options)
-        return fixed.Fixed
-    if arithmetic in ('guarded'):
-        guarded.Guarded.initialize(options)
-        return guarded.Guarded
-    vals = ' '.join(arithmeticNames)
-    raise ArithmeticValuesError("unknown arithmetic %s\n\tuse: %s" % (arithmetic, vals))
+        base = rational.Rational
+    elif arithmetic in ('fixed', 'integer'):
+        base = fixed.Fixed
+    elif arithmetic in ('guarded'):
+        base = guarded.Guarded
+    else:
+        vals = ' '.join(arithmeticNames)
+        raise ArithmeticValuesError("unknown arithmetic %s\n\tuse: %s" % (arithmetic, vals))
+    cls = type(base.__name__, (base,), dict(__slots__=(), __module__=base.__module__))
+    cls.initialize(options)
+    return cls
 
 def helps(helps):   # pylint: disable=W0621
     "build a help-string dictionary"
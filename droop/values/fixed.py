@@ -22,6 +22,7 @@ This file is part of Droop.
 '''
 
 from __future__ import absolute_import
+import operator
 from ..common import UsageError
 
 class Fixed(object):
@@ -34,6 +35,8 @@ class Fixed(object):
     exact = False
     quasi_exact = False
     epsilon = None      # smallest value > 0
+    sortKey = operator.attrgetter('_value') # raw (scaled-integer) key, in value order
+    sortSlack = 0       # raw keys of equal values are equal
     
     precision = None    # precision in decimal digits
     display = None      # display precision, in decimal digits
@@ -135,25 +138,25 @@ See also: guarded, rational
     #
     def __add__(self, other):
         "self + other"
-        v = Fixed(other)
+        v = self.__class__(other)
         v._value += self._value
         return v
 
     def __sub__(self, other):
         "subtract other from self"
-        v = Fixed(other)
+        v = self.__class__(other)
         v._value = self._value - v._value
         return v
         
     def __neg__(self):
         "return negated self"
-        v = Fixed(self)
+        v = self.__class__(self)
         v._value = -v._value
         return v
 
     def __pos__(self):
         "return +self"
-        return Fixed(self)
+        return self.__class__(self)
 
     def __nonzero__(self):
         "bool(self)"
@@ -161,13 +164,13 @@ See also: guarded, rational
 
     def __abs__(self):
         "absolute value"
-        v = Fixed(self)
+        v = self.__class__(self)
         v._value = abs(v._value)
         return v
         
     def __mul__(self, other):
         "return self * other"
-        v = Fixed(self)
+        v = self.__class__(self)
         if isinstance(other, (int, long)):
             v._value *= other
             return v  # no scaling needed
@@ -177,7 +180,7 @@ See also: guarded, rational
         
     def __floordiv__(self, other):
         "return self // other"
-        v = Fixed(self)
+        v = self.__class__(self)
         if isinstance(other, (int, long)):
             v._value //= other
             return v
@@ -262,7 +265,7 @@ See also: guarded, rational
         print as full precision
         '''
         v = self._value
-        if Fixed.precision == 0:  # integer arithmetic
+        if self.precision == 0:  # integer arithmetic
             return str(v)
         if self.display < self.precision:
             v += self.__scaledr    # round
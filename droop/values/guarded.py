@@ -21,6 +21,7 @@ This file is part of Droop.
 '''
 
 from __future__ import absolute_import
+import operator
 from ..common import UsageError
 
 class Guarded(object):
@@ -38,6 +39,8 @@ class Guarded(object):
     info = None
     exact = True
     quasi_exact = True
+    sortKey = operator.attrgetter('_value') # raw (scaled-integer) key, in value order
+    sortSlack = None    # raw keys within sortSlack of each other compare equal (see initialize)
     
     precision = None
     guard = None
@@ -130,6 +133,7 @@ See also: fixed, rational
         cls.__geps = cls.__scaleg // 2
         if cls.__geps == 0:
             cls.__geps = 1  # no less than an epsilon
+        cls.sortSlack = cls.__geps - 1
 
         #  We keep statistics on how close our comparisons come to epsilon
         #
@@ -171,13 +175,13 @@ See also: fixed, rational
         #  normally that's the guard digits, but it could be more if display<precision
         #    or less if display>precision
         gv = (v + self.__scaledr) // self.__scaledd
-        if Guarded.display <= Guarded.precision:
-            s = Guarded.__dfmt % (gv // self.__scaled, gv % self.__scaled)
+        if self.display <= self.precision:
+            s = self.__dfmt % (gv // self.__scaled, gv % self.__scaled)
         else:
             #  here the fractional part has more than precision digits (by display-precision)
             #  we'll show <precision> digits, then _, then (display-precision) digits
             gvp = gv % self.__scaled
-            s = Guarded.__dfmt % (gv // self.__scaled, gvp // self.__scaledg, gvp % self.__scaledg)
+            s = self.__dfmt % (gv // self.__scaled, gvp // self.__scaledg, gvp % self.__scaledg)
         return s
 
     def __init__(self, arg, setval=False):
@@ -197,21 +201,21 @@ See also: fixed, rational
     #
     def __add__(self, other):
         "self + other"
-        v = Guarded(other)
-        return Guarded(self._value + v._value, True)
+        v = self.__class__(other)
+        return self.__class__(self._value + v._value, True)
 
     def __sub__(self, other):
         "subtract other from self"
-        v = Guarded(other)
-        return Guarded(self._value - v._value, True)
+        v = self.__class__(other)
+        return self.__class__(self._value - v._value, True)
         
     def __neg__(self):
         "return negated self"
-        return Guarded(-self._value, True)
+        return self.__class__(-self._value, True)
 
     def __pos__(self):
         "return +self"
-        return Guarded(self._value, True)
+        return self.__class__(self._value, True)
 
     def __nonzero__(self):
         "bool(self)"
@@ -219,19 +223,19 @@ See also: fixed, rational
 
     def __abs__(self):
         "absolute value"
-        return Guarded(abs(self._value), True)
+        return self.__class__(abs(self._value), True)
         
     def __mul__(self, other):
         "return self * other"
         if isinstance(other, (int, long)):
-            return Guarded(self._value * other, True)
-        return Guarded((self._value*other._value)//self.__scale, True)
+            return self.__class__(self._value * other, True)
+        return self.__class__((self._value*other._value)//self.__scale, True)
         
     def __floordiv__(self, other):
         "return self // other"
         if isinstance(other, (int, long)):
-            return Guarded(self._value // other, True)
-        return Guarded((self._value * self.__scale) // other._value, True)
+            return self.__class__(self._value // other, True)
+        return self.__class__((self._value * self.__scale) // other._value, True)
 
     __div__ = __floordiv__
     __truediv__ = __floordiv__
@@ -294,17 +298,26 @@ See also: fixed, rational
     #  comparison operators
     #
     def __cmp__(self, other):
+        cls = self.__class__    # statistics are kept by our arithmetic context
         gdiff = abs(self._value - other._value)
-        if (gdiff < Guarded.__geps) and (gdiff > Guarded.maxDiff):
-            Guarded.maxDiff = gdiff
-        if (gdiff >= Guarded.__geps) and (gdiff < Guarded.minDiff):
-            Guarded.minDiff = gdiff
-        if gdiff < Guarded.__geps:
+        if (gdiff < cls.__geps) and (gdiff > cls.maxDiff):
+            cls.maxDiff = gdiff
+        if (gdiff >= cls.__geps) and (gdiff < cls.minDiff):
+            cls.minDiff = gdiff
+        if gdiff < cls.__geps:
             return 0
         if self._value > other._value:
             return 1
         return -1
 
+    @classmethod
+    def noteDiff(cls, gdiff):
+        "note, in the statistics, a comparison (made by raw key) of values gdiff apart (see __cmp__)"
+        if (gdiff < cls.__geps) and (gdiff > cls.maxDiff):
+            cls.maxDiff = gdiff
+        if (gdiff >= cls.__geps) and (gdiff < cls.minDiff):
+            cls.minDiff = gdiff
+
     def __eq__(self, other):
         return self.__cmp__(other) == 0
     def __ne__(self, other):
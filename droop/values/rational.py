@@ -31,6 +31,8 @@ class Rational(Fraction):
     info = 'rational arithmetic'
     exact = True             # clients that care about such things can look at V.exact
     quasi_exact = False      # and V.quasi_exact to change their behavior
+    sortKey = staticmethod(lambda v: v)   # exact, so values are their own (fraction) key
+    sortSlack = 0
     dp = None    # str() display precision
     _dps = None  # display scale factor
     _dpr = None  # display rounding constant
@@ -97,11 +99,11 @@ See also: fixed, guarded
     def __str__(self):
         "represent Rational as fixed-decimal string"
         if self._numerator == 0 or self._denominator == 1:  # pylint: disable=E1101
-            v = self._numerator * Rational._dps             # pylint: disable=E1101
+            v = self._numerator * self._dps                 # pylint: disable=E1101
         else:
-            self += Rational._dpr  # add 1/2 of lsd for rounding
-            v = self._numerator * Rational._dps / self._denominator
-        return Rational._dfmt % (v // Rational._dps, v % Rational._dps)
+            self += self._dpr  # add 1/2 of lsd for rounding
+            v = self._numerator * self._dps / self._denominator
+        return self._dfmt % (v // self._dps, v % self._dps)
     
     def __repr__(self): # pragma: no cover
         """repr(self)"""
@@ -109,13 +111,13 @@ See also: fixed, guarded
 
     def __copy__(self): # pragma: no cover
         "borrowed from Fraction"
-        if type(self) == Rational:
+        if isinstance(self, Rational):
             return self     # I'm immutable; therefore I am my own clone
         return self.__class__(self._numerator, self._denominator)   # pylint: disable=E1101
 
     def __deepcopy__(self, memo):   # pragma: no cover
         "borrowed from Fraction"
-        if type(self) == Rational:
+        if isinstance(self, Rational):
             return self     # My components are also immutable
         return self.__class__(self._numerator, self._denominator)   # pylint: disable=E1101
 
@@ -156,8 +158,9 @@ def _wrap_method(method):
     "wrap a Fraction method in Rational"
     fraction_method = getattr(Fraction, method)
     def x(*args):
-        "call Fraction method and change result to Rational"
-        return Rational(fraction_method(*args))
+        "call Fraction method and change result to Rational (of the arithmetic context of self)"
+        cls = args[0].__class__ if isinstance(args[0], Rational) else Rational
+        return cls(fraction_method(*args))
     x.func_name = method    # pylint: disable=W0612
     setattr(Rational, method, x)
 
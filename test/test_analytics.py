@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Unit test for droop.analytics package
+
+Copyright 2010 by Jonathan Lundell
+
+This file is part of Droop.
+
+    Droop is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Droop is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Droop.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from __future__ import absolute_import
+import unittest
+import os
+
+from .common import testdir
+from droop.profile import ElectionProfile
+from droop.analytics import ProfileAnalytics, numpy
+
+p_eq = '''4 2
+3 1 2 3 0
+2 2=3 1 0
+1 4 0
+2 3 1 0
+1 1=2=3=4 0
+0
+"Castor"
+"Pollux"
+"Helen"
+"Leda"
+"Equal rankings"
+'''
+
+def bruteForce(profile):
+    "the analytics of profile, tallied a ballot line at a time"
+    cids = sorted(profile.eligible | profile.withdrawn)
+    first, lengths, ranked = dict.fromkeys(cids, 0), dict(), dict.fromkeys(cids, 0)
+    pairwise = dict((a, dict.fromkeys([b for b in cids if b != a], 0)) for a in cids)
+    lines = [(bl.multiplier, [[cid] for cid in bl.ranking]) for bl in profile.ballotLines]
+    lines += [(bl.multiplier, [list(rank) for rank in bl.ranking]) for bl in profile.ballotLinesEqual]
+    for m, ranking in lines:
+        rankOf = dict((cid, r) for r, rank in enumerate(ranking) for cid in rank)
+        for cid in ranking[0]:
+            first[cid] += m
+        lengths[len(rankOf)] = lengths.get(len(rankOf), 0) + m
+        for a in rankOf:
+            ranked[a] += m
+            for b in pairwise[a]:
+                if rankOf[a] < rankOf.get(b, len(ranking)):
+                    pairwise[a][b] += m
+    return first, lengths, ranked, pairwise
+
+class AnalyticsTest(unittest.TestCase):
+    "test ProfileAnalytics"
+
+    def check(self, profile, useNumpy=True):
+        "compare the analytics of profile with a brute-force tally"
+        a = ProfileAnalytics(profile, useNumpy)
+        self.assertEqual((a.firstPrefs, a.rankingLengths, a.ranked, a.pairwise), bruteForce(profile))
+        self.assertEqual(a.nBallots, profile.nBallots)
+        for cid, n in a.ranked.items():
+            self.assertAlmostEqual(a.rankedShare[cid], float(n) / profile.nBallots)
+        return a
+
+    def testEqual(self):
+        "equal rankings"
+        p = ElectionProfile(data=p_eq)
+        a = self.check(p, useNumpy=False)
+        self.assertEqual(a.firstPrefs, {1:4, 2:3, 3:5, 4:2})
+        self.assertEqual(a.rankingLengths, {1:1, 2:2, 3:5, 4:1})
+        self.assertEqual(a.pairwise[1][2], 5)
+        self.assertEqual(a.pairwise[2][1], 2)
+
+    def testProfiles(self):
+        "brute-force comparison, with and without NumPy"
+        for name in ('SC.blt', 'M135.blt', '42.blt'):
+            p = ElectionProfile(os.path.join(testdir, 'blt', name))
+            self.check(p, useNumpy=False)
+            self.check(p)
+            self.check(p.view(withdrawn=[1], maxRank=2))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def testNumpy(self):
+        "the NumPy and pure-Python tallies agree"
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        a, b = ProfileAnalytics(p), ProfileAnalytics(p, useNumpy=False)
+        for name in ('firstPrefs', 'rankingLengths', 'ranked', 'rankedShare', 'pairwise'):
+            self.assertEqual(getattr(a, name), getattr(b, name))
+
+    def testCache(self):
+        "analytics are cached on the profile, and recomputed after appended lines"
+        p = ElectionProfile(data=p_eq)
+        a = p.analytics()
+        self.assertTrue(p.analytics() is a)
+        p.appendBallots('2 4 1 0\n')
+        b = p.analytics()
+        self.assertFalse(b is a)
+        self.assertEqual(b.firstPrefs[4], a.firstPrefs[4] + 2)
+        self.assertEqual(b.pairwise[4][1], a.pairwise[4][1] + 2)
+        v = p.view(withdrawn=[4])
+        self.assertTrue(v.analytics() is v.analytics())
+        self.assertEqual(v.analytics().firstPrefs[1], a.firstPrefs[1] + 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -83,6 +83,212 @@ class ElectionBasics(unittest.TestCase):
         self.assertTrue(r, dict)
         self.assertEqual(r['actions'][-1]['tag'], 'log')
 
+class ElectionPiles(unittest.TestCase):
+    "test ballot piles"
+
+    def testPiles(self):
+        "ballots are piled by top-ranked candidate"
+        b = '''3 2 4 1 2 0 2 3 0 1 1 0 0 "Castor" "Pollux" "Helen" "Pollux and Helen should tie"'''
+        E = Election(ElectionProfile(data=b), dict(rule='wigm'))
+        E.buildPiles()
+        self.assertEqual(len(E.piles[1]), 2)
+        self.assertEqual(len(E.piles[2]), 0)
+        self.assertEqual(len(E.piles[3]), 1)
+        pile = E.takePile(1)
+        self.assertEqual(len(pile), 2)
+        self.assertEqual(len(E.piles[1]), 0)
+        b = pile[0]
+        b.advance()
+        E.pileBallot(b)
+        self.assertEqual(list(E.piles[2]), [b.i])
+        self.assertEqual(E.ballots[b.i].topRank, 2)
+
+    def testBallotViews(self):
+        "ballot views read and write the ballot state arrays"
+        b = '''3 2 4 1 2 0 2 3 0 1 1 0 0 "Castor" "Pollux" "Helen" "Pollux and Helen should tie"'''
+        E = Election(ElectionProfile(data=b), dict(rule='wigm'))
+        B = E.ballots
+        self.assertTrue(B.cids is E.electionProfile.ballotLines.cids)    # not copied
+        self.assertEqual(len(B), 3)
+        self.assertEqual([list(b.ranking) for b in B], [[1, 2], [3], [1]])
+        b = B[0]
+        self.assertEqual((b.topRank, b.index, b.multiplier), (1, 0, E.V(4)))
+        b.advance()
+        b.weight = E.V(1) / E.V(2)
+        self.assertEqual((b.topRank, b.index, B.pos[0]), (2, 1, 1))
+        self.assertEqual(B.vote(0), E.V(2))
+        b.advance()
+        self.assertTrue(b.exhausted)
+        self.assertEqual(b.topRank, None)
+        self.assertEqual(B[-1].topCand.name, 'Castor')
+        B.restartAll(E.V1)
+        self.assertEqual((b.index, b.weight, b.exhausted), (0, E.V1, False))
+
+class ElectionCoalesce(unittest.TestCase):
+    "coalescing ballot lines doesn't change a count"
+
+    def testCoalesceCount(self):
+        "compare reports with and without coalescing"
+        path = os.path.join(testdir, 'blt', 'SC.blt')
+        p0 = ElectionProfile(path)
+        p1 = ElectionProfile(path, coalesce=True)
+        self.assertTrue(len(p1.ballotLines) < len(p0.ballotLines))
+        for rulename in droop.electionRuleNames():
+            E0 = Election(p0, dict(rule=rulename))
+            E0.count()
+            E1 = Election(p1, dict(rule=rulename))
+            E1.count()
+            self.assertEqual(E0.report(), E1.report(), rulename)
+
+class ElectionUpdate(unittest.TestCase):
+    "appending ballots to a profile and updating its election"
+
+    def testUpdateCount(self):
+        "a count updated with appended ballots matches a count of all the ballots"
+        p0 = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        lines = p0.blt().splitlines()
+        nLines = len(p0.ballotLines)
+        header, ballots, trailer = lines[:1], lines[1:nLines+1], lines[nLines+1:]
+        half = nLines // 2
+        for rulename in droop.electionRuleNames():
+            p1 = ElectionProfile(data='\n'.join(header + ballots[:half] + trailer))
+            E1 = Election(p1, dict(rule=rulename))
+            E1.count()
+            E0 = Election(p0, dict(rule=rulename))
+            E0.count()
+            nBallots = p1.nBallots
+            self.assertEqual(p1.appendBallots(ballots[half:]), p0.nBallots - nBallots)
+            self.assertEqual(p1.nBallots, p0.nBallots)
+            E1.update()
+            self.assertEqual(len(E1.ballots), nLines)
+            self.assertEqual(E1.firstPrefs, Election(p0, dict(rule=rulename)).firstPrefs)
+            E1.count()
+            self.assertEqual(E0.report(), E1.report(), rulename)
+
+class ElectionRecount(unittest.TestCase):
+    "resetting and recounting an election"
+
+    def testRecount(self):
+        "a recount matches the first count, for every rule"
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        for rulename in droop.electionRuleNames():
+            E = Election(p, dict(rule=rulename))
+            E.count()
+            report, dump = E.report(), E.dump()
+            E.count()
+            self.assertEqual(E.report(), report, rulename)
+            self.assertEqual(E.dump(), dump, rulename)
+
+    def testReset(self):
+        "reset restores the state before counting"
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        E = Election(p, dict(rule='wigm'))
+        nActions = len(E.erecord['actions'])
+        E.count()
+        E.reset()
+        self.assertEqual((E.round, E.rounds, E.quota, E.elected), (0, [], None, None))
+        self.assertEqual(len(E.erecord['actions']), nActions)
+        self.assertEqual([c.state for c in E.C.select('all')], ['hopeful'] * len(E.C))
+        self.assertEqual(E.C.elected(), [])
+        self.assertTrue(all(c.vote == E.V0 for c in E.C))
+        self.assertTrue(all(b.index == 0 and b.weight == E.V1 for b in E.ballots))
+
+class ElectionContexts(unittest.TestCase):
+    "elections with different arithmetic coexist"
+
+    def testConcurrentCounts(self):
+        "elections built together and counted on threads match elections counted alone"
+        import threading
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        options = (dict(rule='meek', precision=12), dict(rule='mpls'), dict(rule='wigm', arithmetic='fixed', precision=6),
+            dict(rule='qpq', arithmetic='rational', display=4), dict(rule='meek', arithmetic='guarded', precision=5, guard=2))
+        reports = list()
+        for opts in options:
+            E = Election(p, dict(opts))
+            E.count()
+            reports.append(E.report())
+        elections = [Election(p, dict(opts)) for opts in options]
+        threads = [threading.Thread(target=E.count) for E in elections]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([E.report() for E in elections], reports)
+
+class ElectionViews(unittest.TestCase):
+    "counting views of a profile"
+
+    def testViewCounts(self):
+        "a view counts as the edited ballot file does"
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        pw = ElectionProfile(os.path.join(testdir, 'blt', 'SCw.blt'))
+        lines = p.blt().splitlines()
+        nLines = len(p.ballotLines)
+        header, ballots, trailer = lines[:1], lines[1:nLines+1], lines[nLines+1:]
+        ballots = [' '.join(b.split()[:4] + ['0']) for b in ballots]  # 3 ranks
+        p3 = ElectionProfile(data='\n'.join(header + ballots[::2] + trailer))
+        for rulename in droop.electionRuleNames():
+            for view, edited in ((p.view(withdrawn=[4]), pw), (p.view(maxRank=3, lines=xrange(0, nLines, 2)), p3)):
+                E = Election(view, dict(rule=rulename))
+                self.assertTrue(E.ballots.cids is p.ballotLines.cids)   # rankings read in place
+                E.count()
+                E0 = Election(edited, dict(rule=rulename))
+                E0.count()
+                self.assertEqual(E.report(), E0.report(), rulename)
+
+    def testViewBallots(self):
+        "ballots of a view skip masked candidates and stop at maxRank"
+        p = ElectionProfile(data='4 2\n3 1 2 3 0\n2 2 1 4 3 0\n1 4 0\n2 3 4 0\n0\n"A" "B" "C" "D" "Title"')
+        v = p.view(withdrawn=[1], maxRank=3, lines=[0, 1, 3])
+        E = Election(v, dict(rule='wigm'))
+        self.assertEqual([list(b.ranking) for b in E.ballots], [list(bl.ranking) for bl in v.ballotLines])
+        self.assertEqual([list(b.ranking) for b in E.ballots], [[2, 3], [2, 4], [3, 4]])
+        self.assertEqual([b.topRank for b in E.ballots], [2, 2, 3])
+        b = E.ballots[1]
+        b.advance()
+        self.assertEqual((b.index, b.topRank), (1, 4))
+        b.advance()
+        self.assertTrue(b.exhausted)
+        self.assertEqual((E.firstPrefs[2], E.firstPrefs[3]), (E.V(5), E.V(2)))
+
+    def testMappedBallots(self):
+        "a mapped binary profile's rankings are read in the map"
+        import tempfile
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            p.binWrite(path)
+            pm = ElectionProfile(path=path)
+            self.assertTrue(isinstance(pm.ballotLines.cids, ElectionProfile.MappedArray))
+            for rulename in ('wigm', 'meek'):
+                E = Election(pm, dict(rule=rulename))
+                self.assertTrue(E.ballots.cids is pm.ballotLines.cids)
+                E.count()
+                E0 = Election(p, dict(rule=rulename))
+                E0.count()
+                self.assertEqual(E.report(), E0.report(), rulename)
+        finally:
+            os.remove(path)
+
+class ElectionContests(unittest.TestCase):
+    "counting the contests of a split cast-vote-record export"
+
+    def testCountContests(self):
+        "contests counted in worker processes match contests counted one at a time"
+        import Droop
+        b = 'contest,rank 1,rank 2,rank 3\n' + ''.join('%s,%s\n' % (contest, ranks)
+            for contest, ranks in (('Mayor', 'Ann,Ben,'), ('Ward', 'Cy,Di,Ed'), ('Mayor', 'Ben,Cal,'),
+                ('Ward', 'Di,,Cy'), ('Mayor', 'Cal,Ann,Ben'), ('Ward', 'Ed,Cy,')) * 3)
+        profiles = ElectionProfile.cvrSplit(data=b, cvr=dict(seats=1))
+        options = dict(rule='meek')
+        reports = Droop.countContests(profiles, options)
+        self.assertEqual(reports, Droop.countContests(profiles, options, workers=2))
+        for contest, report in zip(sorted(profiles), reports):
+            E = Election(profiles[contest], dict(options))
+            E.count()
+            self.assertEqual(E.report(), report)
+
 class ElectionOptions(unittest.TestCase):
     "test options via [droop ...] in blt file"
 
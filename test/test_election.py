@@ -24,7 +24,8 @@ from __future__ import absolute_import
 import unittest
 
 from . import common  # to set sys.path
-from droop.election import Candidate, Candidates
+from droop.election import Election, Candidate, Candidates
+from droop.profile import ElectionProfile
 
 if common.pyflakes: # satisfy pyflakes that we're using common
     pass
@@ -83,5 +84,112 @@ class CandidatesTest(unittest.TestCase):
         self.assertEqual(C.notpending(), [c2], "elected-not-pending candidate")
         self.assertRaises(ValueError, C.select, 'all', "bad-order")
 
+    def testCandidatesPartitions(self):
+        "state partitions follow candidate state changes"
+        C = Candidates()
+        c1 = Candidate(None, 1, 1, 3, 'Able', None, False)
+        c2 = Candidate(None, 2, 2, 2, 'Baker', None, False)
+        c3 = Candidate(None, 3, 3, 1, 'Charlie', None, True)
+        C.add(c3)
+        C.add(c2)
+        C.add(c1)
+        self.assertEqual(C.hopeful(), [c1, c2], "hopeful candidates, CID order")
+        self.assertEqual(C.withdrawn(), [c3], "withdrawn candidate")
+        self.assertEqual(C.eligible(), [c1, c2], "eligible candidates")
+        self.assertTrue(C.isHopeful(1))
+        self.assertTrue(C.isHopeful(c2))
+        self.assertFalse(C.isHopeful(3))
+        c2.state = 'elected'
+        c2.pending = True
+        self.assertEqual(C.hopeful(), [c1], "hopeful after elect")
+        self.assertEqual(C.pending(), [c2], "pending after elect")
+        self.assertTrue(C.isPending(2))
+        C2 = C.copy()
+        c2.pending = False
+        self.assertEqual(C.pending(), [], "pending after unpend")
+        self.assertEqual(C.notpending(), [c2], "notpending after unpend")
+        self.assertEqual(C2.pending(), [c2], "copy is unaffected by original")
+        c1.state = 'defeated'
+        self.assertEqual(C.hopeful(), [], "no hopeful candidates")
+        self.assertEqual(C.defeated(), [c1], "defeated candidate")
+        self.assertEqual(C.select('bogus'), [], "unknown state")
+
+    def testVoteIndex(self):
+        "vote-order queries by raw key agree with arithmetic comparisons"
+        b = '6 2 1 1 2 0 1 3 0 1 4 0 1 5 0 1 6 0 1 6 5 0 0 "a" "b" "c" "d" "e" "f" "t"'
+        votes = {1:'2.5', 2:'1', 3:'3', 4:'1', 5:'1.25', 6:'3'}
+        results = list()
+        for rule, arithmetic in (('mpls', 'fixed'), ('mpls', 'rational'), ('wigm', 'guarded')):
+            E = Election(ElectionProfile(data=b), dict(rule=rule, arithmetic=arithmetic, precision=4))
+            C = E.C
+            self.assertTrue(C.voteIndex() is not None)
+            for c in C:
+                c.vote = E.V(int(float(votes[c.cid]) * 100)) / E.V(100)
+            C.byCid(3).state = 'defeated'
+            C.byCid(1).state = 'elected'
+            C.byCid(1).pending = True
+            results.append((rule, [c.cid for c in C.hopeful(order='vote')],
+                [c.cid for c in C.hopeful(order='vote', reverse=True)],
+                [c.cid for c in C.byVote(C.hopeful())], [c.cid for c in C.lowest()],
+                [c.cid for c in C.highest()], [c.cid for c in C.highest('hopeful')],
+                [c.cid for c in C.withinLowest(E.V(1) / E.V(4))]))
+            C.byCid(4).vote = E.V(5)
+            results[-1] += ([c.cid for c in C.hopeful(order='vote')], [c.cid for c in C.lowest()])
+            C.byCid(2).state = 'defeated'
+            C.byCid(3).state = 'hopeful'
+            C.byCid(1).pending = False
+            results[-1] += ([c.cid for c in C.hopeful(order='vote')], [c.cid for c in C.eligible(order='vote')],
+                [c.cid for c in C.notpending(order='vote')], [c.cid for c in C.highest('eligible')])
+            C.arrays.vote[5] = E.V(6)
+            C.votesChanged()
+            results[-1] += ([c.cid for c in C.highest('hopeful')],)
+        self.assertTrue(Candidates.voteKey(None) is None)
+        self.assertEqual(results[0][1:], ([2, 4, 5, 6], [6, 5, 4, 2], [2, 4, 5, 6], [2, 4], [1], [6], [2, 4, 5],
+            [2, 5, 6, 4], [2], [5, 3, 6, 4], [2, 5, 1, 3, 6, 4], [1], [4], [5]))
+        self.assertEqual(results[0][1:], results[1][1:])
+        self.assertEqual(results[0][1:], results[2][1:])
+
+    def testVoteIndexGuarded(self):
+        "Guarded votes within geps of each other tie in the index, and the closest calls are noted"
+        b = '4 2 1 1 2 0 1 3 0 1 4 0 1 4 0 0 "a" "b" "c" "d" "t"'
+        E = Election(ElectionProfile(data=b), dict(rule='wigm', arithmetic='guarded', precision=4, guard=4))
+        C, V = E.C, E.V
+        self.assertEqual(V.sortSlack, 4999)
+        third, unit = V(1) / V(3), V(1) / V(10000)
+        for cid, vote in ((1, V(1)), (2, third + third + third), (3, V(1) + unit), (4, V(2))):
+            C.byCid(cid).vote = vote
+        V.maxDiff, V.minDiff = 0, 10**20
+        self.assertTrue(C.byCid(2).vote._value < C.byCid(1).vote._value)
+        self.assertEqual([c.cid for c in C.lowest()], [1, 2])
+        self.assertEqual([c.cid for c in C.byVote(C.hopeful())], [1, 2, 3, 4])
+        self.assertEqual([c.cid for c in C.hopeful(order='vote')], [1, 2, 3, 4])
+        self.assertEqual([c.cid for c in C.hopeful(order='vote', reverse=True)], [4, 3, 2, 1])
+        self.assertEqual([c.cid for c in C.highest('hopeful')], [4])
+        self.assertEqual([c.cid for c in C.withinLowest(unit)], [1, 2, 3])
+        self.assertEqual((V.maxDiff, V.minDiff), (1, 9999))
+
+    def testCandidateArrays(self):
+        "candidate state is kept in CID-indexed arrays, and copies have their own"
+        b = '3 2 2 1 2 0 1 3 0 0 "a" "b" "c" "t"'
+        E = Election(ElectionProfile(data=b), dict(rule='meek'))
+        C = E.C
+        A = C.arrays
+        c = C.byCid(2)
+        c.vote = E.V(3)
+        c.kf = E.V(1) / E.V(2)
+        c.state = 'elected'
+        c.pending = True
+        self.assertEqual((A.vote[2], A.kf[2], A.pending[2]), (E.V(3), E.V(1) / E.V(2), True))
+        self.assertEqual(Candidates.states[A.state[2]], 'elected')
+        A.vote[2] = E.V(4)
+        self.assertEqual(c.vote, E.V(4))
+        C2 = C.copy()
+        c.vote = E.V(5)
+        c.state = 'defeated'
+        c2 = C2.byCid(2)
+        self.assertEqual((c2.vote, c2.state, c2.pending), (E.V(4), 'elected', True))
+        self.assertEqual([x.cid for x in C2.pending()], [2])
+        self.assertEqual([x.cid for x in C.defeated()], [2])
+
 if __name__ == '__main__':
     unittest.main()
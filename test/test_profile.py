@@ -22,9 +22,11 @@ This file is part of Droop.
 '''
 from __future__ import absolute_import
 import unittest
+import os, re, stat, tempfile, shutil, time, random, itertools, array
+import gzip, bz2, pickle
 
 from .common import testdir
-from droop.profile import ElectionProfile, ElectionProfileError
+from droop.profile import ElectionProfile, ElectionProfileError, ProfileCache
 
 p_42 = '''3 2
 4 1 2 0
@@ -250,6 +252,182 @@ class ProfileTest(unittest.TestCase):
         pp = ElectionProfile(path)
         self.assertFalse(pp.compare(pd), 'compare election 42 from file vs data blob')
 
+    def testStreamLineNumber(self):
+        "streamed file reports the same error line as a data blob"
+        b = '3 2\n4 1 2 0\n2x 3 0\n0\n"Castor"\n"Pollux"\n"Helen"\n"Title"\n'
+        fd, path = tempfile.mkstemp(suffix='.blt')
+        try:
+            os.write(fd, b.replace('\n', '\r\n'))
+            os.close(fd)
+            try:
+                ElectionProfile(data=b)
+            except ElectionProfileError as err:
+                derr = str(err)
+            try:
+                ElectionProfile(path=path)
+            except ElectionProfileError as err:
+                perr = str(err)
+        finally:
+            os.unlink(path)
+        self.assertTrue(derr.endswith('line 3; expected decimal number'))
+        self.assertEqual(derr, perr)
+
+    def testCanonicalLines(self):
+        "canonical ballot lines parse the same as tokenized lines"
+        b1 = '4 2 -4\n3 1 2 0\n1 2 0\n2 3 1 4 0\n1 4 0\n0\n"A" "B" "C" "D" "Title"'
+        b2 = '4 2 -4\n3 1 2 0 # c\n1 2 0 # c\n2 3 1 4 0 # c\n1 4 0 # c\n0\n"A" "B" "C" "D" "Title"'
+        p1 = ElectionProfile(data=b1)
+        p2 = ElectionProfile(data=b2)
+        self.assertFalse(p1.compare(p2))
+        self.assertEqual(p1.nBallots, 6)
+        self.assertEqual([bl.line for bl in p1.ballotLines], [2, 3, 4])
+        b3 = '3 2\n4 1 2 0\n2 3 4 0\n0\n"A" "B" "C" "Title"'
+        self.assertRaises(ElectionProfileError, ElectionProfile, data=b3)
+
+    def testSpanningBallots(self):
+        "a ballot continued on the next line isn't taken for a canonical line"
+        def ballots(p):
+            "the profile's ballot lines"
+            return [(bl.multiplier, list(bl.ranking)) for bl in p.ballotLines]
+        t = '\n0\n"A" "B" "C" "Title"'
+        for spanned, single in (('3 2\n3 1 0', '3 2 3 1 0'), ('3\n1 2 0', '3 1 2 0'),
+                ('(a)\n1 2 0\n(b) 3 0\n(c) 2 0', '(a) 1 2 0\n(b) 3 0\n(c) 2 0'),
+                ('2 1 0\n1 2\n3 1 0\n1 3 0', '2 1 0\n1 2 3 1 0\n1 3 0')):
+            p = ElectionProfile(data='3 2\n' + spanned + t)
+            self.assertEqual(ballots(p), ballots(ElectionProfile(data='3 2\n' + single + t)), spanned)
+        p = ElectionProfile(data='3 2\n3 1 0' + t)
+        p.appendBallots('2\n3 1 0\n1 2\n3 0')
+        self.assertEqual(ballots(p), [(3, [1]), (2, [3, 1]), (1, [2, 3])])
+
+    def testCoalesce(self):
+        "identical rankings are merged when coalescing"
+        b = '3 2\n1 1 2 0\n2 3 0\n1 1 2 0\n1 2=3 0\n1 2=3 0\n1 1 0\n0\n"A" "B" "C" "Title"'
+        p0 = ElectionProfile(data=b)
+        p1 = ElectionProfile(data=b, coalesce=True)
+        self.assertEqual(p0.nBallots, p1.nBallots)
+        self.assertEqual(len(p0.ballotLines), 4)
+        self.assertEqual([(bl.multiplier, list(bl.ranking)) for bl in p1.ballotLines],
+            [(2, [1, 2]), (2, [3]), (1, [1])])
+        self.assertEqual([bl.multiplier for bl in p1.ballotLinesEqual], [2])
+        b = '3 2 (a) 1 2 0 (b) 1 2 0 (c) 3 0 0 "A" "B" "C" "Title"'
+        self.assertEqual(len(ElectionProfile(data=b, coalesce=True).ballotLines), 3)
+
+    def testBallotLinesStore(self):
+        "ballot lines are stored in flat arrays and read back as views"
+        b = '3 2\n4 1 2 0\n2 3 0\n1 3 1 2 0\n1 2=3 0\n0\n"A" "B" "C" "Title"'
+        p = ElectionProfile(data=b)
+        BL = p.ballotLines
+        self.assertEqual(list(BL.cids), [1, 2, 3, 3, 1, 2])
+        self.assertEqual(list(BL.offsets), [0, 2, 3, 6])
+        self.assertEqual(list(BL.multipliers), [4, 2, 1])
+        self.assertEqual(list(BL.lines), [2, 3, 4])
+        self.assertEqual(list(BL.ranking(2)), [3, 1, 2])
+        self.assertEqual((BL[-1].multiplier, list(BL[-1].ranking), BL[-1].line), (1, [3, 1, 2], 4))
+        self.assertRaises(IndexError, BL.__getitem__, 3)
+        self.assertEqual([list(bl.ranking) for bl in BL], [[1, 2], [3], [3, 1, 2]])
+        self.assertEqual(len(p.ballotLinesEqual), 1)
+
+    def testDuplicateCids(self):
+        "the bulk duplicate-CID check reports the first duplicate, as a line-by-line check would"
+        rng = random.Random(17)
+        for nCand, maxRank in ((9, 9), (300, 12), (40, 40)):
+            for trial in xrange(10):
+                rankings = [rng.sample(xrange(1, nCand+1), rng.randint(1, maxRank)) for i in xrange(300)]
+                expect = 'no error'
+                for i in sorted(rng.sample(xrange(300), trial % 3)):
+                    r = rankings[i]
+                    if len(r) > 1:
+                        r[rng.randrange(1, len(r))] = r[rng.randrange(len(r) - 1)]
+                for i, r in enumerate(rankings):
+                    if len(set(r)) < len(r):
+                        cid = [c for k, c in enumerate(r) if c in r[:k]][0]
+                        expect = 'candidate ID %d duplicated on line %d' % (cid, i + 2)
+                        break
+                b = '%d 1\n%s\n0\n%s"T"' % (nCand, '\n'.join('1 %s 0' % ' '.join(map(str, r)) for r in rankings),
+                    ''.join('"C%d" ' % cid for cid in xrange(nCand)))
+                try:
+                    ElectionProfile(data=b)
+                    error = 'no error'
+                except ElectionProfileError as err:
+                    error = str(err)
+                self.assertEqual(error, expect)
+
+    def testDuplicateCidsLong(self):
+        "rankings too long to check in bulk leave the rest of their chunk to the bulk check"
+        bulkClean = ElectionProfile._ElectionProfile__bulkClean   # pylint: disable=E1101
+        ranking = ' '.join(str(cid) for cid in xrange(1, 41))
+        b = '40 1\n1 %s 0\n%s\n0\n%s"T"' % (ranking, '\n'.join(['1 2 3 0', '1 4 0'] * 20),
+            ''.join('"C%d" ' % cid for cid in xrange(40)))
+        BL = ElectionProfile(data=b).ballotLines
+        self.assertTrue(bulkClean(BL, 0, len(BL)))
+        self.assertTrue(bulkClean(BL, 0, 1))
+        BL.cids[BL.offsets[3] + 1] = 2         # a duplicate in a short line
+        self.assertFalse(bulkClean(BL, 0, len(BL)))
+        self.assertTrue(bulkClean(BL, 0, 3))
+        BL.cids[BL.offsets[3] + 1] = 3
+        BL.cids[1] = 1                          # a duplicate in the long line
+        self.assertFalse(bulkClean(BL, 0, len(BL)))
+        self.assertTrue(bulkClean(BL, 1, len(BL)))
+
+    def testAppendBallots(self):
+        "append a batch of ballot lines"
+        p = ElectionProfile(data=p_42)
+        self.assertEqual(p.appendBallots('3 3 1 0\n1 2 0\n'), 4)
+        self.assertEqual(p.nBallots, 10)
+        self.assertEqual([(bl.multiplier, list(bl.ranking)) for bl in p.ballotLines],
+            [(4, [1, 2]), (2, [3]), (3, [3, 1]), (1, [2])])
+        self.assertEqual(p.appendBallots(['1 1=2 0']), 1)
+        self.assertEqual(len(p.ballotLinesEqual), 1)
+        for batch in ('2 1 1 0', '2 4 0', '2 1', '2 1 0 0 "A"'):
+            self.assertRaises(ElectionProfileError, p.appendBallots, batch)
+            self.assertEqual((p.nBallots, len(p.ballotLines), len(p.ballotLinesEqual)), (11, 4, 1))
+        self.assertEqual(list(p.ballotLines.cids), [1, 2, 3, 3, 1, 2])
+
+    def testPostings(self):
+        "the candidate-to-ballot-line index, and its update after appended lines"
+        p = ElectionProfile(data=p_42)
+        ps = p.postings()
+        self.assertTrue(p.postings() is ps)
+        self.assertEqual(dict((cid, list(lines)) for cid, lines in ps.lines.items()), {1:[0], 2:[0], 3:[1]})
+        self.assertEqual(dict((cid, list(ranks)) for cid, ranks in ps.ranks.items()), {1:[0], 2:[1], 3:[0]})
+        p.appendBallots('1 3 2 1 0\n1 2=3 1 0\n')
+        ps = p.postings()
+        self.assertEqual((list(ps.lines[1]), list(ps.ranks[1])), ([0, 2], [0, 2]))
+        self.assertEqual((list(ps.lines[3]), list(ps.ranks[3])), ([1, 2], [0, 0]))
+        self.assertEqual((list(ps.linesEqual[1]), list(ps.ranksEqual[1])), ([0], [1]))
+        self.assertEqual((list(ps.linesEqual[3]), list(ps.ranksEqual[3])), ([0], [0]))
+        p = ElectionProfile(os.path.join(testdir, 'blt', 'SC.blt'))
+        ps = p.postings()
+        BL = p.ballotLines
+        for cid in xrange(1, p.nCand+1):
+            expect = [(i, list(BL.ranking(i)).index(cid)) for i in xrange(len(BL)) if cid in BL.ranking(i)]
+            self.assertEqual(zip(ps.lines[cid], ps.ranks[cid]), expect)
+
+    def testProfileView(self):
+        "withdrawn-candidate mask, rank truncation and line selection"
+        p = ElectionProfile(data=p_42)
+        p.appendBallots('1 1=2 3 0\n2 3 2 1 0\n')
+        cids = list(p.ballotLines.cids)
+        v = p.view(withdrawn=[1])
+        self.assertEqual((v.eligible, v.withdrawn, v.nBallots), (set([2, 3]), set([1]), 9))
+        self.assertEqual([(bl.multiplier, list(bl.ranking)) for bl in v.ballotLines], [(4, [2]), (2, [3]), (2, [3, 2])])
+        self.assertEqual([bl.ranking for bl in v.ballotLinesEqual], [([2], [3])])
+        v = p.view(maxRank=1, lines=[0, 2])
+        self.assertEqual(v.nBallots, 7)
+        self.assertEqual([(bl.multiplier, list(bl.ranking), bl.line) for bl in v.ballotLines], [(4, [1], 2), (2, [3], 2)])
+        self.assertEqual([bl.ranking for bl in v.ballotLinesEqual], [([1, 2],)])
+        v = p.view(withdrawn=[3], maxRank=1, linesEqual=[])   # truncated, then masked
+        self.assertEqual([(bl.multiplier, list(bl.ranking)) for bl in v.ballotLines], [(4, [1])])
+        self.assertEqual(v.nBallots, 4)
+        self.assertEqual(list(p.ballotLines.cids), cids)
+        self.assertRaises(ElectionProfileError, p.view, withdrawn=[4])
+        self.assertRaises(ElectionProfileError, p.view, maxRank=0)
+        self.assertRaises(ElectionProfileError, p.view, withdrawn=[1, 2])  # too few candidates
+        self.assertRaises(ElectionProfileError, p.view, lines=[1], linesEqual=[])  # too few ballots
+        self.assertRaises(ElectionProfileError, p.view, lines=[0, 3])     # out of range
+        self.assertRaises(ElectionProfileError, p.view, lines=[-1])
+        self.assertRaises(ElectionProfileError, p.view, linesEqual=[1])
+
 class OptionNickTest(unittest.TestCase):
     "test blt option [nick...]"
     
@@ -434,5 +612,569 @@ class Utf8Test(unittest.TestCase):
         path = testdir + '/blt/42ubom.blt'
         self.assertEqual(ElectionProfile(path=path).title, 'Pøllüx and Hélen should tie')
 
+class CvrTest(unittest.TestCase):
+    "test cast-vote-record import"
+
+    cvr_csv = '''Ballot ID,Rank 2,Rank 1,Rank 3,Precinct
+a1,Bob,Alice,,P1
+a2,Carol,Bob,Alice,P1
+a3,,Carol,Bob,P2
+a4,Alice=Bob,Carol,,P2
+a5,overvote,Alice,Bob,P2
+
+a6,,,Bob,P3
+a7,Alice,Alice,Carol,P3
+'''
+
+    def rankings(self, p):
+        "ballot-line rankings of a profile"
+        return [list(bl.ranking) for bl in p.ballotLines] + [bl.ranking for bl in p.ballotLinesEqual]
+
+    def testCvrCsv(self):
+        "CSV rank columns, with overvote and skipped-rank rules"
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, title='CVR'))
+        self.assertEqual((p.title, p.nSeats, p.nCand, p.nBallots), ('CVR', 1, 3, 7))
+        self.assertEqual(p.candidateName, {1:'Alice', 2:'Bob', 3:'Carol'})
+        self.assertEqual(self.rankings(p), [[1, 2], [2, 3, 1], [3, 2], [3], [1], [2], [1, 3]])
+        self.assertEqual([bl.line for bl in p.ballotLines], [1, 2, 3, 4, 5, 6, 7])
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, overvote='skip', skipped=1))
+        self.assertEqual(self.rankings(p), [[1, 2], [2, 3, 1], [3], [3], [1], [1]])
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, overvote='equal'))
+        self.assertEqual(self.rankings(p), [[1, 2], [2, 3, 1], [3, 2], [1], [2], [1, 3], ([3], [1, 2])])
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, candidates=['Carol', 'Bob', 'Alice'],
+            withdrawn=['Bob']))
+        self.assertEqual(self.rankings(p), [[3], [1, 3], [1], [1], [3], [3, 1]])
+        self.assertEqual(p.eligible, set([1, 3]))
+
+    def testCvrJson(self):
+        "JSON-lines records"
+        b = '\n'.join(('{"id": "a1", "ranks": ["Alice", "Bob"]}',
+            '{"ranks": [null, "Bob", ["Alice", "Carol"]]}',
+            '',
+            '{"ranks": ["Carol", ["Alice"], "overvote", "Bob"]}'))
+        self.assertRaises(ElectionProfileError, ElectionProfile, data=b, cvr=dict(seats=2, format='json'))
+        b = b.replace('{"ranks": [null', '{"id": 2, "ranks": [null').replace('{"ranks": ["Carol"', '{"id": " a3 ", "ranks": ["Carol"')
+        p = ElectionProfile(data=b, cvr=dict(seats=2, format='json'))
+        self.assertEqual(p.candidateName, {1:'Alice', 2:'Bob', 3:'Carol'})
+        self.assertEqual(self.rankings(p), [[1, 2], [2], [3, 1]])
+        self.assertEqual(list(p.ballotIDs), ['a1', '2', 'a3'])
+        self.assertRaises(ElectionProfileError, ElectionProfile, data='{"ranks": "Alice"}',
+            cvr=dict(seats=1, format='json'))
+        self.assertRaises(ElectionProfileError, ElectionProfile, data='{"ranks": [1]}',
+            cvr=dict(seats=1, format='json'))
+
+    def testCvrBallotIDs(self):
+        "record IDs are kept as ballot IDs, and must be unique and on every record"
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, overvote='skip', skipped=1), coalesce=True)
+        self.assertEqual(list(p.ballotIDs), ['a%d' % i for i in xrange(1, 8)])
+        self.assertEqual(len(p.ballotLines), 6)         # lines with IDs aren't coalesced
+        self.assertEqual(list(p.ballotLineOf('a4').ranking), [3])
+        self.assertEqual(p.ballotLineOf('a6'), None)    # empty ballot
+        p = ElectionProfile(data=self.cvr_csv, cvr=dict(seats=1, overvote='equal'))
+        self.assertEqual(p.ballotLineOf('a4').ranking, ([3], [1, 2]))
+        self.assertFalse(p.compare(ElectionProfile(data=p.blt())))
+        for b in (self.cvr_csv.replace('a3,', 'a1,'), self.cvr_csv.replace('a3,', ',')):
+            self.assertRaises(ElectionProfileError, ElectionProfile, data=b, cvr=dict(seats=1))
+        ps = ElectionProfile.cvrSplit(data='id,contest,rank 1\n1,M,Ann\n2,W,Cy\n3,M,Ben\n', cvr=dict(seats=1))
+        self.assertEqual((list(ps['M'].ballotIDs), list(ps['W'].ballotIDs)), (['1', '3'], ['2']))
+
+    def testCvrErrors(self):
+        "bad CVR imports"
+        for cvr in (dict(), dict(seats=1, overvote='bogus'), dict(seats=1, format='xml'),
+                    dict(seats=1, candidates=['Alice', 'Bob'])):
+            self.assertRaises(ElectionProfileError, ElectionProfile, data=self.cvr_csv, cvr=cvr)
+        self.assertRaises(ElectionProfileError, ElectionProfile, data='id,name\n1,Alice\n', cvr=dict(seats=1))
+
+    def testCvrCoalesceWiden(self):
+        "coalesced records, and more than 255 candidates"
+        names = ['C%d' % i for i in xrange(300)]
+        b = 'rank 1,rank 2\n' + ''.join('%s,C299\n' % name for name in names * 2)
+        p = ElectionProfile(data=b, cvr=dict(seats=2), coalesce=True)
+        self.assertEqual((p.nCand, p.nBallots, len(p.ballotLines)), (300, 600, 300))
+        self.assertEqual(p.ballotLines.typecode, 'H')
+        self.assertEqual([bl.multiplier for bl in p.ballotLines], [2] * 300)
+        self.assertEqual(list(p.ballotLines[0].ranking), [1, 2])
+        self.assertEqual(list(p.ballotLines[298].ranking), [300, 2])
+        self.assertEqual(list(p.ballotLines[299].ranking), [2])
+
+    def testCvrSplit(self):
+        "one pass over a multi-contest export"
+        b = '''id,contest,rank 1,rank 2
+1,Mayor,Ann,Ben
+2,Ward 1,Cy,
+3,Mayor,Ben,
+4,Ward 1,Di,Cy
+5,Mayor,Ann,
+'''
+        ps = ElectionProfile.cvrSplit(data=b, cvr=dict(seats=1, contests={'Ward 1': dict(seats=2)}))
+        self.assertEqual(sorted(ps), ['Mayor', 'Ward 1'])
+        mayor, ward = ps['Mayor'], ps['Ward 1']
+        self.assertEqual((mayor.title, mayor.nSeats, mayor.nCand, mayor.nBallots), ('Mayor', 1, 2, 3))
+        self.assertEqual((ward.title, ward.nSeats, ward.nCand, ward.nBallots), ('Ward 1', 2, 2, 2))
+        self.assertEqual(self.rankings(mayor), [[1, 2], [2], [1]])
+        self.assertEqual(self.rankings(ward), [[1], [2, 1]])
+        self.assertEqual([bl.line for bl in ward.ballotLines], [2, 4])
+        self.assertEqual(ward.candidateName, {1:'Cy', 2:'Di'})
+        same = ElectionProfile(data='\n'.join(b.splitlines()[i] for i in (0, 1, 3, 5)), cvr=dict(seats=1))
+        self.assertEqual(self.rankings(same), self.rankings(mayor))
+        self.assertRaises(ElectionProfileError, ElectionProfile.cvrSplit, data=b,
+            cvr=dict(contests={'Mayor': dict(seats=1)}))
+        self.assertRaises(ElectionProfileError, ElectionProfile.cvrSplit, data=b,
+            cvr=dict(seats=1, contests={'Ward 1': dict(seats=3)}))
+
+class ValidateTest(unittest.TestCase):
+    "test validate-only parsing"
+
+    def testValidateSummary(self):
+        "summaries agree with the profiles"
+        for name in ('42.blt', 'SC.blt', 'SCw.blt', 'M135.blt', '513.blt'):
+            path = os.path.join(testdir, 'blt', name)
+            p = ElectionProfile(path=path)
+            summary = ElectionProfile.bltValidate(path=path)
+            self.assertEqual((summary['title'], summary['nBallots'], summary['withdrawn']),
+                (p.title, p.nBallots, sorted(p.withdrawn)), name)
+            self.assertEqual((summary['lines'], summary['linesEqual']),
+                (len(p.ballotLines) + len(p.ballotLinesEqual), len(p.ballotLinesEqual)), name)
+            self.assertEqual(sum(summary['rankings'].values()), p.nBallots)
+        summary = ElectionProfile.bltValidate(data='3 2 (a) 1 2 0 (b) 3 0 (c) 2 0 0 "A" "B" "C" "T"')
+        self.assertEqual(summary['ballotIDs'], 3)
+        summary = ElectionProfile.bltValidate(data='3 2 2 1 2 0 1 3 0 1 1=2 3 0 1 2 0 0 "A" "B" "C" "T"')
+        self.assertEqual((summary['ballotIDs'], summary['linesEqual']), (0, 1))
+        self.assertEqual(summary['firstPrefs'], {1:3, 2:2, 3:1})
+        self.assertEqual(summary['rankings'], {1:2, 2:2, 3:1})
+
+    def testValidateErrors(self):
+        "the same errors as a full parse"
+        for b in ('', '3 2 4 1 2 0 2 3 0', '3 2 4 1 2 0 2 3 x 0 0 "A" "B" "C" "T"',
+                  '3 2 4 1 2 0 1 3 3 0 2 1=1 0 0 "A" "B" "C" "T"',
+                  '3 2 1 2 2 0 4 1 2 0 2 3 0 0 "A" "B" "C" "T"',
+                  '3 2 1 1=2=1 0 4 1 2 0 2 3 0 0 "A" "B" "C" "T"',
+                  '3 2 2 3 0 0 "A" "B" "C" "T"', '3 4 4 1 2 0 2 3 0 0 "A" "B" "C" "T"',
+                  '3 2 (a) 1 2 0 (a) 3 0 (c) 2 0 0 "A" "B" "C" "T"',
+                  '3 2 (a) 1 2 0 4 3 0 0 "A" "B" "C" "T"', '3 2 4 1 2 0 2 3 0 0 "A" "B" "C"'):
+            try:
+                ElectionProfile(data=b)
+                self.fail('no error: %s' % b)
+            except ElectionProfileError as err:
+                message = str(err)
+            try:
+                ElectionProfile.bltValidate(data=b)
+                self.fail('no validate error: %s' % b)
+            except ElectionProfileError as err:
+                self.assertEqual(str(err), message)
+
+    def testValidateBallotIDs(self):
+        "IDs whose hashes collide aren't duplicates"
+        seen = dict()
+        for i in itertools.count():
+            bid = '(id%d)' % i
+            h = hash(bid) & 0xffffffff
+            if h in seen:
+                break
+            seen[h] = bid
+        b = '2 1\n%s 1 0\n%s 2 0\n0\n"A" "B" "T"' % (seen[h], bid)
+        self.assertEqual(ElectionProfile.bltValidate(data=b)['ballotIDs'], 2)
+        self.assertRaises(ElectionProfileError, ElectionProfile.bltValidate, data=b.replace(bid, seen[h]))
+
+class BallotIDsTest(unittest.TestCase):
+    "test ballot-ID storage"
+
+    b = '4 2 (a) 1 2 0 (b) 3 0 (c) 2=4 1 0 (d) 4 3 0 (e) 1 2 0 0 "A" "B" "C" "D" "T"'
+
+    def testBallotIDs(self):
+        "IDs are kept, in order, with their ballot lines"
+        p = ElectionProfile(data=self.b, coalesce=True)
+        self.assertEqual(list(p.ballotIDs), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(len(p.ballotLines), 4)     # lines with IDs aren't coalesced
+        self.assertEqual(list(p.ballotLineOf('e').ranking), [1, 2])
+        self.assertEqual(p.ballotLineOf('c').ranking, ([2, 4], [1]))
+        self.assertFalse(p.compare(ElectionProfile(data=p.blt())))
+        self.assertEqual(sorted(ElectionProfile(data=p.blt()).ballotIDs), list(p.ballotIDs))
+        self.assertEqual(p.ballotIDs.index('d'), 3)
+        self.assertEqual(p.ballotIDs.index('f'), None)
+        self.assertRaises(ElectionProfileError, p.ballotLineOf, 'f')
+        p = ElectionProfile(data='4 2 -3 (a) 1 2 0 (b) 3 0 (c) 4 0 (d) 2 0 (e) 1 0 0 "A" "B" "C" "D" "T"')
+        self.assertEqual(p.ballotLineOf('b'), None)     # withdrawn candidate only
+        self.assertEqual(list(p.ballotLineOf('c').ranking), [4])
+
+    def testBallotIDsAppend(self):
+        "appended IDs are checked against the profile's, and dropped with a bad batch"
+        p = ElectionProfile(data=self.b)
+        p.appendBallots('(f) 3 0\n')
+        self.assertEqual(list(p.ballotLineOf('f').ranking), [3])
+        self.assertRaises(ElectionProfileError, p.appendBallots, '(g) 1 0\n(a) 2 0\n')
+        self.assertEqual(list(p.ballotIDs), ['a', 'b', 'c', 'd', 'e', 'f'])
+        self.assertFalse('g' in p.ballotIDs)
+        p.appendBallots('(g) 2 0\n')
+        self.assertEqual(list(p.ballotLineOf('g').ranking), [2])
+
+    def testBallotIDsStore(self):
+        "the store grows, compares IDs in full, and pickles"
+        ids = ElectionProfile.BallotIDs()
+        for i in xrange(3000):
+            self.assertTrue(ids.add('id%d' % i, i))
+        self.assertFalse(ids.add('id7'))
+        self.assertEqual((len(ids), len(ids.table)), (3000, 8192))
+        self.assertEqual((ids[2999], ids.where[ids.index('id2999')]), ('id2999', 2999))
+        ids.truncate(10)
+        self.assertEqual((len(ids), 'id10' in ids, 'id9' in ids), (10, False, True))
+        p = pickle.loads(pickle.dumps(ElectionProfile(data=self.b), 2))
+        self.assertEqual(list(p.ballotIDs), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(p.ballotLineOf('c').ranking, ([2, 4], [1]))
+
+class CompressedTest(unittest.TestCase):
+    "test compressed ballot files"
+
+    def setUp(self):
+        "make a temp directory"
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        "remove the temp directory"
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data):
+        "write a temp file, compressed according to its extension"
+        path = os.path.join(self.dir, name)
+        f = {'.gz':gzip.GzipFile, '.bz2':bz2.BZ2File}.get(os.path.splitext(name)[1], open)(path, 'wb')
+        f.write(data)
+        f.close()
+        return path
+
+    def testCompressedBlt(self):
+        "gzip and bz2 ballot files read as their contents"
+        path = os.path.join(testdir, 'blt', '42.blt')
+        blt = ElectionProfile.bltRead(path)
+        p = ElectionProfile(path=path)
+        for name in ('42.blt.gz', '42.blt.bz2', '42.blt'):
+            for data in (blt, blt.replace('\n', '\r\n'), blt.replace('\n', '\r')):
+                cpath = self.write(name, data)
+                self.assertFalse(p.compare(ElectionProfile(path=cpath)), name)
+                if name != '42.blt':
+                    self.assertEqual(ElectionProfile.bltRead(cpath), blt)
+                self.assertFalse(p.compare(ElectionProfile(path=cpath, workers=2)), name)
+
+    def testCompressedLines(self):
+        "line ends split across blocks, and concatenated members"
+        path = self.write('lines.gz', 'a\r\nb\rc\n\nd')
+        f = open(path, 'ab')
+        f.write(open(self.write('more.gz', 'e\r'), 'rb').read())
+        f.close()
+        for blockSize in (1, 2, 1024):
+            f = ElectionProfile.bltOpen(path)
+            f.blockSize = blockSize
+            self.assertEqual(list(f), ['a\n', 'b\n', 'c\n', '\n', 'de\n'])
+            f.close()
+
+    def testCompressedBoundaries(self):
+        "members and padding that end exactly at a block boundary"
+        members = dict(bz2=(bz2.compress('a\nb\n'), bz2.compress('c\n')))
+        members['gz'] = tuple(open(self.write('m%d.gz' % i, data), 'rb').read()
+            for i, data in enumerate(('a\nb\n', 'c\n')))
+        for name, (first, second) in members.iteritems():
+            for data, blockSize in ((first + second, len(first)), (first + '\x00' * 4 + second, len(first)),
+                    (first + '\x00' * 4 + second, len(first) + 2), (first + '\x00' * 4, len(first))):
+                path = os.path.join(self.dir, 'bound.' + name)
+                f = open(path, 'wb')
+                f.write(data)
+                f.close()
+                f = ElectionProfile.bltOpen(path)
+                f.blockSize = blockSize
+                self.assertEqual(list(f), ['a\n', 'b\n', 'c\n'] if data.endswith(second) else ['a\n', 'b\n'],
+                    (name, blockSize))
+                f.close()
+
+    def testCompressedErrors(self):
+        "corrupt compressed files"
+        path = self.write('bad.gz', '')
+        f = open(path, 'wb')
+        f.write('\x1f\x8b' + 'x' * 100)
+        f.close()
+        self.assertRaises(ElectionProfileError, ElectionProfile, path=path)
+        path = self.write('bad.bz2', 'BZh' + 'x' * 100)
+        self.assertRaises(ElectionProfileError, ElectionProfile, path=path)
+
+    def testCompressedCvr(self):
+        "a compressed CVR file"
+        path = self.write('cvr.csv.gz', CvrTest.cvr_csv)
+        p = ElectionProfile(path=path, cvr=dict(seats=1, format='csv'))
+        self.assertEqual(p.nBallots, 7)
+
+class MergeTest(unittest.TestCase):
+    "test merging ballot files"
+
+    def setUp(self):
+        "make a temp directory"
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        "remove the temp directory"
+        shutil.rmtree(self.dir)
+
+    def split(self, blt, n):
+        '''
+        write the ballot lines of blt text in n files with its header and trailer
+        
+        return their paths, and blt text with their ballot lines in file order
+        '''
+        p = ElectionProfile(data=blt)
+        lines = p.blt().splitlines()
+        nLines = len(p.ballotLines) + len(p.ballotLinesEqual)
+        header, ballots, trailer = lines[:1], lines[1:nLines+1], lines[nLines+1:]
+        paths = list()
+        for i in xrange(n):
+            paths.append(os.path.join(self.dir, 'p%d.blt' % i))
+            f = open(paths[-1], 'w')
+            f.write('\n'.join(header + ballots[i::n] + trailer))
+            f.close()
+        return paths, '\n'.join(header + [b for i in xrange(n) for b in ballots[i::n]] + trailer)
+
+    def testMerge(self):
+        "merged files match the coalesced whole"
+        blt = ElectionProfile.bltRead(os.path.join(testdir, 'blt', 'SC.blt'))
+        paths, inOrder = self.split(blt, 3)
+        whole = ElectionProfile(data=inOrder, coalesce=True)
+        for workers in (1, 2):
+            p = ElectionProfile.bltMerge(paths, workers=workers)
+            self.assertFalse(whole.compare(p), workers)
+        self.assertEqual(p.nBallots, ElectionProfile(data=blt).nBallots)
+        self.assertTrue(len(p.ballotLines) < len(ElectionProfile(data=blt).ballotLines))
+
+    def testMergeBallotIDs(self):
+        "ballot IDs are merged with their lines, and must be unique"
+        paths = list()
+        for i, ballots in enumerate(('(a) 1 2 0 (b) 1 2 0', '1 2 0 1 2 0', '(c) 2=3 0 (d) 3 0', '(a) 3 0')):
+            paths.append(os.path.join(self.dir, 'p%d.blt' % i))
+            f = open(paths[-1], 'w')
+            f.write('3 2 %s 0 "A" "B" "C" "T"' % ballots)
+            f.close()
+        p = ElectionProfile.bltMerge(paths[:3], workers=2)
+        self.assertEqual(list(p.ballotIDs), ['a', 'b', 'c', 'd'])
+        self.assertEqual([bl.multiplier for bl in p.ballotLines], [1, 1, 2, 1])
+        self.assertEqual(p.ballotLineOf('b').multiplier, 1)
+        self.assertEqual(list(p.ballotLineOf('d').ranking), [3])
+        self.assertEqual(p.ballotLineOf('c').ranking, ([2, 3],))
+        self.assertRaises(ElectionProfileError, ElectionProfile.bltMerge, paths)
+
+    def testMergeErrors(self):
+        "mismatched headers and bad files"
+        other = os.path.join(self.dir, 'other.blt')
+        os.rename(self.split('3 1 4 1 2 0 2 3 0 1 2 3 0 0 "a" "b" "c" "t"', 1)[0][0], other)
+        paths = self.split('3 2 4 1 2 0 2 3 0 1 2 3 0 0 "a" "b" "c" "t"', 2)[0]
+        self.assertEqual(ElectionProfile.bltMerge(paths).nBallots, 7)  # each file has too few ballots
+        self.assertRaises(ElectionProfileError, ElectionProfile.bltMerge, [])
+        self.assertRaises(ElectionProfileError, ElectionProfile.bltMerge, paths[1:])
+        for workers in (1, 2):
+            self.assertRaises(ElectionProfileError, ElectionProfile.bltMerge, paths + [other], workers=workers)
+            self.assertRaises(ElectionProfileError, ElectionProfile.bltMerge, paths + [self.dir + '/none.blt'],
+                workers=workers)
+
+class ParallelParseTest(unittest.TestCase):
+    "test parsing the ballot section in worker processes"
+
+    def setUp(self):
+        "make a temp ballot file"
+        fd, self.path = tempfile.mkstemp(suffix='.blt')
+        os.close(fd)
+
+    def tearDown(self):
+        "remove the temp file"
+        os.remove(self.path)
+
+    def write(self, blt):
+        "write the temp ballot file"
+        f = open(self.path, 'w')
+        f.write(blt)
+        f.close()
+
+    def testParallelSame(self):
+        "parallel parsing gives the same profile"
+        lines = ['%d %s 0' % (i % 5 + 1, ' '.join(str((i + k) % 6 + 1) for k in xrange(i % 4 + 1)))
+            for i in xrange(200)]
+        self.write('6 3\n-5\n[droop meek]\n%s\n0\n%s\n"Title"\n"Source"\n' % \
+            ('\n'.join(lines), '\n'.join('"C%d"' % cid for cid in xrange(1, 7))))
+        for coalesce in (False, True):
+            p0 = ElectionProfile(path=self.path, coalesce=coalesce)
+            p1 = ElectionProfile(path=self.path, coalesce=coalesce, workers=3)
+            self.assertFalse(p0.compare(p1))
+            self.assertEqual(list(p1.ballotLines.lines), list(p0.ballotLines.lines))
+            self.assertEqual((p1.options, p1.source), (p0.options, p0.source))
+        self.assertTrue(ElectionProfile(data=p_42).bltParseParallel(self.path, 3))
+
+    def testParallelErrors(self):
+        "parallel parsing reports the same errors"
+        for b in ('3 2\n4 1 2 0\n2 3 3 0\n0\n"A"\n"B"\n"C"\n"T"\n',    # duplicate cid
+                  '3 2\n4 1 2 0\n2 4 0\n0\n"A"\n"B"\n"C"\n"T"\n',      # bad cid
+                  '3 2\n4 1 2 0\n2 3 0\n0\n"A"\n"B"\n',                 # truncated
+                  '3 2\n(a) 1 2 0\n(a) 3 0\n0\n"A"\n"B"\n"C"\n"T"\n'):  # duplicate ballot ID
+            self.write(b)
+            try:
+                ElectionProfile(data=b)
+            except ElectionProfileError as err:
+                self.assertRaisesRegexp(ElectionProfileError, re.escape(str(err)),
+                    ElectionProfile, path=self.path, workers=2)
+
+    def testParallelFallback(self):
+        "files the workers can't parse are parsed serially"
+        b = '3 2\n4 1 2 0\n# comment\n2 2=3 0\n0\n"A"\n"B"\n"C"\n"T"\n'
+        self.write(b)
+        self.assertFalse(ElectionProfile(data=b).bltParseParallel(self.path, 2))
+        self.assertFalse(ElectionProfile(data=b).compare(ElectionProfile(path=self.path, workers=2)))
+
+class ProfileCacheTest(unittest.TestCase):
+    "test the parsed-profile cache"
+
+    def setUp(self):
+        "make a temp cache directory"
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        "remove the cache directory"
+        shutil.rmtree(self.directory)
+
+    def entries(self):
+        "the cache entries"
+        return [name for name in os.listdir(self.directory) if name.endswith(ProfileCache.suffix)]
+
+    def testCacheHit(self):
+        "a second load maps the cached profile"
+        path = testdir + '/blt/SCw.blt'
+        cache = ProfileCache(self.directory)
+        p0 = cache.load(path)
+        self.assertEqual(self.entries(), [cache.key(path) + ProfileCache.suffix])
+        p1 = cache.load(path)
+        self.assertTrue(p1._mmap is not None)
+        self.assertFalse(p0.compare(p1))
+        self.assertFalse(ElectionProfile(path=path).compare(p1))
+        self.assertNotEqual(cache.key(path), cache.key(path, coalesce=True))
+
+    def testCacheMode(self):
+        "cache entries are readable by others, less the umask"
+        path = testdir + '/blt/42.blt'
+        umask = os.umask(022)
+        try:
+            cache = ProfileCache(self.directory)
+            cache.load(path)
+        finally:
+            os.umask(umask)
+        entry = os.path.join(self.directory, cache.key(path) + ProfileCache.suffix)
+        self.assertEqual(stat.S_IMODE(os.stat(entry).st_mode), 0644)
+        umask = os.umask(077)
+        try:
+            cache = ProfileCache(self.directory)
+            os.remove(entry)
+            cache.load(path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(entry).st_mode), 0600)
+
+    def testCacheDamaged(self):
+        "a damaged entry is parsed again and replaced"
+        path = testdir + '/blt/42.blt'
+        cache = ProfileCache(self.directory)
+        entry = os.path.join(self.directory, cache.key(path) + ProfileCache.suffix)
+        f = open(entry, 'wb')
+        f.write(ElectionProfile.binMagic)
+        f.close()
+        p = cache.load(path)
+        self.assertTrue(p._mmap is None)
+        self.assertTrue(ElectionProfile(path=entry)._mmap is not None)
+
+    def testCacheEvict(self):
+        "least-recently-used entries are evicted"
+        paths = [testdir + '/blt/' + name for name in ('42.blt', '42t.blt', '513.blt')]
+        cache = ProfileCache(self.directory, maxBytes=0)
+        cache.load(paths[0])
+        self.assertEqual(self.entries(), [])
+        cache.maxBytes = 1024*1024
+        for path in paths:
+            cache.load(path)
+        self.assertEqual(len(self.entries()), 3)
+        then = time.time() - 100
+        for i, path in enumerate(paths):
+            os.utime(os.path.join(self.directory, cache.key(path) + ProfileCache.suffix), (then+i, then+i))
+        cache.load(paths[0])            # hit: now most recent
+        sizes = [os.path.getsize(os.path.join(self.directory, name)) for name in self.entries()]
+        cache.maxBytes = sum(sizes) - 1
+        cache.evict()
+        self.assertEqual(sorted(self.entries()),
+            sorted(cache.key(path) + ProfileCache.suffix for path in (paths[0], paths[2])))
+
 if __name__ == '__main__':
     unittest.main()
+
+class BinaryProfileTest(unittest.TestCase):
+    "test binary profiles"
+
+    def setUp(self):
+        "make a temp file for the binary profile"
+        fd, self.path = tempfile.mkstemp(suffix='.dbp')
+        os.close(fd)
+
+    def tearDown(self):
+        "remove the temp file"
+        os.remove(self.path)
+
+    def testBinaryRoundTrip(self):
+        "blt -> binary -> blt preserves the profile"
+        for name in ('42u.blt', 'SCw.blt', 'meek/eq1.blt'):
+            p0 = ElectionProfile(path=testdir + '/blt/' + name)
+            p0.binWrite(self.path)
+            self.assertTrue(ElectionProfile.binIs(self.path))
+            p1 = ElectionProfile(path=self.path)
+            self.assertFalse(p0.compare(p1), name)
+            self.assertEqual(p1.nickName, p0.nickName)
+            self.assertEqual(p1.tieOrder, p0.tieOrder)
+            self.assertEqual(p1.getCid(p0.nickName[2], 'test'), 2)
+            self.assertEqual(p1.source, p0.source)
+            p2 = ElectionProfile(data=p1.blt())
+            self.assertFalse(p0.compare(p2), name)
+            self.assertEqual([bl.line for bl in p1.ballotLines], [bl.line for bl in p0.ballotLines])
+
+    def testBinaryBallotIDs(self):
+        "binary profile keeps ballot IDs"
+        p0 = ElectionProfile(data='3 2 (a) 1 2 0 (b) 3 0 (c) 2=3 0 0 "A" "B" "C" "T"')
+        p0.binWrite(self.path)
+        p1 = ElectionProfile(path=self.path)
+        self.assertEqual(list(p1.ballotIDs), ['a', 'b', 'c'])
+        self.assertEqual(list(p1.ballotLineOf('b').ranking), [3])
+        self.assertEqual(p1.ballotLineOf('c').ranking, ([2, 3],))
+
+    def testBinaryIntSize(self):
+        "a binary profile written with 4-byte ints (as on Windows) reads back, ballot IDs and all"
+        p0 = ElectionProfile(data='3 2 (a) 1 2 0 (b) 3 0 (c) 2=3 0 (d) 2 1 0 0 "A" "B" "C" "T"')
+        BL, IDs = p0.ballotLines, p0.ballotIDs
+        BL.offsets, BL.multipliers, BL.lines = [array.array('i', a) for a in (BL.offsets, BL.multipliers, BL.lines)]
+        IDs.offsets, IDs.where = array.array('i', IDs.offsets), array.array('i', IDs.where)
+        p0.binWrite(self.path)
+        self.assertEqual(ElectionProfile.binHeader.unpack_from(open(self.path, 'rb').read())[3], 4)
+        p1 = ElectionProfile(path=self.path)
+        self.assertFalse(p0.compare(p1))
+        self.assertEqual(list(p1.ballotIDs), ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(p1.ballotLineOf('d').ranking), [2, 1])
+        self.assertEqual(p1.ballotLineOf('c').ranking, ([2, 3],))
+
+    def testBinaryOptions(self):
+        "binary profile keeps withdrawn candidates, tie order and options"
+        b = '4 2 -3 [tie 4 3 2 1] [droop meek] 3 1 2 0 2 4 0 1 2=4 0 0 "A" "B" "C" "D" "Title"'
+        p0 = ElectionProfile(data=b)
+        p0.binWrite(self.path)
+        p1 = ElectionProfile(path=self.path)
+        self.assertFalse(p0.compare(p1))
+        self.assertEqual(p1.withdrawn, set([3]))
+        self.assertEqual(p1.tieOrder, {1:4, 2:3, 3:2, 4:1})
+        self.assertEqual(p1.options, ['meek'])
+        self.assertEqual(list(p1.ballotLines.ranking(1)), [4])
+        self.assertEqual(list(p1.ballotLinesEqual[0].ranking), [[2, 4]])
+        self.assertFalse(p0.compare(ElectionProfile(data=p1.blt())))
+
+    def testBinaryTruncated(self):
+        "exception: truncated binary profile"
+        ElectionProfile(data=p_42).binWrite(self.path)
+        f = open(self.path, 'rb')
+        data = f.read()
+        f.close()
+        f = open(self.path, 'wb')
+        f.write(data[:-8])
+        f.close()
+        self.assertRaises(ElectionProfileError, ElectionProfile, path=self.path)
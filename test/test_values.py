@@ -45,11 +45,11 @@ class ValueTest(unittest.TestCase):
 
     def testValueInitRationalDefault(self):
         "default class Guarded"
-        self.assertEqual(V.ArithmeticClass(Options(dict(precision=8))), G)
+        self.assertTrue(issubclass(V.ArithmeticClass(Options(dict(precision=8))), G))
 
     def testValueInitFixed(self):
         "class Fixed if arithmetic=fixed"
-        self.assertEqual(V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=8))), F)
+        self.assertTrue(issubclass(V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=8))), F))
 
     def testBadFixedA(self):
         "fixed called directly must be fixed or integer"
@@ -57,7 +57,25 @@ class ValueTest(unittest.TestCase):
 
     def testValueInitRational(self):
         "class Rational if arithmetic=rational"
-        self.assertEqual(V.ArithmeticClass(Options(dict(arithmetic='rational'))), R)
+        self.assertTrue(issubclass(V.ArithmeticClass(Options(dict(arithmetic='rational'))), R))
+
+    def testContexts(self):
+        "each arithmetic context has its own class variables"
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=3)))
+        B = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6)))
+        self.assertFalse(A is B)
+        self.assertEqual((A.tag(), B.tag()), ('fixed-p3-d3', 'fixed-p6-d6'))
+        self.assertEqual((str(A(1)/A(3)), str(B(1)/B(3))), ('0.333', '0.333333'))
+        self.assertTrue(type(A(1) + 1) is A)
+        A = V.ArithmeticClass(Options(dict(arithmetic='guarded', precision=3)))
+        B = V.ArithmeticClass(Options(dict(arithmetic='guarded', precision=6)))
+        self.assertTrue(A(1) == A(1) + A(1, True))    # within geps: counted in A's statistics
+        self.assertEqual((A.maxDiff, B.maxDiff), (1, 0))
+        self.assertEqual(str(B(2)/B(3)), '0.666667')
+        A = V.ArithmeticClass(Options(dict(arithmetic='rational', display=2)))
+        B = V.ArithmeticClass(Options(dict(arithmetic='rational', display=4)))
+        self.assertEqual((str(A(1)/A(3)), str(B(1)/B(3))), ('0.33', '0.3333'))
+        self.assertTrue(type(A.muldiv(A(1), A(2), A(3))) is A)
 
     def testBadP1(self):
         "precision must be an int"
@@ -80,8 +98,8 @@ class ValueTestFixed(unittest.TestCase):
     
     def testFixedIntegerP0(self):
         "fixed=integer yields precision 0"
-        V.ArithmeticClass(Options(dict(arithmetic='integer')))
-        self.assertEqual(F.precision, 0)
+        A = V.ArithmeticClass(Options(dict(arithmetic='integer')))
+        self.assertEqual(A.precision, 0)
 
     def testBadFixedPx(self):
         "fixed precision must be numeric"
@@ -101,26 +119,26 @@ class ValueTestFixed(unittest.TestCase):
 
     def testFixedInteger(self):
         "fixed precision 0 means integer"
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=0)))
-        self.assertEqual(F.tag(), 'integer')
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=0)))
+        self.assertEqual(A.tag(), 'integer')
 
     def testFixedDisplay1(self):
         "fixed display must be <= precision"
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=7)))
-        self.assertEqual(F.display, 6)
-        self.assertTrue(F.info.find('display') < 0)
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=7)))
+        self.assertEqual(A.display, 6)
+        self.assertTrue(A.info.find('display') < 0)
 
     def testFixedDisplay2(self):
         "fixed display != precision gets a mention in info"
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=5)))
-        self.assertTrue(F.info.find('display') > 0)
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=5)))
+        self.assertTrue(A.info.find('display') > 0)
 
     def testFixedDisplay3(self):
         "fixed display < precision rounds properly"
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=6)))
-        self.assertEqual(str(F(20)/F(3)), '6.666666')
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=7, display=6)))
-        self.assertEqual(str(F(20)/F(3)), '6.666667')
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=6, display=6)))
+        self.assertEqual(str(A(20)/A(3)), '6.666666')
+        A = V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=7, display=6)))
+        self.assertEqual(str(A(20)/A(3)), '6.666667')
 
 class ValueTestFixed6(unittest.TestCase):
     "Fixed with precision=6"
@@ -149,14 +167,15 @@ class ValueTestFixed6(unittest.TestCase):
         self.assertEqual(y/1, y/x)
         self.assertRaises(ValueError, self.A.mul, x, y, 'bad')
         self.assertRaises(ValueError, self.A.muldiv, x, y, y, 'bad')
-        f13 = F(1)/F(3)
-        f15 = F(1)/F(5)
-        f17 = F(1)/F(7)
-        self.assertTrue(F.muldiv(f13, f15, f17, round='down') > f13*f15/f17)
-        self.assertTrue(F.muldiv(f13, f15, f17, round='up') > F.muldiv(f13, f15, f17, round='down'))
+        A = self.A
+        f13 = A(1)/A(3)
+        f15 = A(1)/A(5)
+        f17 = A(1)/A(7)
+        self.assertTrue(A.muldiv(f13, f15, f17, round='down') > f13*f15/f17)
+        self.assertTrue(A.muldiv(f13, f15, f17, round='up') > A.muldiv(f13, f15, f17, round='down'))
         self.assertEqual(str(f13*f15/f17), '0.466662')
-        self.assertEqual(str(F.muldiv(f13, f15, f17, round='down')), '0.466666')
-        self.assertEqual(str(F.muldiv(f13, f15, f17, round='up')), '0.466667')
+        self.assertEqual(str(A.muldiv(f13, f15, f17, round='down')), '0.466666')
+        self.assertEqual(str(A.muldiv(f13, f15, f17, round='up')), '0.466667')
         self.assertTrue(x != y)
         self.assertEqual(str(x/y), '0.500000')
 
@@ -184,7 +203,7 @@ class ValueTestFixed0(unittest.TestCase):
     def testFixed0(self):
         "simple assertions"
         self.assertEqual(self.A.name, 'integer')               # Fixed.name
-        x = F(1)
+        x = self.A(1)
         self.assertEqual(str(x), '1')
 
     def testReprFixed0(self):
@@ -255,7 +274,7 @@ class ValueTestRounding(unittest.TestCase):
     g = 0
     def setUp(self):
         "initialize fixed class"
-        V.ArithmeticClass(Options(dict(arithmetic='fixed', precision=self.p, guard=self.g)))
+        F.initialize(Options(dict(arithmetic='fixed', precision=self.p, guard=self.g)))
         
     def testRoundFloor(self):
         "default rounding is truncation/floor"